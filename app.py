@@ -4,7 +4,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 import html
-from sklearn.decomposition import PCA # Para el gráfico PCA
+
+from config import FILE_PATHS
+from data_cache import ArtifactCache
+from forecasting import build_combined_view, combined_view_is_current
+from pca_projection import ensure_pca_projection
 
 # --- 1. Configuración de la Página ---
 st.set_page_config(
@@ -207,33 +211,62 @@ with col3:
     """, unsafe_allow_html=True)
 
 # --- 2. Carga de Datos ---
-@st.cache_data
+# Las tablas se abren desde el almacén columnar (memory mapping) y, si aún
+# no se ha generado, desde los CSV originales. Una única caché por proceso,
+# compartida por todas las sesiones, recarga solo los archivos que cambian.
+def _normalizar_historico(df):
+    return df.rename(columns=lambda col: str(int(float(col))))
+
+def _normalizar_resumen(df):
+    return df.set_axis(df.index.astype(str))
+
+@st.cache_resource
+def get_artifact_cache():
+    return ArtifactCache(postprocess={
+        'historical': _normalizar_historico,
+        'summary': _normalizar_resumen
+    })
+
+# La proyección PCA se calcula una vez por versión de X_procesado y de los
+# identificadores de las PYMEs y se guarda junto a los artefactos; los reruns
+# solo la leen.
+@st.cache_resource
+def get_pca_projection(data_version, _df_X, _ids):
+    return ensure_pca_projection(_df_X, _ids)
+
 def load_data():
+    cache = get_artifact_cache()
     try:
-        df_clusters_info = pd.read_csv('pymes_con_clusters.csv') 
-        df_historico = pd.read_csv('ts_mensual_historico.csv', index_col='fecha', parse_dates=True)
-        df_historico.columns = [str(int(float(col))) for col in df_historico.columns]
+        df_clusters_info = cache.get('clusters')
+        df_historico = cache.get('historical')
 
         pronosticos = {}
-        for i in range(3):
+        for i in FILE_PATHS['forecasts']:
             try:
-                pronosticos[str(i)] = pd.read_csv(f'pronostico_prophet_cluster_{i}.csv', index_col='ds', parse_dates=True)
+                pronosticos[str(i)] = cache.get('forecasts', cluster_id=i)
             except FileNotFoundError:
                  pronosticos[str(i)] = None
 
-        df_summary = pd.read_csv('kmedoids_summary.csv', index_col='cluster_kmedoids')
-        df_summary.index = df_summary.index.astype(str)
+        df_summary = cache.get('summary')
         
-        df_mapeo = pd.read_csv('mapeo_pymes.csv')
+        df_mapeo = cache.get('mapping')
         
-        df_X_procesado = pd.read_csv('X_procesado_para_pca.csv')
+        df_X_procesado = cache.get('pca_data')
 
-        return df_clusters_info, df_historico, pronosticos, df_summary, df_mapeo, df_X_procesado
+        # Vista histórico + pronóstico materializada por forecasting.py; si
+        # aún no se ha generado o sus fuentes ya no son las cargadas se
+        # construye con las tablas ya cargadas
+        if combined_view_is_current(cache):
+            df_combinado = cache.get('combined')
+        else:
+            df_combinado = build_combined_view(df_historico, pronosticos)
+
+        return df_clusters_info, df_historico, pronosticos, df_summary, df_mapeo, df_X_procesado, df_combinado
     except Exception as e:
         st.error(f"Error al cargar los datos. Error: {e}")
-        return None, None, None, None, None, None
+        return None, None, None, None, None, None, None
 
-df_clusters_info, df_historico, pronosticos, df_summary, df_mapeo, df_X_procesado = load_data()
+df_clusters_info, df_historico, pronosticos, df_summary, df_mapeo, df_X_procesado, df_combinado = load_data()
 
 # --- Nombres, Descripciones COMPLETAS y Recomendaciones COMPLETAS ---
 cluster_names = {"0": "Líderes Transaccionales", "1": "Premium de Alto Valor", "2": "Emergentes Moderados"}
@@ -329,7 +362,7 @@ cluster_recommendations = {
 
 # --- 3. Verificar Carga y Crear Dashboard ---
 if df_clusters_info is not None and df_historico is not None and pronosticos is not None and \
-   df_summary is not None and df_mapeo is not None and df_X_procesado is not None:
+   df_summary is not None and df_mapeo is not None and df_X_procesado is not None and df_combinado is not None:
 
     # Sidebar mejorado con diseño moderno
     st.sidebar.markdown("""
@@ -392,27 +425,15 @@ if df_clusters_info is not None and df_historico is not None and pronosticos is
         </div>
         """, unsafe_allow_html=True)
         
-        if 'Total' not in df_historico.columns: df_historico['Total'] = df_historico[["0", "1", "2"]].sum(axis=1)
-        
-        df_pronostico_total_calc = None
-        for cl_id, forecast_df in pronosticos.items():
-            if forecast_df is not None:
-                temp_df = forecast_df[['yhat']].rename(columns={'yhat': cl_id})
-                if df_pronostico_total_calc is None: df_pronostico_total_calc = temp_df
-                else: df_pronostico_total_calc = df_pronostico_total_calc.join(temp_df, how='outer')
-        
-        df_pronostico_total_futuro = None
-        if df_pronostico_total_calc is not None:
-            df_pronostico_total_calc = df_pronostico_total_calc.fillna(0)
-            if 'Total' not in df_pronostico_total_calc.columns: df_pronostico_total_calc['Total'] = df_pronostico_total_calc.sum(axis=1)
-            
-            ultima_fecha_hist = df_historico.index[-1]
-            df_pronostico_total_futuro = df_pronostico_total_calc[df_pronostico_total_calc.index > ultima_fecha_hist]
+        # Los DataFrames de la caché se comparten entre sesiones: no se modifican
+        es_historico = df_combinado['Tipo_Dato'] == 'Histórico'
+        historico_total = df_combinado.loc[es_historico, 'Ingresos_Total']
+        pronostico_total = df_combinado.loc[~es_historico, 'Ingresos_Total']
 
         fig_total = go.Figure()
-        fig_total.add_trace(go.Scatter(x=df_historico.index, y=df_historico['Total'], mode='lines', name='Histórico Total', line=dict(color='green', width=2))) 
-        if df_pronostico_total_futuro is not None and not df_pronostico_total_futuro.empty:
-            fig_total.add_trace(go.Scatter(x=df_pronostico_total_futuro.index, y=df_pronostico_total_futuro['Total'], mode='lines', name='Pronóstico Total', line=dict(color='purple', dash='dash', width=2)))
+        fig_total.add_trace(go.Scatter(x=historico_total.index, y=historico_total, mode='lines', name='Histórico Total', line=dict(color='green', width=2))) 
+        if not pronostico_total.empty:
+            fig_total.add_trace(go.Scatter(x=pronostico_total.index, y=pronostico_total, mode='lines', name='Pronóstico Total', line=dict(color='purple', dash='dash', width=2)))
         fig_total.update_layout(
             title='📊 Ingresos Totales: Histórico vs Pronóstico', 
             xaxis_title='Fecha', 
@@ -798,9 +819,16 @@ if df_clusters_info is not None and df_historico is not None and pronosticos is
         """, unsafe_allow_html=True)
         
         if df_X_procesado is not None and df_clusters_info.shape[0] == df_X_procesado.shape[0]:
-            pca = PCA(n_components=2, random_state=42)
-            principal_components = pca.fit_transform(df_X_procesado)
-            df_pca = pd.DataFrame(data=principal_components, columns=['PCA Componente 1', 'PCA Componente 2'])
+            proyeccion = get_pca_projection(
+                (get_artifact_cache().version('pca_data'), get_artifact_cache().version('clusters')),
+                df_X_procesado,
+                df_clusters_info['numerodoi'].to_numpy()
+            )
+            coordenadas = proyeccion['coords'].reindex(df_clusters_info['numerodoi'])
+            df_pca = pd.DataFrame({
+                'PCA Componente 1': coordenadas['pc1'].to_numpy(),
+                'PCA Componente 2': coordenadas['pc2'].to_numpy()
+            })
             
             df_pca['Clúster Etiqueta'] = df_clusters_info['cluster_kmedoids'].astype(str).values 
             df_pca['Clúster Nombre'] = df_pca['Clúster Etiqueta'].map(
@@ -836,7 +864,7 @@ if df_clusters_info is not None and df_historico is not None and pronosticos is
             st.plotly_chart(fig_pca, use_container_width=True)
             
             # Métricas de varianza explicada en cards
-            explained_variance = pca.explained_variance_ratio_
+            explained_variance = proyeccion['explained_variance_ratio']
             col1, col2, col3 = st.columns(3)
             
             with col1:
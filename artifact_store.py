@@ -0,0 +1,363 @@
+"""
+Almacén columnar de artefactos
+==============================
+
+Este módulo guarda las tablas generadas por el pipeline en un formato
+binario columnar: un archivo ``.npy`` por columna más un ``manifest.json``
+con el esquema. Las columnas se abren con memory mapping, de modo que el
+costo de arranque del dashboard no crece con el número de filas y varios
+procesos comparten las mismas páginas del sistema operativo.
+
+Los CSV originales siguen funcionando como respaldo: si una tabla no
+existe en el almacén se lee el CSV correspondiente.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from config import FILE_PATHS
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+# Opciones de lectura de cada CSV de FILE_PATHS (se usan en el respaldo
+# y al convertir los CSV al almacén)
+CSV_READ_OPTIONS = {
+    'historical': {'index_col': 'fecha', 'parse_dates': True},
+    'summary': {'index_col': 'cluster_kmedoids'},
+    'forecasts': {'index_col': 'ds', 'parse_dates': True},
+    'combined': {'index_col': 'Fecha', 'parse_dates': True},
+}
+
+
+def artifact_name(path):
+    """
+    Devuelve el nombre del artefacto asociado a una ruta CSV.
+
+    Args:
+        path: Ruta del CSV (p. ej. 'pymes_con_clusters.csv')
+
+    Returns:
+        str: Nombre del artefacto dentro del almacén
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _artifact_dir(name, store_dir):
+    return os.path.join(store_dir, name)
+
+
+def _write_atomic_dir(final_dir, writer):
+    """
+    Escribe un directorio completo en una ubicación temporal y lo publica
+    con un rename, para que los lectores nunca vean un artefacto a medias.
+    """
+    parent = os.path.dirname(final_dir) or '.'
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = f"{final_dir}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_dir)
+    try:
+        writer(tmp_dir)
+        old_dir = None
+        if os.path.exists(final_dir):
+            old_dir = f"{final_dir}.old-{uuid.uuid4().hex}"
+            os.rename(final_dir, old_dir)
+        os.rename(tmp_dir, final_dir)
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _encode_column(values):
+    """
+    Convierte una columna de pandas en (array, descriptor de esquema).
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy().astype(np.int32)
+        categories = values.cat.categories.tolist()
+        return codes, {'kind': 'categorical', 'categories': _json_values(categories)}
+
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        as_ns = values.astype('datetime64[ns]')
+        return as_ns.to_numpy().view(np.int64), {'kind': 'datetime'}
+
+    if pd.api.types.is_bool_dtype(values.dtype) or pd.api.types.is_numeric_dtype(values.dtype):
+        array = values.to_numpy()
+        if array.dtype == object:
+            array = array.astype(np.float64)
+        return np.ascontiguousarray(array), {'kind': 'numeric'}
+
+    # Texto u objetos: se codifican como categorías para poder mapearlos
+    codes, categories = pd.factorize(values, sort=True)
+    return codes.astype(np.int32), {'kind': 'categorical', 'categories': _json_values(categories.tolist())}
+
+
+def _json_values(values):
+    """Convierte escalares de NumPy a tipos nativos serializables en JSON."""
+    return [v.item() if isinstance(v, np.generic) else v for v in values]
+
+
+def _decode_column(array, spec, categorical=False):
+    kind = spec['kind']
+    if kind == 'datetime':
+        return array.view('datetime64[ns]')
+    if kind == 'categorical':
+        values = pd.Categorical.from_codes(array, categories=spec['categories'])
+        # Por defecto el mismo tipo que devuelve ``pd.read_csv`` en el respaldo
+        return values if categorical else values.astype(object)
+    return array
+
+
+def write_table(df, name, store_dir=None, index=True, metadata=None):
+    """
+    Escribe un DataFrame en el almacén columnar.
+
+    Args:
+        df: DataFrame a guardar
+        name: Nombre del artefacto
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+        index: Si se guarda también el índice del DataFrame
+        metadata: Diccionario serializable en JSON guardado en el manifiesto
+
+    Returns:
+        str: Ruta del directorio del artefacto
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    frame = df
+    index_names = []
+    if index and not isinstance(df.index, pd.RangeIndex):
+        index_names = [n if n is not None else f'level_{i}' for i, n in enumerate(df.index.names)]
+        frame = df.copy()
+        frame.index.names = index_names
+        frame = frame.reset_index()
+
+    def writer(tmp_dir):
+        columns = []
+        digest = hashlib.sha1()
+        for position, column in enumerate(frame.columns):
+            array, spec = _encode_column(frame.iloc[:, position])
+            file_name = f'c{position}.npy'
+            np.save(os.path.join(tmp_dir, file_name), array, allow_pickle=False)
+            digest.update(array.tobytes())
+            spec.update({'name': _json_values([column])[0], 'file': file_name,
+                         'dtype': array.dtype.str})
+            columns.append(spec)
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'n_rows': int(len(frame)),
+            'columns': columns,
+            'index': index_names,
+            'content_hash': digest.hexdigest(),
+            'metadata': metadata or {},
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    final_dir = _artifact_dir(name, store_dir)
+    _write_atomic_dir(final_dir, writer)
+    return final_dir
+
+
+def read_manifest(name, store_dir=None):
+    """
+    Lee el manifiesto (esquema y metadatos) de un artefacto.
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    with open(os.path.join(_artifact_dir(name, store_dir), MANIFEST_NAME), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def has_artifact(name, store_dir=None):
+    """
+    Indica si un artefacto existe en el almacén.
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    return os.path.exists(os.path.join(_artifact_dir(name, store_dir), MANIFEST_NAME))
+
+
+def read_table(name, store_dir=None, columns=None, mmap=True, categorical=False):
+    """
+    Abre una tabla del almacén.
+
+    Las columnas numéricas y de fecha quedan respaldadas por memory maps de
+    solo lectura. Las de texto se devuelven con el mismo tipo que el CSV de
+    respaldo, de modo que una clave da el mismo esquema exista o no el
+    almacén; con ``categorical=True`` se devuelven como ``Categorical``
+    cuyos códigos también están mapeados.
+
+    Args:
+        name: Nombre del artefacto
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+        columns: Lista opcional de columnas a cargar
+        mmap: Si se usa memory mapping (True) o se leen los datos a memoria
+        categorical: Si las columnas de texto se devuelven como ``Categorical``
+
+    Returns:
+        pandas.DataFrame: Tabla con el índice original restaurado
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    base_dir = _artifact_dir(name, store_dir)
+    manifest = read_manifest(name, store_dir)
+    wanted = None if columns is None else set(columns) | set(manifest['index'])
+
+    data = {}
+    for spec in manifest['columns']:
+        if wanted is not None and spec['name'] not in wanted:
+            continue
+        array = np.load(os.path.join(base_dir, spec['file']),
+                        mmap_mode='r' if mmap else None, allow_pickle=False)
+        data[spec['name']] = _decode_column(array, spec, categorical)
+
+    # copy=False evita consolidar bloques y conserva los memory maps
+    df = pd.DataFrame(data, copy=False)
+    if manifest['index']:
+        df = df.set_index(manifest['index'])
+    return df
+
+
+def write_arrays(name, arrays, store_dir=None, metadata=None):
+    """
+    Guarda un conjunto de arrays de NumPy (p. ej. parámetros de un modelo).
+
+    Args:
+        name: Nombre del artefacto
+        arrays: Diccionario nombre -> numpy.ndarray
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+        metadata: Diccionario serializable en JSON guardado en el manifiesto
+
+    Returns:
+        str: Ruta del directorio del artefacto
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+
+    def writer(tmp_dir):
+        entries = []
+        digest = hashlib.sha1()
+        for position, (key, array) in enumerate(arrays.items()):
+            array = np.ascontiguousarray(array)
+            file_name = f'a{position}.npy'
+            np.save(os.path.join(tmp_dir, file_name), array, allow_pickle=False)
+            digest.update(array.tobytes())
+            entries.append({'name': key, 'file': file_name, 'dtype': array.dtype.str,
+                            'shape': list(array.shape)})
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'arrays': entries,
+            'content_hash': digest.hexdigest(),
+            'metadata': metadata or {},
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    final_dir = _artifact_dir(name, store_dir)
+    _write_atomic_dir(final_dir, writer)
+    return final_dir
+
+
+def read_arrays(name, store_dir=None, mmap=True):
+    """
+    Abre un conjunto de arrays guardado con ``write_arrays``.
+
+    Returns:
+        tuple: (diccionario nombre -> array, metadatos)
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    base_dir = _artifact_dir(name, store_dir)
+    manifest = read_manifest(name, store_dir)
+    arrays = {
+        entry['name']: np.load(os.path.join(base_dir, entry['file']),
+                               mmap_mode='r' if mmap else None, allow_pickle=False)
+        for entry in manifest['arrays']
+    }
+    return arrays, manifest['metadata']
+
+
+def load_table(csv_path, store_dir=None, **read_csv_kwargs):
+    """
+    Carga una tabla desde el almacén columnar o, si no existe, desde su CSV.
+
+    Args:
+        csv_path: Ruta del CSV de respaldo
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+        **read_csv_kwargs: Opciones para ``pd.read_csv`` en el respaldo
+
+    Returns:
+        pandas.DataFrame: Tabla cargada
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    name = artifact_name(csv_path)
+    if has_artifact(name, store_dir):
+        return read_table(name, store_dir)
+    return pd.read_csv(csv_path, **read_csv_kwargs)
+
+
+def artifact_paths(file_paths=None):
+    """
+    Enumera los CSV de FILE_PATHS como pares (clave, ruta).
+
+    Las rutas anidadas (pronósticos) usan como clave una tupla
+    ``('forecasts', cluster_id)``.
+    """
+    file_paths = file_paths or FILE_PATHS
+    for key, value in file_paths.items():
+        if key == 'store':
+            continue
+        if isinstance(value, dict):
+            for sub_key, path in value.items():
+                yield (key, sub_key), path
+        else:
+            yield key, value
+
+
+def load_artifact(key, cluster_id=None, file_paths=None):
+    """
+    Carga un artefacto de FILE_PATHS desde el almacén con respaldo CSV.
+
+    Args:
+        key: Clave de FILE_PATHS (p. ej. 'clusters', 'forecasts')
+        cluster_id: Clúster para las claves anidadas ('forecasts')
+        file_paths: Diccionario de rutas (por defecto FILE_PATHS)
+
+    Returns:
+        pandas.DataFrame: Tabla cargada
+    """
+    file_paths = file_paths or FILE_PATHS
+    csv_path = file_paths[key] if cluster_id is None else file_paths[key][cluster_id]
+    return load_table(csv_path, store_dir=file_paths['store'], **CSV_READ_OPTIONS.get(key, {}))
+
+
+def build_store_from_csv(file_paths=None):
+    """
+    Convierte todos los CSV de FILE_PATHS al almacén columnar.
+
+    Args:
+        file_paths: Diccionario de rutas (por defecto FILE_PATHS)
+
+    Returns:
+        list: Nombres de los artefactos escritos
+    """
+    file_paths = file_paths or FILE_PATHS
+    written = []
+    for key, csv_path in artifact_paths(file_paths):
+        if not os.path.exists(csv_path):
+            continue
+        base_key = key[0] if isinstance(key, tuple) else key
+        df = pd.read_csv(csv_path, **CSV_READ_OPTIONS.get(base_key, {}))
+        name = artifact_name(csv_path)
+        write_table(df, name, store_dir=file_paths['store'])
+        written.append(name)
+    return written
+
+
+if __name__ == '__main__':
+    escritos = build_store_from_csv()
+    print(f"Artefactos escritos en '{FILE_PATHS['store']}': {', '.join(escritos)}")
@@ -0,0 +1,141 @@
+"""
+Backtesting con origen móvil
+============================
+
+El notebook evalúa Prophet con una única reserva de 6 meses. Este módulo
+repite el ajuste desde varios orígenes (ventana creciente o deslizante) para
+cada serie y cada modelo:
+
+- todos los ajustes (serie, modelo, origen) van al pool de procesos de
+  ``forecasting.execute_jobs``, con el aislamiento de fallos de
+  ``run_forecasts``,
+- el pronóstico de cada origen se guarda en la ``ForecastCache``, así que al
+  añadir un mes solo se ajusta el origen nuevo,
+- los errores se agregan por horizonte (1, 2, ... meses adelante) en MAE,
+  RMSE y MAPE.
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import BACKTEST_CONFIG
+from forecasting import execute_jobs, model_for_level
+
+
+def rolling_origins(n_obs, horizon, initial=None, step=None, window=None):
+    """
+    Calcula las ventanas de entrenamiento de cada origen.
+
+    Args:
+        n_obs: Meses de historia
+        horizon: Meses evaluados tras cada origen
+        initial: Meses de entrenamiento del primer origen
+        step: Meses entre orígenes consecutivos
+        window: 'expanding' (crece desde el inicio) o 'sliding' (tamaño fijo
+            ``initial``)
+
+    Returns:
+        list: Tuplas (inicio, fin) del entrenamiento; el test es
+            [fin, fin + horizon)
+    """
+    initial = initial or BACKTEST_CONFIG['initial']
+    step = step or BACKTEST_CONFIG['step']
+    window = window or BACKTEST_CONFIG['window']
+    if window not in ('expanding', 'sliding'):
+        raise ValueError(f"Ventana no soportada: {window}. Opciones: ('expanding', 'sliding')")
+
+    return [(end - initial if window == 'sliding' else 0, end)
+            for end in range(initial, n_obs - horizon + 1, step)]
+
+
+def _default_models():
+    fit_fn, config = model_for_level('cluster')
+    return {fit_fn.__name__.replace('_fit_predict', ''): (fit_fn, config)}
+
+
+def backtest(df_ts, models=None, horizon=None, initial=None, step=None, window=None,
+             n_jobs=None, cache=None):
+    """
+    Backtesting de todas las series y modelos en paralelo.
+
+    Args:
+        df_ts: Series mensuales (índice fecha, una columna por serie)
+        models: Diccionario nombre -> (fit_fn, config) (por defecto el modelo
+            de FORECAST_CONFIG['cluster_model'])
+        horizon: Meses pronosticados desde cada origen (por defecto BACKTEST_CONFIG)
+        initial, step, window: Ver ``rolling_origins``
+        n_jobs: Procesos del pool
+        cache: ``ForecastCache`` o False (ver ``forecasting.execute_jobs``)
+
+    Returns:
+        tuple: (métricas por serie, modelo y horizonte: MAE, RMSE, MAPE y
+            n_origenes; detalle por origen: serie, modelo, origen, horizonte,
+            ds, y, yhat; ajustes fallidos: serie, modelo, origen, error)
+    """
+    models = models or _default_models()
+    horizon = horizon or BACKTEST_CONFIG['horizon']
+    origins = rolling_origins(len(df_ts), horizon, initial, step, window)
+
+    jobs = []
+    ends = []
+    for column in df_ts.columns:
+        series = df_ts[column]
+        for name, (fit_fn, config) in models.items():
+            for start, end in origins:
+                key = (column, name, df_ts.index[end - 1])
+                jobs.append((key, series.iloc[start:end], horizon, config, fit_fn))
+                ends.append(end)
+    results = execute_jobs(jobs, n_jobs, cache)
+
+    keys, test_ends, predicted, failures = [], [], [], []
+    for job, end in zip(jobs, ends):
+        key = job[0]
+        result = results[key]
+        if result['status'] != 'ok':
+            failures.append({'serie': key[0], 'modelo': key[1], 'origen': key[2],
+                             'error': result['error']})
+            continue
+        keys.append(key)
+        test_ends.append(end)
+        predicted.append(result['forecast']['yhat'].to_numpy(dtype=np.float64)[:horizon])
+
+    # Posiciones (origen, horizonte) de los meses evaluados
+    positions = (np.asarray(test_ends, dtype=np.int64)[:, None] + np.arange(horizon)).ravel()
+    columns = df_ts.columns.get_indexer([key[0] for key in keys])
+    actual = df_ts.to_numpy(dtype=np.float64)[positions, np.repeat(columns, horizon)]
+    detail = pd.DataFrame({
+        'serie': np.repeat([key[0] for key in keys], horizon),
+        'modelo': np.repeat([key[1] for key in keys], horizon),
+        'origen': np.repeat(pd.DatetimeIndex([key[2] for key in keys]), horizon),
+        'horizonte': np.tile(np.arange(1, horizon + 1), len(keys)),
+        'ds': df_ts.index[positions],
+        'y': actual,
+        'yhat': np.asarray(predicted, dtype=np.float64).reshape(-1),
+    })
+    return (horizon_metrics(detail), detail,
+            pd.DataFrame(failures, columns=['serie', 'modelo', 'origen', 'error']))
+
+
+def horizon_metrics(detail):
+    """
+    Agrega los errores del detalle por serie, modelo y horizonte.
+
+    MAPE (en %) ignora los meses con valor real 0, que lo harían infinito.
+
+    Returns:
+        pandas.DataFrame: serie, modelo, horizonte, MAE, RMSE, MAPE y n_origenes
+    """
+    error = detail['y'] - detail['yhat']
+    y = detail['y'].to_numpy()
+    ape = np.full(len(y), np.nan)
+    np.divide(np.abs(error), np.abs(y), out=ape, where=y != 0)
+    errors = pd.DataFrame({
+        'abs': error.abs(),
+        'sq': error ** 2,
+        'ape': ape * 100,
+    })
+    grouped = errors.groupby([detail['serie'], detail['modelo'], detail['horizonte']], sort=True)
+    metrics = grouped.agg(MAE=('abs', 'mean'), MSE=('sq', 'mean'), MAPE=('ape', 'mean'),
+                          n_origenes=('abs', 'size'))
+    metrics.insert(1, 'RMSE', np.sqrt(metrics.pop('MSE')))
+    return metrics.reset_index()
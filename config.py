@@ -6,7 +6,18 @@ CLUSTERING_CONFIG = {
     'n_clusters': 3,
     'random_state': 42,
     'max_iter': 300,
-    'algorithm': 'k-medoids'
+    'algorithm': 'k-medoids',
+    'metric': 'euclidean',     # 'euclidean', 'manhattan' o 'gower'
+    'distance_dtype': 'float64',  # 'float32' reduce a la mitad la matriz de distancias
+    'init': 'build',           # BUILD de PAM (determinista) o 'random'
+    'memory_budget_mb': 512,   # Memoria máxima para bloques de distancias
+    'clara_samples': 5,        # Submuestras de CLARA (poblaciones grandes)
+    'clara_sample_size': None, # None: el mayor tamaño que cabe en memoria
+    'silhouette_mode': 'auto',       # 'exact', 'sampled', 'simplified' o 'auto'
+    'silhouette_exact_max_n': 5000,  # 'auto': silueta exacta hasta este tamaño
+    'silhouette_sample_size': 1000,  # PYMEs evaluadas en el modo 'sampled'
+    'n_jobs': None,                  # Procesos de las réplicas de estabilidad (None: automático)
+    'parallel_min_samples': 5000     # Con n_jobs None: pool de procesos desde este número de PYMEs
 }
 
 # Parámetros de Prophet
@@ -18,6 +29,58 @@ PROPHET_CONFIG = {
     'interval_width': 0.95
 }
 
+# Agregación de transacciones por PYME (ver feature_aggregation.py)
+AGGREGATION_CONFIG = {
+    'transactions_path': 'BD_EMPRESA_PYME.xlsx',
+    'output_path': 'pymes_agregadas.csv',
+    'chunksize': 100_000        # Transacciones por bloque
+}
+
+# Asignación de clústeres a PYMEs nuevas (ver scoring.py)
+SCORING_CONFIG = {
+    'label_column': 'cluster_kmedoids',
+    'chunk_size': 50_000        # PYMEs por bloque
+}
+
+# Entrenamiento de los pronósticos por clúster (ver forecasting.py)
+FORECAST_CONFIG = {
+    'test_size': 6,             # Meses reservados para la evaluación
+    'end_date': '2026-12-31',   # Último mes pronosticado
+    'n_jobs': None,             # Procesos del pool (None: todos los núcleos)
+    'cluster_model': 'prophet', # 'prophet' o un método de STATISTICAL_FORECAST_CONFIG
+    'pyme_model': 'auto',       # Método para las series por PYME
+    'reconciliation': 'mint',   # 'bottom_up', 'top_down' o 'mint' (ver reconciliation.py)
+    'reconciliation_weights': 'structural',  # W de MinT: 'ols', 'structural' o 'variance'
+    'cache_dir': 'artefactos/cache_pronosticos',
+    'cache_max_entries': 64,    # Pronósticos guardados como máximo (LRU)
+    'cache_max_mb': 256         # Tamaño máximo de la caché en disco
+}
+
+# Pronósticos estadísticos por lotes (ver statistical_forecast.py)
+STATISTICAL_FORECAST_CONFIG = {
+    'method': 'auto',           # 'seasonal_naive', 'drift', 'holt_winters' o 'auto'
+    'season_length': 12,
+    'holdout': 6,               # 'auto': meses de validación para elegir el método
+    'alphas': (0.1, 0.3, 0.5, 0.7, 0.9),
+    'betas': (0.0, 0.05, 0.2),
+    'gammas': (0.0, 0.1, 0.3, 0.5),
+    'memory_budget_mb': 256     # Memoria máxima de la búsqueda por bloque de series
+}
+
+# Backtesting con origen móvil (ver backtesting.py)
+BACKTEST_CONFIG = {
+    'horizon': 6,               # Meses pronosticados desde cada origen
+    'initial': 18,              # Meses de entrenamiento del primer origen
+    'step': 1,                  # Meses entre orígenes
+    'window': 'expanding'       # 'expanding' o 'sliding'
+}
+
+# Detección de outliers (ver outliers.py)
+OUTLIER_CONFIG = {
+    'factor': 1.5,              # Límites Q1 - factor·IQR y Q3 + factor·IQR
+    'sketch_k': 200             # Tamaño de los sketches KLL (error de rango ~1/k)
+}
+
 # Configuración del Dashboard
 DASHBOARD_CONFIG = {
     'page_title': 'Dashboard PYMEs - Análisis Clustering',
@@ -27,12 +90,16 @@ DASHBOARD_CONFIG = {
 }
 
 # Rutas de archivos
+# 'store' es el almacén columnar (ver artifact_store.py); cada CSV se busca
+# primero allí por su nombre base y, si no existe, se lee el CSV.
 FILE_PATHS = {
+    'store': 'artefactos',
     'clusters': 'pymes_con_clusters.csv',
     'historical': 'ts_mensual_historico.csv',
     'summary': 'kmedoids_summary.csv',
     'mapping': 'mapeo_pymes.csv',
     'pca_data': 'X_procesado_para_pca.csv',
+    'combined': 'combined_time_series_data.csv',
     'forecasts': {
         0: 'pronostico_prophet_cluster_0.csv',
         1: 'pronostico_prophet_cluster_1.csv',
@@ -0,0 +1,183 @@
+"""
+Caché de datos por artefacto
+============================
+
+Este módulo mantiene en memoria una copia compartida (de solo lectura) de
+cada tabla de FILE_PATHS, identificada por la huella del archivo de origen
+(mtime, tamaño y hash de contenido). Cuando un archivo cambia solo se
+recarga ese artefacto; el resto de tablas sigue sirviéndose desde memoria.
+
+En el dashboard se crea una única instancia por proceso (``st.cache_resource``),
+de modo que todas las sesiones comparten los mismos DataFrames en lugar de
+recibir cada una una copia serializada.
+"""
+
+import hashlib
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from config import FILE_PATHS
+from artifact_store import MANIFEST_NAME, artifact_name, has_artifact, load_artifact
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    """Calcula el hash SHA-1 del contenido de un archivo."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _freeze(df):
+    """
+    Devuelve el DataFrame con sus columnas NumPy marcadas como solo lectura.
+
+    Las tablas abiertas desde el almacén ya son memory maps de solo lectura;
+    las leídas desde CSV se copian una única vez a arrays inmutables.
+    """
+    data = {}
+    for position, column in enumerate(df.columns):
+        values = df.iloc[:, position]
+        if isinstance(values.dtype, np.dtype) and values.dtype != object:
+            array = values.to_numpy(copy=True)
+            array.flags.writeable = False
+            data[column] = array
+        else:
+            data[column] = values.array
+    frozen = pd.DataFrame(data, index=df.index, copy=False)
+    frozen.columns = df.columns
+    return frozen
+
+
+def data_version(data):
+    """
+    Calcula una versión estable (hash) del contenido de un DataFrame o array.
+
+    Args:
+        data: pandas.DataFrame, pandas.Series o numpy.ndarray
+
+    Returns:
+        str: Hash SHA-1 de los valores (y de los nombres de columna)
+    """
+    digest = hashlib.sha1()
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        if isinstance(data, pd.DataFrame):
+            digest.update(repr(list(data.columns)).encode('utf-8'))
+    else:
+        array = np.ascontiguousarray(data)
+        digest.update(repr((array.dtype.str, array.shape)).encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _source_path(file_paths, key, cluster_id=None):
+    """Archivo que respalda el artefacto: manifiesto del almacén o CSV."""
+    csv_path = file_paths[key] if cluster_id is None else file_paths[key][cluster_id]
+    store_dir = file_paths['store']
+    name = artifact_name(csv_path)
+    if has_artifact(name, store_dir):
+        return os.path.join(store_dir, name, MANIFEST_NAME)
+    return csv_path
+
+
+def source_version(key, cluster_id=None, file_paths=None):
+    """
+    Hash de contenido del archivo que respalda un artefacto; coincide con
+    ``ArtifactCache.version`` sin cargar la tabla.
+
+    Raises:
+        FileNotFoundError: Si el artefacto no existe
+    """
+    return _file_hash(_source_path(file_paths or FILE_PATHS, key, cluster_id))
+
+
+class ArtifactCache:
+    """
+    Caché de artefactos de FILE_PATHS con recarga incremental.
+
+    Args:
+        file_paths: Diccionario de rutas (por defecto FILE_PATHS)
+        postprocess: Diccionario clave -> función aplicada al DataFrame
+            recién cargado (p. ej. normalizar nombres de columnas)
+    """
+
+    def __init__(self, file_paths=None, postprocess=None):
+        self.file_paths = file_paths or FILE_PATHS
+        self.postprocess = postprocess or {}
+        self.loads = Counter()
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _source_path(self, key, cluster_id=None):
+        return _source_path(self.file_paths, key, cluster_id)
+
+    def fingerprint(self, key, cluster_id=None):
+        """
+        Calcula la huella (ruta, mtime, tamaño) del archivo de origen.
+
+        Returns:
+            tuple: Huella barata basada en ``os.stat``
+        """
+        path = self._source_path(key, cluster_id)
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, key, cluster_id=None):
+        """
+        Devuelve el DataFrame de un artefacto, recargándolo solo si cambió.
+
+        Si el ``stat`` del archivo cambia pero el hash de su contenido es el
+        mismo (p. ej. un ``touch``), se reutiliza la tabla en memoria.
+
+        Args:
+            key: Clave de FILE_PATHS (p. ej. 'clusters', 'forecasts')
+            cluster_id: Clúster para las claves anidadas ('forecasts')
+
+        Returns:
+            pandas.DataFrame: Tabla compartida; no debe modificarse
+        """
+        entry_key = (key, cluster_id)
+        stat_fp = self.fingerprint(key, cluster_id)
+
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry['stat'] == stat_fp:
+                return entry['frame']
+
+            content_hash = _file_hash(stat_fp[0])
+            if entry is not None and entry['hash'] == content_hash:
+                entry['stat'] = stat_fp
+                return entry['frame']
+
+            df = load_artifact(key, cluster_id=cluster_id, file_paths=self.file_paths)
+            if key in self.postprocess:
+                df = self.postprocess[key](df)
+            if not stat_fp[0].endswith(MANIFEST_NAME):
+                df = _freeze(df)
+
+            self._entries[entry_key] = {'stat': stat_fp, 'hash': content_hash, 'frame': df}
+            self.loads[entry_key] += 1
+            return df
+
+    def version(self, key, cluster_id=None):
+        """
+        Devuelve el hash de contenido del artefacto cargado (versión de datos).
+        """
+        self.get(key, cluster_id)
+        return self._entries[(key, cluster_id)]['hash']
+
+    def invalidate(self, key=None, cluster_id=None):
+        """
+        Descarta una entrada (o todas si ``key`` es None).
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((key, cluster_id), None)
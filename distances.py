@@ -0,0 +1,222 @@
+"""
+Motor de distancias por bloques
+===============================
+
+Este módulo calcula distancias entre filas (euclídea, manhattan o Gower
+para datos numéricos) procesando bloques de filas cuyo tamaño se ajusta a
+un presupuesto de memoria, opcionalmente en float32.
+
+Gower normaliza cada columna por su rango. Los rangos se ajustan una vez
+sobre los datos de entrenamiento (``gower_ranges``) y se pasan a cada
+llamada: así la distancia entre dos filas no depende del lote en que se
+calcula (p. ej. al asignar una PYME nueva a los medoides).
+
+``distance_matrix`` puede guardar la matriz completa en un archivo ``.npy``
+mapeado en memoria, identificado por la versión de los datos, para que el
+barrido de k, la búsqueda de medoides y el cálculo de la silueta reutilicen
+una sola matriz en lugar de recalcularla cada uno.
+"""
+
+import os
+import uuid
+
+import numpy as np
+
+from config import CLUSTERING_CONFIG
+from data_cache import data_version
+
+METRICS = ('euclidean', 'manhattan', 'gower')
+
+
+def _budget_mb(memory_budget_mb):
+    return memory_budget_mb or CLUSTERING_CONFIG.get('memory_budget_mb', 512)
+
+
+def block_rows_for(n_rows, n_cols, memory_budget_mb=None, itemsize=8, temporaries=3):
+    """
+    Calcula cuántas filas de un bloque (filas × n_cols) caben en el presupuesto.
+
+    Args:
+        n_rows: Filas totales a procesar
+        n_cols: Columnas de cada bloque de distancias
+        memory_budget_mb: Memoria disponible (por defecto CLUSTERING_CONFIG)
+        itemsize: Bytes por elemento
+        temporaries: Número de matrices temporales del tamaño del bloque
+
+    Returns:
+        int: Filas por bloque (al menos 1)
+    """
+    budget = _budget_mb(memory_budget_mb) * 1024 * 1024
+    rows = int(budget // max(1, n_cols * itemsize * temporaries))
+    return int(min(max(rows, 1), max(n_rows, 1)))
+
+
+def gower_ranges(X):
+    """
+    Rango (máximo - mínimo) de cada columna de los datos de entrenamiento.
+
+    Returns:
+        numpy.ndarray: Rangos (d,) en float64 para ``metric='gower'``
+    """
+    X = np.asarray(X, dtype=np.float64)
+    return X.max(axis=0) - X.min(axis=0)
+
+
+def metric_ranges(X, metric):
+    """Rangos de ``gower_ranges`` si la métrica es Gower; None en otro caso."""
+    return gower_ranges(X) if metric == 'gower' else None
+
+
+def _gower_scale(ranges):
+    """Inverso del rango de cada columna (0 si la columna es constante)."""
+    ranges = np.asarray(ranges, dtype=np.float64)
+    scale = np.zeros_like(ranges)
+    np.divide(1.0, ranges, out=scale, where=ranges > 0)
+    return scale
+
+
+def _block_distances(Xb, Y, metric, Y_sq_norms=None):
+    if metric == 'euclidean':
+        X_sq = np.einsum('ij,ij->i', Xb, Xb)
+        block = Xb @ Y.T
+        block *= -2
+        block += X_sq[:, None]
+        block += Y_sq_norms[None, :]
+        np.maximum(block, 0, out=block)
+        return np.sqrt(block, out=block)
+    # manhattan y gower (ya escalado): suma de diferencias absolutas
+    return np.abs(Xb[:, None, :] - Y[None, :, :]).sum(axis=2)
+
+
+def iter_distance_blocks(X, Y=None, metric='euclidean', dtype=np.float64, memory_budget_mb=None,
+                         ranges=None):
+    """
+    Genera las distancias de X a Y por bloques de filas de X.
+
+    Args:
+        X: Datos (n, d)
+        Y: Datos (m, d); si es None se usa X
+        metric: 'euclidean', 'manhattan' o 'gower' (Gower numérico: manhattan
+            con columnas normalizadas por su rango y dividido por d)
+        dtype: Tipo de los cálculos y del resultado (float64 o float32)
+        memory_budget_mb: Memoria máxima por bloque (por defecto CLUSTERING_CONFIG)
+        ranges: Rangos de ``gower_ranges`` ajustados en el entrenamiento; si
+            es None solo se admite Y=None y se usan los rangos de X
+
+    Yields:
+        tuple: (inicio, fin, bloque) con bloque de forma (fin - inicio, m)
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Métrica no soportada: {metric}. Opciones: {METRICS}")
+
+    dtype = np.dtype(dtype)
+    same = Y is None
+    # X se convierte bloque a bloque para no copiarlo entero (puede ser un memmap)
+    X = np.asarray(X)
+    Y = np.asarray(X if same else Y, dtype=dtype)
+    n, m, d = X.shape[0], Y.shape[0], X.shape[1]
+
+    if metric == 'gower':
+        if ranges is None:
+            if not same:
+                raise ValueError("Gower entre dos conjuntos necesita los rangos del "
+                                 "entrenamiento (ver gower_ranges)")
+            ranges = gower_ranges(Y)
+        scale = (_gower_scale(ranges) / max(d, 1)).astype(dtype)
+        Y = Y * scale
+    Y_sq_norms = np.einsum('ij,ij->i', Y, Y) if metric == 'euclidean' else None
+
+    # manhattan/gower crean un temporal (filas, m, d)
+    width = m if metric == 'euclidean' else m * d
+    rows = block_rows_for(n, width, memory_budget_mb, itemsize=dtype.itemsize)
+
+    for start in range(0, n, rows):
+        stop = min(start + rows, n)
+        Xb = np.asarray(X[start:stop], dtype=dtype)
+        if metric == 'gower':
+            Xb = Xb * scale
+        block = _block_distances(Xb, Y, metric, Y_sq_norms)
+        if same:
+            # La distancia de un punto a sí mismo es exactamente 0
+            diagonal = np.arange(start, stop)
+            block[diagonal - start, diagonal] = 0
+        yield start, stop, block
+
+
+def pairwise_distances_blocked(X, Y=None, metric='euclidean', dtype=np.float64,
+                               memory_budget_mb=None, out=None, ranges=None):
+    """
+    Calcula la matriz de distancias completa llenándola por bloques.
+
+    Args:
+        X: Datos (n, d)
+        Y: Datos (m, d); si es None se usa X
+        metric: 'euclidean', 'manhattan' o 'gower'
+        dtype: float64 o float32
+        memory_budget_mb: Memoria máxima por bloque (por defecto CLUSTERING_CONFIG)
+        out: Array (n, m) de destino opcional (p. ej. un memmap)
+        ranges: Rangos de Gower (ver ``iter_distance_blocks``)
+
+    Returns:
+        numpy.ndarray: Matriz de distancias (n, m)
+    """
+    n = np.shape(X)[0]
+    m = n if Y is None else np.shape(Y)[0]
+    if out is None:
+        out = np.empty((n, m), dtype=dtype)
+    for start, stop, block in iter_distance_blocks(X, Y, metric, dtype, memory_budget_mb, ranges):
+        out[start:stop] = block
+    return out
+
+
+def distance_matrix(X, metric=None, dtype=None, memory_budget_mb=None, cache_dir=None,
+                    ranges=None):
+    """
+    Devuelve la matriz de distancias de X, reutilizando la copia en disco.
+
+    Con ``cache_dir`` la matriz se escribe por bloques en un ``.npy`` (sin
+    tenerla entera en memoria) cuyo nombre depende de la versión de X, la
+    métrica y el tipo (y de los rangos de Gower); las llamadas siguientes la
+    abren con memory mapping.
+
+    Args:
+        X: Datos (n, d)
+        metric: Métrica (por defecto CLUSTERING_CONFIG['metric'])
+        dtype: Tipo (por defecto CLUSTERING_CONFIG['distance_dtype'])
+        memory_budget_mb: Memoria máxima por bloque (por defecto CLUSTERING_CONFIG)
+        cache_dir: Directorio de la caché; si es None se calcula en memoria
+        ranges: Rangos de Gower (por defecto los de X)
+
+    Returns:
+        numpy.ndarray: Matriz (n, n); un memmap de solo lectura si hay caché
+    """
+    metric = metric or CLUSTERING_CONFIG.get('metric', 'euclidean')
+    dtype = np.dtype(dtype or CLUSTERING_CONFIG.get('distance_dtype', 'float64'))
+    X = np.asarray(X)
+    if metric == 'gower' and ranges is None:
+        ranges = gower_ranges(X)
+
+    if cache_dir is None:
+        return pairwise_distances_blocked(X, metric=metric, dtype=dtype,
+                                          memory_budget_mb=memory_budget_mb, ranges=ranges)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    key = f"{data_version(np.asarray(X, dtype=np.float64))[:16]}_{metric}_{dtype.name}"
+    if ranges is not None:
+        key += f"_{data_version(np.asarray(ranges, dtype=np.float64))[:8]}"
+    path = os.path.join(cache_dir, f'distancias_{key}.npy')
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}.npy"
+        n = X.shape[0]
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(n, n))
+        try:
+            pairwise_distances_blocked(X, metric=metric, dtype=dtype,
+                                       memory_budget_mb=memory_budget_mb, out=out, ranges=ranges)
+            out.flush()
+            del out
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return np.load(path, mmap_mode='r')
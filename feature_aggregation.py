@@ -0,0 +1,615 @@
+"""
+Agregación de transacciones por PYME
+====================================
+
+Este módulo reemplaza el paso del notebook que lee todo
+``BD_EMPRESA_PYME.xlsx`` en memoria y agrupa por ``numerodoi``. Las
+transacciones se leen por bloques (CSV, Parquet o Excel) y cada bloque se
+reduce a agregados parciales por PYME que se combinan con los anteriores:
+
+- sumas y conteos (no nulos) de las columnas numéricas,
+- conteo, mínimo y máximo de ``fecha``,
+- pares (PYME, producto) distintos para ``numero_productos_unicos``,
+- conteos dispersos por (PYME, valor) de las columnas categóricas, cuyas
+  modas se calculan con ``grouped_mode``.
+
+El estado crece con el número de PYMEs, productos distintos y categorías,
+no con el volumen de transacciones. Dos agregadores se pueden combinar
+(``merge``), por lo que los bloques pueden procesarse por separado. El
+resultado tiene el mismo esquema que ``pymes_con_clusters.csv`` (sin las
+columnas de clúster).
+
+Los estadísticos se guardan en el almacén en una base SQLite con una fila
+por PYME y por par (PYME, producto): ``update_features`` aplica las
+transacciones nuevas (p. ej. las de un día) leyendo y escribiendo solo las
+PYMEs afectadas.
+"""
+
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from config import AGGREGATION_CONFIG, FILE_PATHS
+
+# Columnas numéricas: (suma, media) del notebook
+NUMERIC_COLUMNS = ('precioventa', 'cantidad', 'valorunit', 'preciounit')
+
+# Columnas categóricas y nombre de su moda en la tabla de PYMEs
+MODE_COLUMNS = {
+    'metodo_pago': 'metodo_pago_preferido',
+    'tipo_moneda': 'moneda_preferida',
+    'vendedor': 'vendedor_principal',
+    'estado': 'estado_comun',
+    'unid': 'unidad_comun',
+}
+
+TRANSACTION_COLUMNS = ['numerodoi', 'fecha', 'descripcion', *NUMERIC_COLUMNS, *MODE_COLUMNS]
+
+PYME_COLUMNS = [
+    'numerodoi', 'ingresos_totales', 'ticket_promedio', 'cantidad_total',
+    'cantidad_promedio_venta', 'numero_transacciones', 'fecha_primera_venta',
+    'fecha_ultima_venta', 'numero_productos_unicos', 'valor_unitario_promedio',
+    'precio_unitario_promedio', 'metodo_pago_preferido', 'moneda_preferida',
+    'vendedor_principal', 'estado_comun', 'unidad_comun', 'periodo_actividad_dias',
+]
+
+PYME_STATE_ARTIFACT = 'pymes_estadisticos'
+
+
+def read_transaction_chunks(path, chunksize=None, columns=None):
+    """
+    Lee un archivo de transacciones por bloques.
+
+    Args:
+        path: Ruta a un archivo .csv, .parquet o .xlsx
+        chunksize: Filas por bloque (por defecto AGGREGATION_CONFIG)
+        columns: Columnas a leer (por defecto TRANSACTION_COLUMNS)
+
+    Yields:
+        pandas.DataFrame: Bloque de transacciones
+    """
+    chunksize = chunksize or AGGREGATION_CONFIG['chunksize']
+    columns = list(columns or TRANSACTION_COLUMNS)
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+    elif extension == '.parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif extension in ('.xlsx', '.xlsm'):
+        yield from _read_excel_chunks(path, chunksize, columns)
+    else:
+        raise ValueError(f"Formato de transacciones no soportado: {extension}")
+
+
+def _read_excel_chunks(path, chunksize, columns):
+    """Lee la primera hoja en modo streaming (openpyxl read_only)."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name) for name in next(rows)]
+        missing = set(columns) - set(header)
+        if missing:
+            raise KeyError(f"Columnas ausentes en {path}: {sorted(missing)}")
+        positions = [header.index(column) for column in columns]
+
+        buffer = []
+        for row in rows:
+            buffer.append([row[position] for position in positions])
+            if len(buffer) == chunksize:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def grouped_mode(df, by, columns, weights=None):
+    """
+    Moda por grupo de varias columnas categóricas en una sola pasada.
+
+    Sustituye a ``groupby(by).agg(obtener_moda)``: los valores de cada
+    columna se codifican como enteros ordenados, se combinan con el código
+    del grupo y de la columna en una única clave, y una sola ordenación
+    (``np.unique``) da los conteos de todos los (columna, grupo, valor). En
+    caso de empate gana el menor valor, igual que ``Series.mode()[0]``; los
+    nulos no cuentan y un grupo sin valores devuelve NaN.
+
+    Args:
+        df: DataFrame con la columna de grupo y las categóricas
+        by: Columna de grupo (p. ej. 'numerodoi')
+        columns: Columnas de las que calcular la moda
+        weights: Columna o array de pesos (p. ej. conteos ya agregados);
+            por defecto cada fila cuenta 1
+
+    Returns:
+        pandas.DataFrame: Una fila por grupo (índice ordenado) y una columna
+            por cada columna de ``columns``
+    """
+    columns = list(columns)
+    group_codes, groups = pd.factorize(df[by], sort=True)
+    n_groups = len(groups)
+    if isinstance(weights, str):
+        weights = df[weights].to_numpy()
+
+    keys, row_weights, uniques = [], [], []
+    offsets = [0]
+    for position, column in enumerate(columns):
+        value_codes, values = pd.factorize(df[column], sort=True)
+        n_values = max(len(values), 1)
+        valid = (value_codes >= 0) & (group_codes >= 0)
+        keys.append(offsets[-1] + group_codes[valid].astype(np.int64) * n_values + value_codes[valid])
+        if weights is not None:
+            row_weights.append(np.asarray(weights)[valid])
+        uniques.append(values)
+        offsets.append(offsets[-1] + n_groups * n_values)
+
+    keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate(row_weights) if row_weights else None)
+
+    # Decodificar (columna, grupo, valor) de cada clave
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_values = np.asarray([max(len(values), 1) for values in uniques], dtype=np.int64)
+    column_of_key = np.searchsorted(offsets, unique_keys, side='right') - 1
+    local = unique_keys - offsets[column_of_key]
+    group_of_key = local // n_values[column_of_key]
+    value_of_key = local % n_values[column_of_key]
+
+    # Primero por (columna, grupo); dentro, mayor conteo y después menor valor
+    order = np.lexsort((value_of_key, -counts, group_of_key, column_of_key))
+    column_sorted = column_of_key[order]
+    group_sorted = group_of_key[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (column_sorted[1:] != column_sorted[:-1]) | (group_sorted[1:] != group_sorted[:-1])
+    winners = order[first]
+
+    result = pd.DataFrame(index=pd.Index(groups, name=by))
+    for position, column in enumerate(columns):
+        selected = winners[column_of_key[winners] == position]
+        codes = np.full(n_groups, -1, dtype=np.int64)
+        codes[group_of_key[selected]] = value_of_key[selected]
+        result[column] = pd.Series(uniques[position].array.take(codes, allow_fill=True),
+                                   index=result.index)
+    return result
+
+
+def _fill_value(dtype):
+    return np.datetime64('NaT') if dtype.kind == 'M' else 0
+
+
+def _native(value):
+    """Escalar de NumPy a tipo nativo (sqlite3 no adapta los de NumPy)."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Estadísticos por PYME: nombre -> tipo en memoria
+STATE_FIELDS = {
+    **{f'{column}_sum': np.float64 for column in NUMERIC_COLUMNS},
+    **{f'{column}_count': np.int64 for column in NUMERIC_COLUMNS},
+    'fecha_count': np.int64,
+    'fecha_min': 'datetime64[ns]',
+    'fecha_max': 'datetime64[ns]',
+    'productos': np.int64,
+}
+
+
+class PymeAggregator:
+    """
+    Estadísticos suficientes por PYME que se actualizan bloque a bloque.
+
+    El estado se guarda en arrays con una fila por PYME (sumas, conteos,
+    fechas mínima y máxima y número de productos distintos), el conjunto
+    exacto de pares (PYME, producto) y, por cada columna categórica, un
+    contador disperso PYME -> {valor: conteo}, de modo que el estado crece
+    con los valores que aparecen en cada PYME y no con PYMEs × categorías.
+    Aplicar un bloque solo toca las filas de las PYMEs que aparecen en él.
+
+    ``save`` y ``load`` persisten el estado en una base SQLite del almacén
+    con una fila por PYME y por par, así que una actualización diaria lee y
+    escribe solo las PYMEs del delta (ver ``update_features``).
+
+    Uso::
+
+        aggregator = PymeAggregator()
+        for chunk in read_transaction_chunks('BD_EMPRESA_PYME.csv'):
+            aggregator.update(chunk)
+        df_pymes = aggregator.result()
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._ids = []
+        self._capacity = 0
+        self._arrays = {'productos': np.zeros(0, dtype=np.int64)}
+        self._products = set()
+        self._counts = {column: {} for column in MODE_COLUMNS}
+        self.n_transactions = 0
+
+    @property
+    def n_pymes(self):
+        return len(self._ids)
+
+    def _grow(self, n_rows):
+        """Amplía los arrays (al doble) para que quepan n_rows filas."""
+        if n_rows <= self._capacity:
+            return
+        capacity = max(n_rows, 2 * self._capacity, 64)
+        for name, array in self._arrays.items():
+            grown = np.full(capacity, _fill_value(array.dtype), dtype=array.dtype)
+            grown[:len(array)] = array
+            self._arrays[name] = grown
+        self._capacity = capacity
+
+    def _locate(self, ids):
+        """Filas de las PYMEs (creando las nuevas al final)."""
+        rows = np.empty(len(ids), dtype=np.int64)
+        for position, pyme in enumerate(ids):
+            row = self._rows.get(pyme)
+            if row is None:
+                row = self._rows[pyme] = len(self._ids)
+                self._ids.append(pyme)
+            rows[position] = row
+        self._grow(len(self._ids))
+        return rows
+
+    def _add(self, name, rows, values, reducer=np.add):
+        values = np.asarray(values)
+        array = self._arrays.get(name)
+        if array is None:
+            array = self._arrays[name] = np.full(self._capacity, _fill_value(values.dtype),
+                                                 dtype=values.dtype)
+        elif np.result_type(array.dtype, values.dtype) != array.dtype:
+            array = self._arrays[name] = array.astype(np.result_type(array.dtype, values.dtype))
+        array[rows] = reducer(array[rows], values.astype(array.dtype))
+
+    def _apply(self, ids, numeric, products, categories):
+        """
+        Suma unos estadísticos parciales al estado.
+
+        Args:
+            ids: PYMEs (sin repetir) de ``numeric``
+            numeric: Diccionario columna de estado -> valores alineados con ids
+            products: Pares (PYME, producto) distintos
+            categories: Columna -> (PYMEs, valores, conteos)
+        """
+        rows = self._locate(ids)
+        for name, values in numeric.items():
+            reducer = np.fmin if name == 'fecha_min' else np.fmax if name == 'fecha_max' else np.add
+            self._add(name, rows, values, reducer)
+
+        product_counts = self._arrays['productos']
+        for pyme, product in products:
+            key = (self._rows[pyme], str(product))
+            if key not in self._products:
+                self._products.add(key)
+                product_counts[key[0]] += 1
+
+        for column, (pymes, values, counts) in categories.items():
+            column_counts = self._counts[column]
+            for pyme, value, count in zip(pymes, values, counts):
+                bucket = column_counts.setdefault(self._rows[pyme], {})
+                value = _native(value)
+                bucket[value] = bucket.get(value, 0) + int(count)
+        return ids
+
+    def update(self, chunk):
+        """
+        Incorpora un bloque de transacciones.
+
+        Args:
+            chunk: DataFrame con las columnas de TRANSACTION_COLUMNS
+
+        Returns:
+            list: PYMEs afectadas por el bloque
+        """
+        chunk = chunk.dropna(subset=['numerodoi'])
+        self.n_transactions += len(chunk)
+        grouped = chunk.groupby('numerodoi', sort=False)
+        ids = grouped.size().index
+
+        numeric = {}
+        for column in NUMERIC_COLUMNS:
+            numeric[f'{column}_sum'] = grouped[column].sum().reindex(ids).to_numpy()
+            numeric[f'{column}_count'] = grouped[column].count().reindex(ids).to_numpy()
+        fechas = pd.to_datetime(chunk['fecha']).groupby(chunk['numerodoi'], sort=False)
+        numeric['fecha_count'] = fechas.count().reindex(ids).to_numpy()
+        numeric['fecha_min'] = fechas.min().reindex(ids).to_numpy().astype('datetime64[ns]')
+        numeric['fecha_max'] = fechas.max().reindex(ids).to_numpy().astype('datetime64[ns]')
+
+        products = chunk[['numerodoi', 'descripcion']].dropna().drop_duplicates()
+        categories = {}
+        for column in MODE_COLUMNS:
+            counts = chunk.groupby(['numerodoi', column], sort=False).size()
+            categories[column] = (counts.index.get_level_values(0), counts.index.get_level_values(1),
+                                  counts.to_numpy())
+
+        return list(self._apply(list(ids), numeric,
+                                zip(products['numerodoi'], products['descripcion']), categories))
+
+    def _category_entries(self, column, rows):
+        """Triples (fila, valor, conteo) del contador de una columna."""
+        column_counts = self._counts[column]
+        return [(row, value, count) for row in rows
+                for value, count in column_counts.get(row, {}).items()]
+
+    def _state(self, rows=None):
+        """Estado de las filas indicadas (por defecto todas las PYMEs)."""
+        rows = np.arange(self.n_pymes) if rows is None else np.asarray(rows, dtype=np.int64)
+        numeric = {name: array[rows] for name, array in self._arrays.items() if name != 'productos'}
+        categories = {}
+        for column in MODE_COLUMNS:
+            entries = self._category_entries(column, rows.tolist())
+            categories[column] = ([self._ids[row] for row, _, _ in entries],
+                                  [value for _, value, _ in entries],
+                                  [count for _, _, count in entries])
+        return numeric, categories
+
+    def merge(self, other):
+        """
+        Combina los estadísticos de otro agregador (p. ej. de otro archivo).
+
+        Returns:
+            PymeAggregator: El propio agregador
+        """
+        if other.n_pymes:
+            numeric, categories = other._state()
+            products = ((other._ids[row], product) for row, product in other._products)
+            self._apply(list(other._ids), numeric, products, categories)
+            self.n_transactions += other.n_transactions
+        return self
+
+    def _modes(self, rows):
+        """
+        Moda de cada columna categórica en las filas indicadas con
+        ``grouped_mode`` sobre los conteos (en empate, el menor valor).
+        """
+        modes = pd.DataFrame(index=pd.Index(rows, name='fila'))
+        for column in MODE_COLUMNS:
+            entries = self._category_entries(column, rows)
+            if not entries:
+                modes[column] = np.nan
+                continue
+            counts = pd.DataFrame(entries, columns=['fila', column, 'conteo'])
+            modes[column] = grouped_mode(counts, 'fila', [column], weights='conteo')[column]
+        return modes
+
+    def result(self, ids=None):
+        """
+        Calcula las características por PYME.
+
+        Args:
+            ids: PYMEs a calcular (por defecto todas), p. ej. las devueltas
+                por ``update`` para refrescar solo las afectadas
+
+        Returns:
+            pandas.DataFrame: Una fila por PYME con las columnas PYME_COLUMNS,
+                ordenada por ``numerodoi``
+        """
+        if not self.n_pymes:
+            return pd.DataFrame(columns=PYME_COLUMNS)
+
+        if ids is None:
+            ids = sorted(self._ids)
+        else:
+            ids = sorted(set(ids))
+        rows = np.fromiter((self._rows[pyme] for pyme in ids), dtype=np.int64, count=len(ids))
+        state = {name: array[rows] for name, array in self._arrays.items()}
+
+        df = pd.DataFrame({'numerodoi': ids})
+        df['ingresos_totales'] = state['precioventa_sum']
+        df['ticket_promedio'] = state['precioventa_sum'] / state['precioventa_count']
+        df['cantidad_total'] = state['cantidad_sum']
+        df['cantidad_promedio_venta'] = state['cantidad_sum'] / state['cantidad_count']
+        df['numero_transacciones'] = state['fecha_count']
+        df['fecha_primera_venta'] = state['fecha_min']
+        df['fecha_ultima_venta'] = state['fecha_max']
+        df['numero_productos_unicos'] = state['productos']
+        df['valor_unitario_promedio'] = state['valorunit_sum'] / state['valorunit_count']
+        df['precio_unitario_promedio'] = state['preciounit_sum'] / state['preciounit_count']
+        modes = self._modes(rows.tolist())
+        for column, name in MODE_COLUMNS.items():
+            df[name] = pd.Series(modes[column].to_numpy(dtype=object)).infer_objects()
+        df['periodo_actividad_dias'] = (df['fecha_ultima_venta'] - df['fecha_primera_venta']).dt.days
+        return df[PYME_COLUMNS]
+
+    @staticmethod
+    def _state_path(store_dir=None, name=None):
+        return os.path.join(store_dir or FILE_PATHS['store'], f'{name or PYME_STATE_ARTIFACT}.sqlite')
+
+    def save(self, store_dir=None, name=None, ids=None):
+        """
+        Guarda los estadísticos suficientes en el almacén (SQLite, una fila
+        por PYME, por par (PYME, producto) y por (columna, PYME, valor)).
+
+        Args:
+            store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+            name: Nombre del estado (por defecto PYME_STATE_ARTIFACT)
+            ids: PYMEs a escribir (p. ej. las de un delta); por defecto se
+                reemplaza el estado completo
+        """
+        path = self._state_path(store_dir, name)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if ids is None:
+            rows = np.arange(self.n_pymes)
+        else:
+            rows = np.fromiter((self._rows[pyme] for pyme in set(ids)), dtype=np.int64)
+
+        fields = list(STATE_FIELDS)
+        records = []
+        for row in rows.tolist():
+            record = [_native(self._ids[row])]
+            for field in fields:
+                value = self._arrays[field][row] if field in self._arrays else _fill_value(
+                    np.dtype(STATE_FIELDS[field]))
+                if np.dtype(STATE_FIELDS[field]).kind == 'M':
+                    value = None if np.isnat(value) else int(np.datetime64(value, 'ns').astype(np.int64))
+                else:
+                    value = _native(value)
+                record.append(value)
+            records.append(record)
+        selected = set(rows.tolist())
+        products = [(_native(self._ids[row]), product) for row, product in self._products
+                    if row in selected]
+        categories = [(column, _native(self._ids[row]), value, count)
+                      for column in MODE_COLUMNS
+                      for row, value, count in self._category_entries(column, rows.tolist())]
+
+        with _connect(path) as connection:
+            if ids is None:
+                for table in ('pymes', 'productos', 'categorias'):
+                    connection.execute(f'DELETE FROM {table}')
+            connection.executemany(
+                f"INSERT OR REPLACE INTO pymes (numerodoi, {', '.join(fields)}) "
+                f"VALUES ({', '.join('?' * (len(fields) + 1))})", records)
+            connection.executemany(
+                'INSERT OR IGNORE INTO productos (numerodoi, descripcion) VALUES (?, ?)', products)
+            connection.executemany(
+                'INSERT OR REPLACE INTO categorias (columna, numerodoi, valor, conteo) '
+                'VALUES (?, ?, ?, ?)', categories)
+            connection.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('n_transactions', ?)",
+                               (int(self.n_transactions),))
+        connection.close()
+
+    @classmethod
+    def load(cls, store_dir=None, name=None, ids=None):
+        """
+        Carga los estadísticos guardados con ``save``.
+
+        Args:
+            store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+            name: Nombre del estado (por defecto PYME_STATE_ARTIFACT)
+            ids: PYMEs a cargar (por defecto todas); las que no existen se
+                omiten
+
+        Returns:
+            PymeAggregator or None: Agregador, o None si aún no existe
+        """
+        path = cls._state_path(store_dir, name)
+        if not os.path.exists(path):
+            return None
+
+        fields = list(STATE_FIELDS)
+        with _connect(path) as connection:
+            if ids is None:
+                selection, join = '', ''
+            else:
+                connection.execute('CREATE TEMP TABLE seleccion (numerodoi PRIMARY KEY)')
+                connection.executemany('INSERT OR IGNORE INTO seleccion VALUES (?)',
+                                       [(_native(pyme),) for pyme in ids])
+                selection = 'JOIN seleccion USING (numerodoi)'
+            records = connection.execute(
+                f"SELECT numerodoi, {', '.join(fields)} FROM pymes {selection}").fetchall()
+            products = connection.execute(
+                f'SELECT numerodoi, descripcion FROM productos {selection}').fetchall()
+            categories = connection.execute(
+                f'SELECT columna, numerodoi, valor, conteo FROM categorias {selection}').fetchall()
+            meta = dict(connection.execute('SELECT clave, valor FROM meta').fetchall())
+        connection.close()
+
+        aggregator = cls()
+        aggregator._ids = [record[0] for record in records]
+        aggregator._rows = {pyme: row for row, pyme in enumerate(aggregator._ids)}
+        aggregator._capacity = len(records)
+        for position, field in enumerate(fields, start=1):
+            dtype = np.dtype(STATE_FIELDS[field])
+            values = [record[position] for record in records]
+            if dtype.kind == 'M':
+                values = np.array([np.iinfo(np.int64).min if value is None else value
+                                   for value in values], dtype=np.int64).view(dtype)
+            aggregator._arrays[field] = np.array(values, dtype=dtype)
+        rows = aggregator._rows
+        aggregator._products = {(rows[pyme], product) for pyme, product in products}
+        for column, pyme, value, count in categories:
+            aggregator._counts[column].setdefault(rows[pyme], {})[value] = count
+        aggregator.n_transactions = meta.get('n_transactions', 0)
+        return aggregator
+
+
+def _connect(path):
+    """Abre (creando el esquema si falta) la base SQLite del estado por PYME."""
+    connection = sqlite3.connect(path)
+    fields = ', '.join(STATE_FIELDS)
+    connection.executescript(f"""
+        CREATE TABLE IF NOT EXISTS pymes (numerodoi PRIMARY KEY, {fields});
+        CREATE TABLE IF NOT EXISTS productos (
+            numerodoi, descripcion, PRIMARY KEY (numerodoi, descripcion)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS categorias (
+            columna, numerodoi, valor, conteo,
+            PRIMARY KEY (columna, numerodoi, valor)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS categorias_pyme ON categorias (numerodoi);
+        CREATE TABLE IF NOT EXISTS meta (clave PRIMARY KEY, valor);
+    """)
+    return connection
+
+
+def aggregate_transactions(source, chunksize=None):
+    """
+    Agrega transacciones por PYME leyendo por bloques.
+
+    Args:
+        source: Ruta (.csv, .parquet, .xlsx), DataFrame o iterable de bloques
+        chunksize: Filas por bloque al leer archivos
+
+    Returns:
+        pandas.DataFrame: Características por PYME (esquema PYME_COLUMNS)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        chunks = read_transaction_chunks(os.fspath(source), chunksize=chunksize)
+    elif isinstance(source, pd.DataFrame):
+        chunks = [source]
+    else:
+        chunks = source
+
+    aggregator = PymeAggregator()
+    for chunk in chunks:
+        aggregator.update(chunk)
+    return aggregator.result()
+
+
+def update_features(delta, store_dir=None):
+    """
+    Aplica un lote de transacciones nuevas (p. ej. las de un día) a los
+    estadísticos guardados.
+
+    Solo se leen y se escriben las filas y los pares de las PYMEs que
+    aparecen en el delta, de modo que el costo es proporcional al delta y
+    no al historial.
+
+    Args:
+        delta: DataFrame (o ruta) con las transacciones nuevas
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+
+    Returns:
+        tuple: (características de las PYMEs afectadas, PYMEs afectadas)
+    """
+    if isinstance(delta, (str, os.PathLike)):
+        chunks = list(read_transaction_chunks(os.fspath(delta)))
+    else:
+        chunks = [delta]
+    ids = set()
+    for chunk in chunks:
+        ids.update(chunk['numerodoi'].dropna().unique().tolist())
+
+    aggregator = PymeAggregator.load(store_dir, ids=ids) or PymeAggregator()
+    touched = set()
+    for chunk in chunks:
+        touched.update(aggregator.update(chunk))
+    aggregator.save(store_dir, ids=touched)
+    return aggregator.result(touched), sorted(touched)
+
+
+if __name__ == '__main__':
+    origen = AGGREGATION_CONFIG['transactions_path']
+    df_pymes = aggregate_transactions(origen)
+    df_pymes.to_csv(AGGREGATION_CONFIG['output_path'], index=False)
+    print(f"{len(df_pymes)} PYMEs agregadas desde '{origen}' "
+          f"en '{AGGREGATION_CONFIG['output_path']}'")
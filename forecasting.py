@@ -0,0 +1,550 @@
+"""
+Entrenamiento paralelo de Prophet por clúster
+=============================================
+
+Este módulo reemplaza los dos bucles secuenciales del notebook (evaluación
+con los últimos ``test_size`` meses y reentrenamiento hasta diciembre de
+2026). Cada ajuste (clúster, fase) es un trabajo independiente en un pool de
+procesos con ``PROPHET_CONFIG``; se mide su tiempo, un fallo solo afecta a
+su clúster y los ``pronostico_prophet_cluster_{i}.csv`` se escriben de forma
+atómica (archivo temporal + ``os.replace``), de modo que el dashboard nunca
+lee un pronóstico a medio escribir.
+
+``ForecastCache`` guarda cada pronóstico en disco con una clave calculada a
+partir del contenido de la serie, el horizonte, los parámetros del modelo y la
+función de ajuste. Solo se vuelven a ajustar los clústeres cuya historia
+cambió; la caché descarta las entradas usadas hace más tiempo (LRU) cuando
+supera su límite de entradas o de tamaño.
+
+``run_forecasts`` publica al terminar (con las rutas de FILE_PATHS) la vista
+``combined_time_series_data.csv`` (histórico y pronóstico de cada clúster, su
+total y el tipo de dato) con ``materialize_combined_view``, de modo que el
+dashboard la lee tal cual en lugar de unir y sumar los pronósticos en cada
+recarga. La vista guarda las versiones de sus fuentes y
+``combined_view_is_current`` comprueba que siguen siendo las publicadas.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from config import FILE_PATHS, FORECAST_CONFIG, PROPHET_CONFIG
+from artifact_store import (MANIFEST_NAME, artifact_name, has_artifact, load_artifact,
+                            read_manifest, read_table, write_table)
+from data_cache import data_version, source_version
+from statistical_forecast import MONTH_END
+from utils import calculate_forecast_accuracy
+
+PHASES = ('evaluacion', 'pronostico')
+
+
+def prophet_fit_predict(train, periods, config=None):
+    """
+    Ajusta Prophet a una serie mensual y pronostica ``periods`` meses.
+
+    Args:
+        train: Serie con índice de fechas (fin de mes)
+        periods: Meses a pronosticar tras la última fecha
+        config: Parámetros de Prophet (por defecto PROPHET_CONFIG)
+
+    Returns:
+        pandas.DataFrame: Columnas ds, yhat, yhat_lower y yhat_upper de los
+            meses futuros
+    """
+    from prophet import Prophet
+
+    df_prophet = train.reset_index()
+    df_prophet.columns = ['ds', 'y']
+    df_prophet['ds'] = pd.to_datetime(df_prophet['ds'])
+
+    model = Prophet(**(config or PROPHET_CONFIG))
+    model.fit(df_prophet)
+    future = model.make_future_dataframe(periods=periods, freq=MONTH_END)
+    forecast = model.predict(future)
+    return forecast[forecast['ds'] > df_prophet['ds'].max()][['ds', 'yhat', 'yhat_lower', 'yhat_upper']].reset_index(drop=True)
+
+
+def model_for_level(level):
+    """
+    Función de ajuste y parámetros configurados para un nivel.
+
+    Args:
+        level: 'cluster' o 'pyme' (ver FORECAST_CONFIG)
+
+    Returns:
+        tuple: (fit_fn, config) para ``run_forecasts``
+    """
+    model = FORECAST_CONFIG[f'{level}_model']
+    if model == 'prophet':
+        return prophet_fit_predict, PROPHET_CONFIG
+    from statistical_forecast import statistical_fit_predict
+    return statistical_fit_predict, {'method': model}
+
+
+def months_until(last_date, end_date):
+    """Meses entre la última fecha histórica y la fecha final del pronóstico."""
+    last_date, end_date = pd.Timestamp(last_date), pd.Timestamp(end_date)
+    return (end_date.year - last_date.year) * 12 + (end_date.month - last_date.month)
+
+
+def write_csv_atomic(df, path, **to_csv_kwargs):
+    """
+    Escribe un CSV de forma atómica (temporal en el mismo directorio + rename).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f'.{os.path.basename(path)}.tmp-{uuid.uuid4().hex}')
+    try:
+        df.to_csv(tmp_path, **to_csv_kwargs)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def publish_csv(df, path, store_dir=None, metadata=None):
+    """
+    Escribe un CSV de forma atómica y, si el almacén ya tiene su artefacto,
+    lo reescribe también para que ``load_table`` no sirva la versión anterior.
+
+    Args:
+        df: Tabla a publicar (el índice se guarda)
+        path: Ruta del CSV
+        store_dir: Directorio del almacén; None = solo el CSV
+        metadata: Metadatos adicionales del artefacto
+    """
+    write_csv_atomic(df, path)
+    if store_dir is None:
+        return
+    name = artifact_name(path)
+    if has_artifact(name, store_dir):
+        write_table(df, name, store_dir=store_dir, metadata=metadata)
+
+
+def forecast_key(train, periods, config, fit_fn):
+    """
+    Clave de caché de un ajuste: contenido de la serie (valores y fechas),
+    horizonte, parámetros del modelo y función de ajuste.
+    """
+    payload = json.dumps({
+        'series': data_version(train),
+        'periods': int(periods),
+        'config': config,
+        'fit_fn': f"{fit_fn.__module__}.{fit_fn.__qualname__}",
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ForecastCache:
+    """
+    Caché en disco de pronósticos con expulsión LRU por entradas y tamaño.
+
+    Cada entrada es una tabla del almacén columnar (escritura atómica) llamada
+    ``pronostico_<clave>``; la fecha de modificación de su manifiesto marca
+    el último uso.
+
+    Args:
+        cache_dir: Directorio de la caché (por defecto FORECAST_CONFIG)
+        max_entries: Número máximo de pronósticos guardados
+        max_mb: Tamaño máximo de la caché en MB
+    """
+
+    PREFIX = 'pronostico_'
+
+    def __init__(self, cache_dir=None, max_entries=None, max_mb=None):
+        self.cache_dir = cache_dir or FORECAST_CONFIG['cache_dir']
+        self.max_entries = max_entries or FORECAST_CONFIG['cache_max_entries']
+        self.max_mb = max_mb or FORECAST_CONFIG['cache_max_mb']
+        self.hits = 0
+        self.misses = 0
+
+    def _name(self, key):
+        return f'{self.PREFIX}{key}'
+
+    def get(self, key):
+        """
+        Devuelve el pronóstico guardado (columna ds y predicciones) o None.
+        """
+        name = self._name(key)
+        if not has_artifact(name, self.cache_dir):
+            self.misses += 1
+            return None
+        try:
+            forecast = read_table(name, self.cache_dir, mmap=False)
+            os.utime(os.path.join(self.cache_dir, name, MANIFEST_NAME))
+        except (OSError, ValueError, KeyError):
+            # Entrada expulsada por otro proceso mientras se leía
+            self.misses += 1
+            return None
+        self.hits += 1
+        return forecast
+
+    def put(self, key, forecast):
+        """
+        Guarda un pronóstico y aplica la política de expulsión.
+        """
+        write_table(forecast, self._name(key), store_dir=self.cache_dir, index=False)
+        self.evict()
+
+    def entries(self):
+        """
+        Entradas de la caché, de la usada hace más tiempo a la más reciente.
+
+        Returns:
+            list: Tuplas (último uso, bytes, ruta)
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            manifest = os.path.join(path, MANIFEST_NAME)
+            if not name.startswith(self.PREFIX) or not os.path.exists(manifest):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.stat(manifest).st_mtime_ns, size, path))
+            except OSError:
+                continue
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Expulsa las entradas menos usadas hasta cumplir ambos límites.
+
+        Returns:
+            int: Entradas eliminadas
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        max_bytes = self.max_mb * 1024 * 1024
+        removed = 0
+        while entries and (len(entries) > self.max_entries or total > max_bytes):
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Vacía la caché."""
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _run_job(job):
+    """
+    Ejecuta un ajuste y captura su tiempo y sus errores.
+
+    Args:
+        job: Tupla (clave, serie de entrenamiento, meses, config, fit_fn)
+
+    Returns:
+        dict: key, seconds, status, error y forecast
+    """
+    key, train, periods, config, fit_fn = job
+    start = time.perf_counter()
+    result = {'key': key, 'status': 'ok', 'error': None, 'forecast': None}
+    try:
+        result['forecast'] = fit_fn(train, periods, config)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def execute_jobs(jobs, n_jobs=None, cache=None):
+    """
+    Ejecuta ajustes en un pool de procesos, sirviendo de la caché los ya hechos.
+
+    Args:
+        jobs: Tuplas (clave, serie, meses, config, fit_fn); ``fit_fn`` debe
+            ser una función de módulo
+        n_jobs: Procesos del pool (por defecto FORECAST_CONFIG o os.cpu_count())
+        cache: ``ForecastCache`` (por defecto uno en FORECAST_CONFIG['cache_dir']);
+            False desactiva la caché
+
+    Returns:
+        dict: clave -> resultado (seconds, status, error, cached y forecast
+            con ds en datetime64[ns])
+    """
+    if cache is None:
+        cache = ForecastCache()
+
+    # Los ajustes con la misma serie, horizonte y parámetros salen de la caché
+    results = {}
+    pending = []
+    cache_keys = {}
+    for job in jobs:
+        key, train, periods, config, fit_fn = job
+        if not cache:
+            pending.append(job)
+            continue
+        start = time.perf_counter()
+        cache_keys[key] = forecast_key(train, periods, config, fit_fn)
+        cached = cache.get(cache_keys[key])
+        if cached is None:
+            pending.append(job)
+        else:
+            results[key] = {'key': key, 'status': 'ok', 'error': None, 'forecast': cached,
+                            'cached': True, 'seconds': time.perf_counter() - start}
+
+    fitted = []
+    n_jobs = min(n_jobs or FORECAST_CONFIG.get('n_jobs') or os.cpu_count() or 1, len(pending))
+    if n_jobs <= 1:
+        fitted = [_run_job(job) for job in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(_run_job, job): job[0] for job in pending}
+            for future in as_completed(futures):
+                try:
+                    fitted.append(future.result())
+                except Exception as e:
+                    # El proceso murió (p. ej. Stan abortó): solo se pierde este ajuste
+                    fitted.append({'key': futures[future], 'status': 'error',
+                                   'error': f"{type(e).__name__}: {e}", 'forecast': None,
+                                   'seconds': np.nan})
+
+    for result in fitted:
+        result['cached'] = False
+        if result['forecast'] is not None:
+            # Mismo tipo de fecha que las entradas leídas de la caché
+            forecast = result['forecast']
+            result['forecast'] = forecast.assign(ds=forecast['ds'].astype('datetime64[ns]'))
+        if cache and result['status'] == 'ok':
+            cache.put(cache_keys[result['key']], result['forecast'])
+        results[result['key']] = result
+    return results
+
+
+def _resolve_test_size(test_size):
+    """Meses de evaluación (por defecto FORECAST_CONFIG); 0 = sin evaluación."""
+    test_size = test_size if test_size is not None else FORECAST_CONFIG['test_size']
+    if int(test_size) < 0:
+        raise ValueError(f"test_size debe ser mayor o igual que 0: {test_size}")
+    return int(test_size)
+
+
+def build_jobs(df_ts, test_size=None, end_date=None, config=None, fit_fn=None):
+    """
+    Crea los trabajos de evaluación y de pronóstico de cada clúster.
+
+    Con ``test_size=0`` no se crean trabajos de evaluación.
+
+    Returns:
+        list: Tuplas para ``execute_jobs`` con clave (clúster, fase)
+    """
+    test_size = _resolve_test_size(test_size)
+    end_date = end_date or FORECAST_CONFIG['end_date']
+    if fit_fn is None:
+        fit_fn, default_config = model_for_level('cluster')
+        config = config or default_config
+    config = config or PROPHET_CONFIG
+
+    horizon = months_until(df_ts.index[-1], end_date)
+    jobs = []
+    for column in df_ts.columns:
+        series = df_ts[column]
+        if test_size:
+            jobs.append(((column, 'evaluacion'), series.iloc[:-test_size], test_size, config, fit_fn))
+        jobs.append(((column, 'pronostico'), series, horizon, config, fit_fn))
+    return jobs
+
+
+def run_forecasts(df_ts, n_jobs=None, test_size=None, end_date=None, config=None,
+                  fit_fn=None, output_paths=None, cache=None):
+    """
+    Entrena y evalúa todos los clústeres en paralelo y guarda los pronósticos.
+
+    Args:
+        df_ts: Serie mensual por clúster (índice fecha, una columna por clúster)
+        n_jobs: Procesos del pool (por defecto FORECAST_CONFIG o os.cpu_count())
+        test_size: Meses reservados para la evaluación (0 = sin evaluación)
+        end_date: Fecha final del pronóstico (por defecto 2026-12-31)
+        config: Parámetros del modelo (por defecto los del modelo configurado)
+        fit_fn: Función (serie, meses, config) -> DataFrame ds, yhat; debe ser
+            una función de módulo (por defecto la de FORECAST_CONFIG['cluster_model'])
+        output_paths: Diccionario clúster -> CSV (por defecto
+            FILE_PATHS['forecasts'], y entonces se publica también la vista
+            combinada); None en un clúster = no guardar
+        cache: ``ForecastCache`` (por defecto uno en FORECAST_CONFIG['cache_dir']);
+            False desactiva la caché
+
+    Returns:
+        tuple: (DataFrame con una fila por ajuste: tiempo, estado, error, si
+            vino de la caché y métricas de evaluación; diccionario clúster ->
+            pronóstico)
+    """
+    test_size = _resolve_test_size(test_size)
+    jobs = build_jobs(df_ts, test_size, end_date, config, fit_fn)
+    store_dir = None
+    if output_paths is None:
+        output_paths = FILE_PATHS['forecasts']
+        store_dir = FILE_PATHS['store']
+    results = execute_jobs(jobs, n_jobs, cache)
+
+    rows = []
+    forecasts = {}
+    for cluster_id, phase in sorted(results, key=lambda key: (str(key[0]), PHASES.index(key[1]))):
+        result = results[cluster_id, phase]
+        row = {'cluster': cluster_id, 'phase': phase,
+               **{key: result[key] for key in ('seconds', 'status', 'error', 'cached')}}
+        forecast = result['forecast']
+        if result['status'] == 'ok' and phase == 'evaluacion' and test_size:
+            actual = df_ts[cluster_id].iloc[-test_size:].to_numpy()
+            row.update(calculate_forecast_accuracy(actual, forecast['yhat'].to_numpy()[:test_size]))
+        elif result['status'] == 'ok':
+            forecasts[cluster_id] = forecast.set_index('ds')
+            path = _output_path(output_paths, cluster_id)
+            if path:
+                publish_csv(forecasts[cluster_id], path, store_dir)
+        rows.append(row)
+
+    if store_dir is not None and forecasts:
+        materialize_combined_view(df_ts, forecasts)
+    return pd.DataFrame(rows), forecasts
+
+
+def _output_path(output_paths, cluster_id):
+    for key in (cluster_id, str(cluster_id)):
+        if key in output_paths:
+            return output_paths[key]
+    try:
+        return output_paths.get(int(cluster_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def build_combined_view(df_historico, forecasts):
+    """
+    Une el histórico y los pronósticos de los clústeres en una sola tabla.
+
+    Los meses pronosticados que no son posteriores al último mes histórico se
+    descartan y los clústeres sin pronóstico valen 0 en esos meses.
+
+    Args:
+        df_historico: Serie mensual por clúster (índice fecha, una columna por
+            clúster)
+        forecasts: Diccionario clúster -> DataFrame con índice ds y columna
+            yhat; None en un clúster = sin pronóstico
+
+    Returns:
+        pandas.DataFrame: Índice Fecha; columnas Ingresos_Cluster_{i},
+            Ingresos_Total y Tipo_Dato ('Histórico' o 'Pronóstico')
+    """
+    historical = df_historico.rename(columns=str)
+    predicted = pd.DataFrame({str(cluster_id): forecast['yhat']
+                              for cluster_id, forecast in forecasts.items()
+                              if forecast is not None})
+    clusters = list(historical.columns)
+    clusters += [column for column in predicted.columns if column not in clusters]
+
+    last_date = pd.Timestamp(historical.index[-1])
+    predicted = predicted.reindex(columns=clusters)
+    if len(predicted):
+        predicted = predicted[pd.DatetimeIndex(predicted.index) > last_date]
+
+    parts = [historical.reindex(columns=clusters), predicted]
+    view = pd.concat(parts).fillna(0.0)
+    view.index = pd.DatetimeIndex(view.index, name='Fecha')
+    view.columns = [f'Ingresos_Cluster_{cluster_id}' for cluster_id in clusters]
+    view['Ingresos_Total'] = view.sum(axis=1)
+    view['Tipo_Dato'] = np.repeat(['Histórico', 'Pronóstico'], [len(part) for part in parts])
+    return view
+
+
+def materialize_combined_view(df_historico=None, forecasts=None, file_paths=None):
+    """
+    Genera y publica la vista histórico + pronóstico que lee el dashboard.
+
+    Args:
+        df_historico: Serie mensual por clúster (por defecto FILE_PATHS['historical'])
+        forecasts: Diccionario clúster -> pronóstico (por defecto los CSV de
+            FILE_PATHS['forecasts'] que existan)
+        file_paths: Diccionario de rutas (por defecto FILE_PATHS)
+
+    Returns:
+        pandas.DataFrame: Vista publicada en FILE_PATHS['combined']
+    """
+    file_paths = file_paths or FILE_PATHS
+    if df_historico is None:
+        df_historico = load_artifact('historical', file_paths=file_paths)
+    if forecasts is None:
+        forecasts = {}
+        for cluster_id in file_paths['forecasts']:
+            try:
+                forecasts[cluster_id] = load_artifact('forecasts', cluster_id, file_paths)
+            except FileNotFoundError:
+                forecasts[cluster_id] = None
+
+    view = build_combined_view(df_historico, forecasts)
+    # Versiones (hash de los archivos publicados, como ``ArtifactCache.version``)
+    # de las fuentes de la vista; ``combined_view_is_current`` las compara
+    metadata = {
+        'historical_version': _published_version('historical', None, file_paths),
+        'forecast_versions': {str(cluster_id): _published_version('forecasts', cluster_id, file_paths)
+                              for cluster_id, forecast in forecasts.items()
+                              if forecast is not None},
+    }
+    write_csv_atomic(view, file_paths['combined'])
+    # La vista siempre se guarda en el almacén: el manifiesto lleva las versiones
+    write_table(view, artifact_name(file_paths['combined']), store_dir=file_paths['store'],
+                metadata=metadata)
+    return view
+
+
+def _published_version(key, cluster_id, file_paths):
+    if cluster_id is not None:
+        cluster_id = next((path_key for path_key in file_paths[key]
+                           if str(path_key) == str(cluster_id)), cluster_id)
+    try:
+        return source_version(key, cluster_id, file_paths)
+    except (FileNotFoundError, KeyError):
+        return None
+
+
+def combined_view_is_current(cache):
+    """
+    Indica si la vista combinada publicada se generó con el histórico y los
+    pronósticos que sirve ahora ``cache``.
+
+    Args:
+        cache: ``data_cache.ArtifactCache`` del dashboard
+
+    Returns:
+        bool: False si la vista no existe, no tiene versiones o alguna fuente
+            cambió (p. ej. se republicó un pronóstico)
+    """
+    file_paths = cache.file_paths
+    name = artifact_name(file_paths['combined'])
+    if not has_artifact(name, file_paths['store']):
+        return False
+    metadata = read_manifest(name, file_paths['store'])['metadata']
+
+    try:
+        current = {'historical_version': cache.version('historical')}
+    except FileNotFoundError:
+        return False
+    forecast_versions = {}
+    for cluster_id in file_paths['forecasts']:
+        try:
+            forecast_versions[str(cluster_id)] = cache.version('forecasts', cluster_id)
+        except FileNotFoundError:
+            continue
+    current['forecast_versions'] = forecast_versions
+    return all(metadata.get(key) == value for key, value in current.items())
+
+
+if __name__ == '__main__':
+    df_ts = load_artifact('historical')
+    resumen, _ = run_forecasts(df_ts)
+    print(resumen.round(2).to_string(index=False))
@@ -0,0 +1,478 @@
+"""
+Motor K-Medoids (PAM BUILD + intercambio estilo FastPAM)
+========================================================
+
+Este módulo reemplaza a la clase ``SimpleKMedoids`` del notebook. La
+inicialización usa el BUILD de PAM (determinista, sin depender de la
+semilla) y la fase de intercambio evalúa todos los candidatos de un bloque
+a la vez con las distancias al medoide más cercano y al segundo más
+cercano guardadas en caché, como en FastPAM/FasterPAM. Evaluar un candidato
+cuesta O(n·k) en lugar de recorrer las sub-matrices de cada clúster.
+
+Para poblaciones que no caben en una matriz n×n se incluye ``CLARA``:
+ajusta medoides sobre submuestras y evalúa cada candidato contra todos los
+datos en bloques, con la memoria acotada por ``memory_budget_mb``.
+
+Los parámetros por defecto se toman de ``CLUSTERING_CONFIG``.
+"""
+
+import numpy as np
+
+from config import CLUSTERING_CONFIG
+from distances import block_rows_for, iter_distance_blocks, metric_ranges, pairwise_distances_blocked
+
+# Número de matrices temporales (bloque × n) que se crean al evaluar
+# intercambios; se usa para dimensionar los bloques según la memoria.
+_SWAP_TEMPORARIES = 4
+
+
+def _nearest_two(D, medoids):
+    """
+    Devuelve, para cada punto, el medoide más cercano y las distancias al
+    más cercano y al segundo más cercano.
+
+    Args:
+        D: Matriz de distancias (n, n)
+        medoids: Índices de los medoides (k,)
+
+    Returns:
+        tuple: (nearest, d_nearest, d_second) con forma (n,) cada uno
+    """
+    dm = np.asarray(D[medoids], dtype=np.float64)
+    n = dm.shape[1]
+    if len(medoids) == 1:
+        return np.zeros(n, dtype=np.intp), dm[0], np.full(n, np.inf)
+
+    columns = np.arange(n)
+    order = np.argpartition(dm, 1, axis=0)[:2]
+    nearest = order[0]
+    return nearest, dm[nearest, columns], dm[order[1], columns]
+
+
+def build_init(D, n_clusters, block_rows):
+    """
+    Inicialización BUILD de PAM.
+
+    El primer medoide minimiza la suma de distancias; cada medoide
+    siguiente es el candidato que más reduce el costo total.
+
+    Args:
+        D: Matriz de distancias (n, n)
+        n_clusters: Número de medoides
+        block_rows: Filas de D que se procesan por bloque
+
+    Returns:
+        numpy.ndarray: Índices de los medoides iniciales
+    """
+    n = D.shape[0]
+    row_sums = np.empty(n)
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        row_sums[start:stop] = np.asarray(D[start:stop], dtype=np.float64).sum(axis=1)
+
+    medoids = [int(np.argmin(row_sums))]
+    d_nearest = np.asarray(D[medoids[0]], dtype=np.float64).copy()
+
+    for _ in range(1, n_clusters):
+        gains = np.empty(n)
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            block = np.asarray(D[start:stop], dtype=np.float64)
+            gains[start:stop] = np.maximum(d_nearest - block, 0).sum(axis=1)
+        gains[medoids] = -np.inf
+        candidate = int(np.argmax(gains))
+        medoids.append(candidate)
+        np.minimum(d_nearest, D[candidate], out=d_nearest)
+
+    return np.array(medoids, dtype=np.intp)
+
+
+def swap_deltas(D_block, nearest, d_nearest, d_second, n_clusters, assignment=None):
+    """
+    Calcula el cambio de costo de cada intercambio (candidato, medoide).
+
+    Usa la descomposición de FastPAM: la pérdida por eliminar cada medoide
+    más la ganancia de los puntos que pasan al candidato. Con
+    ``G = min(d(c, o) - dn(o), 0)`` y ``S = min(d(c, o) - ds(o), 0)``:
+
+        delta[c, i] = pérdida[i] + sum_{o en i} (S - G) + sum_o G
+
+    Args:
+        D_block: Distancias de un bloque de candidatos a todos los puntos (b, n)
+        nearest: Medoide más cercano de cada punto (n,)
+        d_nearest: Distancia al medoide más cercano (n,)
+        d_second: Distancia al segundo medoide más cercano (n,)
+        n_clusters: Número de medoides
+        assignment: Matriz one-hot (n, k) de ``nearest`` (se calcula si falta)
+
+    Returns:
+        numpy.ndarray: Cambio de costo (b, k); negativo mejora la solución
+    """
+    D_block = np.asarray(D_block, dtype=np.float64)
+    if n_clusters == 1:
+        # Sin segundo medoide (d_second = inf): el costo nuevo es la suma de la fila
+        return (D_block.sum(axis=1) - d_nearest.sum())[:, None]
+    if assignment is None:
+        assignment = _assignment_matrix(nearest, n_clusters)
+    removal_loss = np.bincount(nearest, weights=d_second - d_nearest, minlength=n_clusters)
+
+    gain_nearest = np.minimum(D_block - d_nearest, 0.0)
+    gain_second = np.minimum(D_block - d_second, 0.0)
+    shared_gain = gain_nearest.sum(axis=1)
+    gain_second -= gain_nearest
+
+    # Sumar la contribución de cada punto en la columna de su medoide
+    return removal_loss + gain_second @ assignment + shared_gain[:, None]
+
+
+def _assignment_matrix(nearest, n_clusters):
+    assignment = np.zeros((len(nearest), n_clusters))
+    assignment[np.arange(len(nearest)), nearest] = 1.0
+    return assignment
+
+
+def swap_phase(D, medoids, max_iter, block_rows, tol=1e-10):
+    """
+    Fase de intercambio: aplica de forma ansiosa el mejor intercambio de
+    cada bloque de candidatos hasta que una pasada completa no mejora.
+
+    Args:
+        D: Matriz de distancias (n, n)
+        medoids: Medoides iniciales (k,)
+        max_iter: Número máximo de pasadas sobre todos los candidatos
+        block_rows: Candidatos evaluados por bloque
+        tol: Mejora relativa mínima para aceptar un intercambio
+
+    Returns:
+        tuple: (medoides, etiquetas, costo, iteraciones)
+    """
+    medoids = np.array(medoids, dtype=np.intp)
+    n, k = D.shape[0], len(medoids)
+    is_medoid = np.zeros(n, dtype=bool)
+    is_medoid[medoids] = True
+    nearest, d_nearest, d_second = _nearest_two(D, medoids)
+    assignment = _assignment_matrix(nearest, k)
+
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        improved = False
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            deltas = swap_deltas(D[start:stop], nearest, d_nearest, d_second, k, assignment)
+            deltas[is_medoid[start:stop]] = np.inf
+
+            candidate, position = np.unravel_index(np.argmin(deltas), deltas.shape)
+            if deltas[candidate, position] < -tol * max(d_nearest.sum(), 1.0):
+                is_medoid[medoids[position]] = False
+                medoids[position] = start + candidate
+                is_medoid[medoids[position]] = True
+                nearest, d_nearest, d_second = _nearest_two(D, medoids)
+                assignment = _assignment_matrix(nearest, k)
+                improved = True
+        if not improved:
+            break
+
+    return medoids, nearest, float(d_nearest.sum()), n_iter
+
+
+class KMedoids:
+    """
+    K-Medoids con inicialización BUILD e intercambio vectorizado.
+
+    Args:
+        n_clusters: Número de clústeres (por defecto CLUSTERING_CONFIG)
+        metric: 'euclidean', 'manhattan', 'gower' o 'precomputed' (X es
+            una matriz de distancias, p. ej. la de ``distances.distance_matrix``)
+        init: 'build' (determinista) o 'random'
+        max_iter: Máximo de pasadas de intercambio
+        random_state: Semilla (solo se usa con init='random')
+        memory_budget_mb: Memoria para los temporales de cada bloque
+
+    Attributes:
+        medoid_indices_: Índices de los medoides en X
+        labels_: Clúster asignado a cada punto
+        inertia_: Costo final (suma de distancias al medoide asignado)
+        cluster_centers_: Coordenadas de los medoides (si metric != 'precomputed')
+        feature_ranges_: Rangos de Gower de los datos de ajuste (None con
+            otras métricas); ``predict`` los reutiliza
+        n_iter_: Pasadas de intercambio realizadas
+    """
+
+    def __init__(self, n_clusters=None, metric=None, init=None, max_iter=None,
+                 random_state=None, memory_budget_mb=None):
+        self.n_clusters = n_clusters if n_clusters is not None else CLUSTERING_CONFIG['n_clusters']
+        self.metric = metric or CLUSTERING_CONFIG.get('metric', 'euclidean')
+        self.init = init or CLUSTERING_CONFIG.get('init', 'build')
+        self.max_iter = max_iter if max_iter is not None else CLUSTERING_CONFIG['max_iter']
+        self.random_state = random_state if random_state is not None else CLUSTERING_CONFIG['random_state']
+        self.memory_budget_mb = memory_budget_mb or CLUSTERING_CONFIG.get('memory_budget_mb', 512)
+
+    @classmethod
+    def from_config(cls, config=None, **overrides):
+        """
+        Crea el modelo a partir de un diccionario tipo CLUSTERING_CONFIG.
+        """
+        params = dict(config or CLUSTERING_CONFIG)
+        params.update(overrides)
+        return cls(
+            n_clusters=params.get('n_clusters'),
+            metric=params.get('metric'),
+            init=params.get('init'),
+            max_iter=params.get('max_iter'),
+            random_state=params.get('random_state'),
+            memory_budget_mb=params.get('memory_budget_mb'),
+        )
+
+    def _distances(self, X):
+        if self.metric == 'precomputed':
+            return X
+        return pairwise_distances_blocked(X, metric=self.metric,
+                                          dtype=CLUSTERING_CONFIG.get('distance_dtype', 'float64'),
+                                          memory_budget_mb=self.memory_budget_mb,
+                                          ranges=self.feature_ranges_)
+
+    def _initial_medoids(self, D, block_rows):
+        if self.init == 'build':
+            return build_init(D, self.n_clusters, block_rows)
+        if self.init == 'random':
+            rng = np.random.RandomState(self.random_state)
+            return rng.choice(D.shape[0], self.n_clusters, replace=False)
+        raise ValueError(f"Inicialización no soportada: {self.init}")
+
+    def fit(self, X, ranges=None):
+        """
+        Ajusta el modelo.
+
+        Args:
+            X: Datos (n, d) o matriz de distancias (n, n) si metric='precomputed'
+            ranges: Rangos de Gower (por defecto los de X; p. ej. los de toda
+                la población al ajustar un subconjunto)
+
+        Returns:
+            KMedoids: El propio modelo ajustado
+        """
+        if ranges is None and self.metric != 'precomputed':
+            ranges = metric_ranges(X, self.metric)
+        self.feature_ranges_ = ranges
+        D = self._distances(X)
+        n = D.shape[0]
+        if self.n_clusters > n:
+            raise ValueError(f"n_clusters={self.n_clusters} es mayor que el número de puntos ({n})")
+
+        block_rows = block_rows_for(n, n, self.memory_budget_mb, temporaries=_SWAP_TEMPORARIES)
+        medoids = self._initial_medoids(D, block_rows)
+        medoids, labels, cost, n_iter = swap_phase(D, medoids, self.max_iter, block_rows)
+
+        self.medoid_indices_ = medoids
+        self.labels_ = labels
+        self.inertia_ = cost
+        self.n_iter_ = n_iter
+        if self.metric != 'precomputed':
+            self.cluster_centers_ = np.asarray(X)[medoids]
+        return self
+
+    def fit_predict(self, X):
+        """
+        Ajusta el modelo y devuelve las etiquetas.
+        """
+        return self.fit(X).labels_
+
+    def predict(self, X):
+        """
+        Asigna nuevos puntos al medoide más cercano.
+        """
+        if self.metric == 'precomputed':
+            raise ValueError("predict no está disponible con metric='precomputed'")
+        labels, _, _ = nearest_medoids(X, self.cluster_centers_, metric=self.metric,
+                                       memory_budget_mb=self.memory_budget_mb,
+                                       ranges=self.feature_ranges_)
+        return labels
+
+
+def nearest_medoids(X, centers, metric='euclidean', memory_budget_mb=None, ranges=None):
+    """
+    Asigna cada fila de X a su medoide más cercano procesando X por bloques.
+
+    Solo se materializa un bloque de distancias (filas × k) a la vez, de
+    modo que la memoria no depende del número total de filas.
+
+    Args:
+        X: Datos (n, d)
+        centers: Coordenadas de los medoides (k, d)
+        metric: Métrica de distancia
+        memory_budget_mb: Memoria máxima por bloque (por defecto CLUSTERING_CONFIG)
+        ranges: Rangos de Gower de los datos de ajuste (``distances.gower_ranges``)
+
+    Returns:
+        tuple: (etiquetas, distancia al más cercano, distancia al segundo)
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    n, k = X.shape[0], centers.shape[0]
+
+    labels = np.empty(n, dtype=np.intp)
+    d_nearest = np.empty(n)
+    d_second = np.full(n, np.inf)
+    for start, stop, block in iter_distance_blocks(X, centers, metric=metric,
+                                                   memory_budget_mb=memory_budget_mb,
+                                                   ranges=ranges):
+        if k == 1:
+            labels[start:stop] = 0
+            d_nearest[start:stop] = block[:, 0]
+            continue
+        order = np.argpartition(block, 1, axis=1)[:, :2]
+        rows = np.arange(stop - start)
+        labels[start:stop] = order[:, 0]
+        d_nearest[start:stop] = block[rows, order[:, 0]]
+        d_second[start:stop] = block[rows, order[:, 1]]
+    return labels, d_nearest, d_second
+
+
+def _sample_size_for_budget(memory_budget_mb):
+    """
+    Tamaño de submuestra cuya matriz de distancias (más los temporales del
+    intercambio) cabe en el presupuesto de memoria.
+    """
+    budget = memory_budget_mb * 1024 * 1024
+    return int(np.sqrt(budget / (8 * (1 + _SWAP_TEMPORARIES))))
+
+
+class CLARA:
+    """
+    K-Medoids por muestreo (CLARA) para poblaciones grandes.
+
+    En cada ronda se toma una submuestra (que incluye los mejores medoides
+    encontrados hasta el momento), se ajusta ``KMedoids`` sobre su matriz
+    de distancias y los medoides resultantes se evalúan contra todos los
+    datos en bloques. Se conserva el conjunto de menor costo total.
+
+    Args:
+        n_clusters: Número de clústeres (por defecto CLUSTERING_CONFIG)
+        n_sampling: Número de submuestras (por defecto CLUSTERING_CONFIG['clara_samples'])
+        sample_size: Tamaño de cada submuestra (por defecto, el mayor que
+            cabe en ``memory_budget_mb``)
+        metric: 'euclidean', 'manhattan' o 'gower'
+        max_iter: Máximo de pasadas de intercambio en cada submuestra
+        random_state: Semilla del muestreo
+        memory_budget_mb: Memoria máxima para distancias y temporales
+
+    Attributes:
+        medoid_indices_: Índices de los medoides en X
+        labels_: Clúster asignado a cada punto
+        inertia_: Costo total sobre todos los datos
+        cluster_centers_: Coordenadas de los medoides
+        feature_ranges_: Rangos de Gower de todos los datos (None con otras
+            métricas); las submuestras y ``predict`` usan los mismos
+        sample_costs_: Costo total de los medoides de cada submuestra
+    """
+
+    def __init__(self, n_clusters=None, n_sampling=None, sample_size=None, metric=None,
+                 max_iter=None, random_state=None, memory_budget_mb=None):
+        self.n_clusters = n_clusters if n_clusters is not None else CLUSTERING_CONFIG['n_clusters']
+        self.n_sampling = n_sampling or CLUSTERING_CONFIG.get('clara_samples', 5)
+        self.sample_size = sample_size or CLUSTERING_CONFIG.get('clara_sample_size')
+        self.metric = metric or CLUSTERING_CONFIG.get('metric', 'euclidean')
+        self.max_iter = max_iter if max_iter is not None else CLUSTERING_CONFIG['max_iter']
+        self.random_state = random_state if random_state is not None else CLUSTERING_CONFIG['random_state']
+        self.memory_budget_mb = memory_budget_mb or CLUSTERING_CONFIG.get('memory_budget_mb', 512)
+
+    def fit(self, X, ranges=None):
+        """
+        Ajusta el modelo.
+
+        Args:
+            X: Datos (n, d)
+            ranges: Rangos de Gower (por defecto los de X)
+
+        Returns:
+            CLARA: El propio modelo ajustado
+        """
+        X = np.asarray(X)
+        n = X.shape[0]
+        sample_size = self.sample_size or _sample_size_for_budget(self.memory_budget_mb)
+        sample_size = int(min(max(sample_size, self.n_clusters + 1), n))
+        rng = np.random.RandomState(self.random_state)
+        self.feature_ranges_ = ranges if ranges is not None else metric_ranges(X, self.metric)
+
+        best = None
+        self.sample_costs_ = []
+        for _ in range(self.n_sampling):
+            if best is None:
+                sample = rng.choice(n, sample_size, replace=False)
+            else:
+                # Mantener los mejores medoides dentro de la nueva submuestra
+                others = np.setdiff1d(np.arange(n), best['medoids'], assume_unique=True)
+                extra = rng.choice(others, sample_size - self.n_clusters, replace=False)
+                sample = np.concatenate([best['medoids'], extra])
+
+            D_sample = pairwise_distances_blocked(X[sample], metric=self.metric,
+                                                  dtype=CLUSTERING_CONFIG.get('distance_dtype', 'float64'),
+                                                  memory_budget_mb=self.memory_budget_mb,
+                                                  ranges=self.feature_ranges_)
+            # Los temporales del intercambio usan lo que deja libre la matriz
+            swap_budget_mb = max(self.memory_budget_mb - D_sample.nbytes / (1024 * 1024), 1)
+            model = KMedoids(n_clusters=self.n_clusters, metric='precomputed', init='build',
+                             max_iter=self.max_iter, memory_budget_mb=swap_budget_mb)
+            model.fit(D_sample)
+            del D_sample
+
+            medoids = sample[model.medoid_indices_]
+            labels, d_nearest, _ = nearest_medoids(X, X[medoids], metric=self.metric,
+                                                   memory_budget_mb=self.memory_budget_mb,
+                                                   ranges=self.feature_ranges_)
+            cost = float(d_nearest.sum())
+            self.sample_costs_.append(cost)
+            if best is None or cost < best['cost']:
+                best = {'medoids': medoids, 'labels': labels, 'cost': cost}
+
+        self.medoid_indices_ = best['medoids']
+        self.labels_ = best['labels']
+        self.inertia_ = best['cost']
+        self.cluster_centers_ = X[self.medoid_indices_]
+        return self
+
+    def fit_predict(self, X):
+        """
+        Ajusta el modelo y devuelve las etiquetas.
+        """
+        return self.fit(X).labels_
+
+    def predict(self, X):
+        """
+        Asigna nuevos puntos al medoide más cercano.
+        """
+        labels, _, _ = nearest_medoids(X, self.cluster_centers_, metric=self.metric,
+                                       memory_budget_mb=self.memory_budget_mb,
+                                       ranges=self.feature_ranges_)
+        return labels
+
+
+def kmedoids_for(n_samples, config=None, **overrides):
+    """
+    Elige el motor adecuado según el tamaño de la población.
+
+    Si la matriz de distancias n×n (más los temporales del intercambio) cabe
+    en ``memory_budget_mb`` se usa ``KMedoids`` exacto; si no, ``CLARA``.
+
+    Args:
+        n_samples: Número de PYMEs a agrupar
+        config: Diccionario tipo CLUSTERING_CONFIG
+        **overrides: Parámetros que reemplazan a los de la configuración
+
+    Returns:
+        KMedoids o CLARA: Modelo sin ajustar
+    """
+    params = dict(config or CLUSTERING_CONFIG)
+    params.update(overrides)
+    budget_mb = params.get('memory_budget_mb', 512)
+
+    if n_samples <= _sample_size_for_budget(budget_mb):
+        return KMedoids.from_config(params)
+    return CLARA(
+        n_clusters=params.get('n_clusters'),
+        n_sampling=params.get('clara_samples'),
+        sample_size=params.get('clara_sample_size'),
+        metric=params.get('metric'),
+        max_iter=params.get('max_iter'),
+        random_state=params.get('random_state'),
+        memory_budget_mb=budget_mb,
+    )
@@ -0,0 +1,291 @@
+"""
+Selección del número de clústeres
+=================================
+
+Este módulo reemplaza el bucle ``for k in range(2, 11)`` del notebook por un
+barrido paralelo: cada trabajo (algoritmo, k, semilla) se ejecuta en un
+proceso del pool y calcula silueta, Davies-Bouldin y Calinski-Harabasz.
+
+``X`` y la matriz de distancias se copian una sola vez a memoria compartida
+(``multiprocessing.shared_memory``); los procesos las abren por nombre en
+lugar de recibir una copia serializada con cada trabajo.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
+
+from config import CLUSTERING_CONFIG
+from distances import distance_matrix
+from kmedoids import KMedoids, kmedoids_for
+from silhouette import estimate_silhouette
+
+ALGORITHMS = ('kmeans', 'k-medoids')
+METRIC_COLUMNS = ('silhouette', 'davies_bouldin', 'calinski_harabasz')
+
+# Arrays compartidos abiertos en cada proceso: nombre -> (SharedMemory, array)
+_SHARED = {}
+
+
+def _to_shared(array):
+    """Copia un array a un bloque de memoria compartida."""
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach_shared(specs):
+    """Inicializador del pool: abre los bloques compartidos por nombre."""
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        array.flags.writeable = False
+        _SHARED[key] = (shm, array)
+    try:
+        # Un hilo BLAS por proceso: el paralelismo lo da el pool
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def _call_shared(func, job):
+    """Ejecuta ``func(job, X, D)`` con los arrays compartidos del proceso."""
+    return func(job, **{key: array for key, (_, array) in _SHARED.items()})
+
+
+class SharedArrayPool:
+    """
+    Pool de procesos con arrays en memoria compartida.
+
+    Los arrays se copian una vez a memoria compartida y cada proceso los abre
+    por nombre al arrancar; ``map`` puede llamarse varias veces (p. ej. por
+    tandas) sin volver a copiarlos. Con n_jobs=1 los trabajos se ejecutan en
+    el propio proceso.
+
+    Args:
+        arrays: Diccionario nombre -> numpy.ndarray
+        n_jobs: Procesos del pool (por defecto os.cpu_count())
+    """
+
+    def __init__(self, arrays, n_jobs=None):
+        self.arrays = arrays
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self._blocks = {}
+        self._executor = None
+
+    def __enter__(self):
+        if self.n_jobs > 1:
+            try:
+                specs = {}
+                for key, array in self.arrays.items():
+                    self._blocks[key], specs[key] = _to_shared(array)
+                self._executor = ProcessPoolExecutor(max_workers=self.n_jobs,
+                                                     initializer=_attach_shared,
+                                                     initargs=(specs,))
+            except Exception:
+                self._release()
+                raise
+        return self
+
+    def map(self, func, jobs):
+        """
+        Aplica ``func(job, **arrays)`` a cada trabajo; ``func`` debe ser una
+        función de módulo.
+
+        Returns:
+            list: Resultados en el orden de ``jobs``
+        """
+        if self._executor is None:
+            return [func(job, **self.arrays) for job in jobs]
+        return list(self._executor.map(partial(_call_shared, func), jobs))
+
+    def _release(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for shm in self._blocks.values():
+            shm.close()
+            shm.unlink()
+        self._blocks = {}
+
+    def __exit__(self, *exc_info):
+        self._release()
+        return False
+
+
+def map_shared(func, jobs, arrays, n_jobs=None):
+    """
+    Aplica ``func(job, **arrays)`` a cada trabajo con un ``SharedArrayPool``.
+
+    Args:
+        func: Función de módulo (job, **arrays) -> resultado
+        jobs: Lista de trabajos
+        arrays: Diccionario nombre -> numpy.ndarray
+        n_jobs: Procesos del pool (por defecto os.cpu_count(); 1 = sin pool)
+
+    Returns:
+        list: Resultados en el orden de ``jobs``
+    """
+    jobs = list(jobs)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(jobs), 1))
+    with SharedArrayPool(arrays, n_jobs) as pool:
+        return pool.map(func, jobs)
+
+
+def fit_labels(algorithm, k, seed, X, D, max_iter, metric=None):
+    """
+    Ajusta KMeans (n_init=10, sobre X) o K-Medoids y devuelve (etiquetas,
+    inercia, centros).
+
+    K-Medoids usa D si se pasa; si D es None se ajusta sobre X con
+    ``kmedoids_for`` (distancias por bloques o CLARA según el presupuesto).
+    """
+    if algorithm == 'kmeans':
+        from sklearn.cluster import KMeans
+        model = KMeans(n_clusters=k, n_init=10, max_iter=max_iter, random_state=seed).fit(X)
+        centers = model.cluster_centers_
+    elif algorithm == 'k-medoids' and D is None:
+        model = kmedoids_for(len(X), n_clusters=k, metric=metric, max_iter=max_iter,
+                             random_state=seed).fit(X)
+        centers = model.cluster_centers_
+    elif algorithm == 'k-medoids':
+        model = KMedoids(n_clusters=k, metric='precomputed', max_iter=max_iter,
+                         random_state=seed).fit(D)
+        centers = X[model.medoid_indices_]
+    else:
+        raise ValueError(f"Algoritmo no soportado: {algorithm}. Opciones: {ALGORITHMS}")
+    return model.labels_, float(model.inertia_), centers
+
+
+def _evaluate(job, X, D=None):
+    """
+    Ajusta un modelo y calcula sus métricas internas.
+
+    Args:
+        job: Tupla (algoritmo, k, semilla, max_iter, modo de silueta, métrica)
+        X, D: Datos y matriz de distancias (None si no se materializa)
+
+    Returns:
+        dict: Fila de la tabla de resultados
+    """
+    algorithm, k, seed, max_iter, silhouette_mode, metric = job
+
+    start = time.perf_counter()
+    labels, inertia, centers = fit_labels(algorithm, k, seed, X, D, max_iter, metric=metric)
+    row = {
+        'algorithm': algorithm,
+        'k': k,
+        'seed': seed,
+        'inertia': inertia,
+        'silhouette': np.nan,
+        'silhouette_ci_low': np.nan,
+        'silhouette_ci_high': np.nan,
+        'davies_bouldin': np.nan,
+        'calinski_harabasz': np.nan,
+    }
+    if len(np.unique(labels)) > 1:
+        silhouette = estimate_silhouette(X, labels, mode=silhouette_mode, distances=D,
+                                         centers=centers, metric=metric, random_state=seed)
+        row['silhouette'] = silhouette['score']
+        row['silhouette_ci_low'], row['silhouette_ci_high'] = silhouette['ci']
+        row['davies_bouldin'] = davies_bouldin_score(X, labels)
+        row['calinski_harabasz'] = calinski_harabasz_score(X, labels)
+    row['fit_seconds'] = time.perf_counter() - start
+    return row
+
+
+def recommend_k(results, algorithm=None, metric='silhouette'):
+    """
+    Elige k a partir de la tabla de resultados.
+
+    Se promedia la métrica sobre las semillas de cada k y se toma el mejor
+    (máximo para silueta y Calinski-Harabasz, mínimo para Davies-Bouldin).
+
+    Args:
+        results: DataFrame devuelto por ``k_sweep``
+        algorithm: Algoritmo a considerar (por defecto CLUSTERING_CONFIG['algorithm'])
+        metric: Columna de métrica usada para decidir
+
+    Returns:
+        int: k recomendado
+    """
+    algorithm = algorithm or CLUSTERING_CONFIG.get('algorithm', 'k-medoids')
+    scores = results[results['algorithm'] == algorithm].groupby('k')[metric].mean().dropna()
+    if scores.empty:
+        raise ValueError(f"No hay resultados válidos para '{algorithm}'")
+    best = scores.idxmin() if metric == 'davies_bouldin' else scores.idxmax()
+    return int(best)
+
+
+def k_sweep(X, k_values=range(2, 11), algorithms=ALGORITHMS, seeds=None, n_jobs=None,
+            metric=None, max_iter=None, distances=None, cache_dir=None, silhouette_mode=None):
+    """
+    Evalúa todos los (algoritmo, k, semilla) en paralelo.
+
+    La matriz de distancias n×n solo se construye si la silueta es exacta
+    (modo 'exact', o 'auto' dentro de ``silhouette_exact_max_n``); en otro
+    caso K-Medoids y la silueta trabajan sobre X por bloques. Con la
+    inicialización BUILD (determinista) K-Medoids se ajusta una sola vez por
+    k en lugar de una vez por semilla.
+
+    Args:
+        X: Datos preprocesados (n, d)
+        k_values: Valores de k a evaluar
+        algorithms: Algoritmos ('kmeans', 'k-medoids')
+        seeds: Semillas (por defecto [CLUSTERING_CONFIG['random_state']])
+        n_jobs: Procesos del pool (por defecto os.cpu_count(); 1 = sin pool)
+        metric: Métrica de distancias (por defecto CLUSTERING_CONFIG['metric'])
+        max_iter: Máximo de iteraciones (por defecto CLUSTERING_CONFIG['max_iter'])
+        distances: Matriz de distancias precalculada (opcional; se usa
+            aunque la silueta no sea exacta)
+        cache_dir: Directorio de caché de ``distances.distance_matrix``
+        silhouette_mode: 'auto', 'exact', 'sampled' o 'simplified' (ver
+            ``silhouette.estimate_silhouette``)
+
+    Returns:
+        tuple: (DataFrame con una fila por trabajo, k recomendado)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    seeds = list(seeds) if seeds is not None else [CLUSTERING_CONFIG['random_state']]
+    max_iter = max_iter if max_iter is not None else CLUSTERING_CONFIG['max_iter']
+    metric = metric or CLUSTERING_CONFIG.get('metric', 'euclidean')
+    silhouette_mode = silhouette_mode or CLUSTERING_CONFIG.get('silhouette_mode', 'auto')
+    if silhouette_mode == 'auto':
+        exact = len(X) <= CLUSTERING_CONFIG.get('silhouette_exact_max_n', 5000)
+        silhouette_mode = 'exact' if exact else 'sampled'
+    if distances is None and silhouette_mode == 'exact':
+        distances = distance_matrix(X, metric=metric, cache_dir=cache_dir)
+
+    deterministic = CLUSTERING_CONFIG.get('init', 'build') == 'build'
+    jobs = [(algorithm, int(k), seed, max_iter, silhouette_mode, metric)
+            for algorithm in algorithms for k in k_values
+            for seed in (seeds[:1] if algorithm == 'k-medoids' and deterministic else seeds)]
+    arrays = {'X': X} if distances is None else {'X': X, 'D': distances}
+    rows = map_shared(_evaluate, jobs, arrays, n_jobs=n_jobs)
+
+    results = pd.DataFrame(rows, columns=['algorithm', 'k', 'seed', *METRIC_COLUMNS,
+                                          'silhouette_ci_low', 'silhouette_ci_high',
+                                          'inertia', 'fit_seconds'])
+    algorithm = CLUSTERING_CONFIG.get('algorithm', 'k-medoids')
+    if algorithm not in algorithms:
+        algorithm = algorithms[0]
+    return results, recommend_k(results, algorithm)
+
+
+if __name__ == '__main__':
+    from artifact_store import load_artifact
+
+    df_X = load_artifact('pca_data')
+    resultados, k_recomendado = k_sweep(df_X)
+    resumen = resultados.groupby(['algorithm', 'k'])[list(METRIC_COLUMNS)].mean()
+    print(resumen.round(4).to_string())
+    print(f"\nk recomendado ({CLUSTERING_CONFIG['algorithm']}): {k_recomendado}")
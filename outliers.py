@@ -0,0 +1,331 @@
+"""
+Detección de outliers por columna y por clúster
+===============================================
+
+``detect_outliers`` aplica la regla IQR a todas las columnas numéricas de una
+vez, con cuartiles globales o por ``cluster_kmedoids``:
+
+- globales: ``np.nanquantile`` sobre la matriz (n, columnas),
+- por clúster: una ordenación (grupo, valor) por columna con
+  ``utils.grouped_metrics``.
+
+``StreamingOutlierBounds`` mantiene los mismos límites sobre un flujo de
+transacciones sin guardarlas: cada (grupo, columna) tiene un sketch KLL de
+cuantiles (``KLLSketch``), que ocupa O(k · log n) y se puede combinar con
+otro (``merge``), de modo que cada bloque o proceso aporta su propio sketch.
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import FILE_PATHS, OUTLIER_CONFIG
+from artifact_store import has_artifact, read_arrays, write_arrays
+
+GLOBAL_GROUP = 'global'
+OUTLIER_STATE_ARTIFACT = 'outliers_sketches'
+
+
+def numeric_columns(df, by=None):
+    """Columnas numéricas analizables (sin identificadores ni etiquetas de clúster)."""
+    return [column for column in df.select_dtypes(include='number').columns
+            if column != by and column != 'numerodoi' and not str(column).startswith('cluster')]
+
+
+def _group_codes(df, by, groups):
+    if by is None:
+        return np.zeros(len(df), dtype=np.int64)
+    return pd.Index(groups).get_indexer(df[by])
+
+
+def outlier_bounds(df, columns=None, by=None, factor=None):
+    """
+    Límites IQR (Q1 - factor·IQR, Q3 + factor·IQR) de cada columna.
+
+    Args:
+        df: DataFrame
+        columns: Columnas a analizar (por defecto todas las numéricas)
+        by: Columna de grupo (p. ej. 'cluster_kmedoids'); None = global
+        factor: Factor del IQR (por defecto OUTLIER_CONFIG)
+
+    Returns:
+        pandas.DataFrame: Una fila por grupo (GLOBAL_GROUP si ``by`` es None)
+            y columnas ('lower', columna) y ('upper', columna)
+    """
+    from utils import grouped_metrics
+
+    factor = factor if factor is not None else OUTLIER_CONFIG['factor']
+    columns = list(columns or numeric_columns(df, by))
+
+    if by is None:
+        values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        q1, q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+        q1, q3 = q1[None, :], q3[None, :]
+        groups = pd.Index([GLOBAL_GROUP])
+    else:
+        spec = {}
+        for column in columns:
+            spec[('q1', column)] = (column, 0.25)
+            spec[('q3', column)] = (column, 0.75)
+        quartiles = grouped_metrics(df, by, spec, derived={})
+        q1 = quartiles[[('q1', column) for column in columns]].to_numpy()
+        q3 = quartiles[[('q3', column) for column in columns]].to_numpy()
+        groups = quartiles.index
+    return _bounds_frame(q1, q3, factor, groups, columns)
+
+
+def _bounds_frame(q1, q3, factor, groups, columns):
+    iqr = q3 - q1
+    lower = pd.DataFrame(q1 - factor * iqr, index=groups, columns=columns)
+    upper = pd.DataFrame(q3 + factor * iqr, index=groups, columns=columns)
+    return pd.concat({'lower': lower, 'upper': upper}, axis=1)
+
+
+def detect_outliers(df, columns=None, by=None, factor=None, bounds=None):
+    """
+    Marca los outliers de todas las columnas en una pasada vectorizada.
+
+    Args:
+        df: DataFrame
+        columns: Columnas a analizar (por defecto las de ``bounds`` o todas
+            las numéricas)
+        by: Columna de grupo; None = límites globales
+        factor: Factor del IQR (por defecto OUTLIER_CONFIG)
+        bounds: Límites precalculados (``outlier_bounds`` o
+            ``StreamingOutlierBounds.bounds``); si es None se calculan con ``df``
+
+    Returns:
+        pandas.DataFrame: Máscara booleana (mismo índice que ``df``, una
+            columna por columna analizada); NaN y grupos sin límites no son outliers
+    """
+    if columns is None and bounds is not None:
+        columns = list(bounds['lower'].columns)
+    columns = list(columns or numeric_columns(df, by))
+    if bounds is None:
+        bounds = outlier_bounds(df, columns, by, factor)
+
+    codes = _group_codes(df, by, bounds.index)
+    known = codes >= 0
+    lower = bounds['lower'][columns].to_numpy(dtype=np.float64)[np.maximum(codes, 0)]
+    upper = bounds['upper'][columns].to_numpy(dtype=np.float64)[np.maximum(codes, 0)]
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        mask = ((values < lower) | (values > upper)) & known[:, None]
+    return pd.DataFrame(mask, index=df.index, columns=columns)
+
+
+class KLLSketch:
+    """
+    Sketch KLL de cuantiles: combinable y de tamaño O(k · log n).
+
+    Los elementos del nivel h pesan 2^h. Cuando un nivel supera su capacidad
+    (k · (2/3)^(niveles - 1 - h), mínimo 2) se ordena y la mitad de sus
+    elementos (pares o impares, al azar) sube al nivel siguiente. El error de
+    rango es del orden de 1/k.
+
+    Args:
+        k: Capacidad del nivel superior (por defecto OUTLIER_CONFIG['sketch_k'])
+        seed: Semilla de las compactaciones
+    """
+
+    def __init__(self, k=None, seed=None):
+        self.k = k or OUTLIER_CONFIG['sketch_k']
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h):
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.levels) - 1 - h))))
+
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for h in range(len(self.levels)):
+                level = self.levels[h]
+                if len(level) <= self._capacity(h):
+                    continue
+                level = np.sort(level)
+                # Con un número impar de elementos el mayor se queda en su nivel
+                kept = level[len(level) - len(level) % 2:]
+                promoted = level[:len(level) - len(kept)][self._rng.integers(2)::2]
+                self.levels[h] = kept
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                compacted = True
+
+    def update(self, values):
+        """
+        Añade valores (se ignoran los NaN).
+
+        Returns:
+            KLLSketch: El propio sketch
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.n += len(values)
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """
+        Combina otro sketch (p. ej. de otro bloque o proceso).
+
+        Returns:
+            KLLSketch: El propio sketch
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """
+        Cuantil(es) aproximado(s); q = 0 y q = 1 devuelven el mínimo y el
+        máximo exactos.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items)
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        result = items[order][np.minimum(position, len(items) - 1)]
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return result if result.ndim else float(result)
+
+    def state(self):
+        """Elementos y nivel de cada uno, para guardarlos como arrays."""
+        items = np.concatenate(self.levels)
+        levels = np.concatenate([np.full(len(level), h, dtype=np.int64)
+                                 for h, level in enumerate(self.levels)])
+        return items, levels
+
+    @classmethod
+    def from_state(cls, items, levels, n, minimum, maximum, k, seed=None):
+        """Reconstruye un sketch guardado con ``state``."""
+        sketch = cls(k, seed)
+        n_levels = int(levels.max()) + 1 if len(levels) else 1
+        sketch.levels = [np.asarray(items[levels == h], dtype=np.float64) for h in range(n_levels)]
+        sketch.n, sketch.min, sketch.max = int(n), float(minimum), float(maximum)
+        return sketch
+
+
+class StreamingOutlierBounds:
+    """
+    Límites IQR actualizados bloque a bloque con un sketch por (grupo, columna).
+
+    Args:
+        columns: Columnas a seguir
+        by: Columna de grupo de los bloques (p. ej. 'cluster_kmedoids');
+            None = global
+        k: Tamaño de los sketches (por defecto OUTLIER_CONFIG['sketch_k'])
+    """
+
+    def __init__(self, columns, by=None, k=None):
+        self.columns = list(columns)
+        self.by = by
+        self.k = k or OUTLIER_CONFIG['sketch_k']
+        self.sketches = {}
+
+    def _sketch(self, group, column):
+        key = (group, column)
+        if key not in self.sketches:
+            self.sketches[key] = KLLSketch(self.k, seed=len(self.sketches))
+        return self.sketches[key]
+
+    def update(self, chunk):
+        """
+        Añade un bloque de filas a los sketches.
+
+        Returns:
+            StreamingOutlierBounds: El propio objeto
+        """
+        values = chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        if self.by is None:
+            groups, codes = np.asarray([GLOBAL_GROUP]), np.zeros(len(chunk), dtype=np.int64)
+        else:
+            codes, groups = pd.factorize(chunk[self.by], sort=True)
+            groups = np.asarray(groups)
+        # Filas ordenadas por grupo: cada grupo es un tramo contiguo
+        order = np.argsort(codes, kind='stable')
+        splits = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(groups)))[:-1]
+        valid_rows = order[codes[order] >= 0]
+        for group, rows in zip(groups, np.split(valid_rows, splits)):
+            group = group.item() if isinstance(group, np.generic) else group
+            for position, column in enumerate(self.columns):
+                self._sketch(group, column).update(values[rows, position])
+        return self
+
+    def merge(self, other):
+        """
+        Combina los sketches de otro objeto con las mismas columnas.
+
+        Returns:
+            StreamingOutlierBounds: El propio objeto
+        """
+        for (group, column), sketch in other.sketches.items():
+            self._sketch(group, column).merge(sketch)
+        return self
+
+    def bounds(self, factor=None):
+        """
+        Límites IQR actuales, en el formato de ``outlier_bounds``.
+        """
+        factor = factor if factor is not None else OUTLIER_CONFIG['factor']
+        groups = sorted({group for group, _ in self.sketches}, key=str)
+        q1 = np.full((len(groups), len(self.columns)), np.nan)
+        q3 = np.full_like(q1, np.nan)
+        for i, group in enumerate(groups):
+            for j, column in enumerate(self.columns):
+                sketch = self.sketches.get((group, column))
+                if sketch is not None:
+                    q1[i, j], q3[i, j] = sketch.quantile([0.25, 0.75])
+        return _bounds_frame(q1, q3, factor, pd.Index(groups, name=self.by), self.columns)
+
+    def save(self, store_dir=None, name=None):
+        """
+        Guarda los sketches en el almacén de artefactos.
+        """
+        arrays = {}
+        sketches = []
+        for position, ((group, column), sketch) in enumerate(self.sketches.items()):
+            arrays[f'items_{position}'], arrays[f'levels_{position}'] = sketch.state()
+            sketches.append({'group': group, 'column': column, 'n': sketch.n,
+                             'min': sketch.min, 'max': sketch.max})
+        write_arrays(name or OUTLIER_STATE_ARTIFACT, arrays, store_dir=store_dir,
+                     metadata={'columns': self.columns, 'by': self.by, 'k': self.k,
+                               'sketches': sketches})
+
+    @classmethod
+    def load(cls, store_dir=None, name=None):
+        """
+        Carga los sketches guardados con ``save``.
+
+        Returns:
+            StreamingOutlierBounds or None: Objeto, o None si aún no existe
+        """
+        name = name or OUTLIER_STATE_ARTIFACT
+        if not has_artifact(name, store_dir or FILE_PATHS['store']):
+            return None
+        arrays, metadata = read_arrays(name, store_dir, mmap=False)
+        streaming = cls(metadata['columns'], metadata['by'], metadata['k'])
+        for position, info in enumerate(metadata['sketches']):
+            streaming.sketches[info['group'], info['column']] = KLLSketch.from_state(
+                arrays[f'items_{position}'], arrays[f'levels_{position}'], info['n'],
+                info['min'], info['max'], metadata['k'], seed=position)
+        return streaming
@@ -0,0 +1,225 @@
+"""
+Proyección PCA persistida
+=========================
+
+Este módulo ajusta el PCA de dos componentes sobre ``X_procesado`` una sola
+vez por versión de datos y guarda en el almacén de artefactos los
+componentes, la varianza explicada y las coordenadas 2-D de cada PYME
+(``numerodoi``). El dashboard solo lee la proyección guardada.
+
+Las PYMEs nuevas se proyectan con los componentes guardados, sin reajustar
+el PCA; el ajuste solo se repite si cambian las columnas, si cambian las
+filas con las que se ajustó (su versión se guarda en los metadatos) o si se
+pide explícitamente.
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import CLUSTERING_CONFIG, FILE_PATHS
+from artifact_store import (
+    has_artifact, read_arrays, read_manifest, read_table, write_arrays, write_table
+)
+from data_cache import data_version
+from preprocessing import transform
+
+PCA_MODEL_ARTIFACT = 'pca_modelo'
+PCA_COORDS_ARTIFACT = 'pca_proyeccion'
+
+
+def fit_pca_projection(df_X, ids, n_components=2, random_state=None):
+    """
+    Ajusta el PCA y calcula las coordenadas de todas las PYMEs.
+
+    Args:
+        df_X: DataFrame con los datos preprocesados (X_procesado)
+        ids: Identificadores ``numerodoi`` alineados con las filas de df_X
+        n_components: Número de componentes principales
+        random_state: Semilla (por defecto CLUSTERING_CONFIG['random_state'])
+
+    Returns:
+        dict: components, mean, explained_variance_ratio, feature_names,
+            fit_ids y coords
+    """
+    from sklearn.decomposition import PCA
+
+    if random_state is None:
+        random_state = CLUSTERING_CONFIG['random_state']
+
+    pca = PCA(n_components=n_components, random_state=random_state)
+    coords = pca.fit_transform(np.asarray(df_X, dtype=np.float64))
+
+    return {
+        'components': pca.components_,
+        'mean': pca.mean_,
+        'explained_variance_ratio': pca.explained_variance_ratio_,
+        'feature_names': [str(col) for col in df_X.columns],
+        'fit_ids': _id_array(ids),
+        'coords': _coords_frame(coords, ids),
+    }
+
+
+def _id_array(ids):
+    ids = np.asarray(ids)
+    # El almacén no guarda arrays de objetos
+    return ids.astype(str) if ids.dtype == object else ids
+
+
+def _with_ids(df_X, ids):
+    """X_procesado indexado por ``numerodoi``: la versión cubre datos e identificadores."""
+    return df_X.set_axis(pd.Index(np.asarray(ids), name='numerodoi'))
+
+
+def _training_rows_unchanged(indexed, projection):
+    """Indica si las filas con las que se ajustó el PCA siguen igual."""
+    fit_ids = projection.get('fit_ids')
+    if fit_ids is None or not indexed.index.is_unique:
+        return False
+    positions = indexed.index.get_indexer(np.asarray(fit_ids))
+    if (positions < 0).any():
+        return False
+    return data_version(indexed.iloc[positions]) == projection['fit_version']
+
+
+def _coords_frame(coords, ids):
+    columns = [f'pc{i + 1}' for i in range(coords.shape[1])]
+    index = pd.Index(np.asarray(ids), name='numerodoi')
+    return pd.DataFrame(coords, index=index, columns=columns)
+
+
+def project(X_new, projection):
+    """
+    Proyecta filas nuevas con los componentes guardados (solo NumPy).
+
+    Args:
+        X_new: Array o DataFrame con las mismas columnas que X_procesado
+        projection: Diccionario devuelto por ``load_pca_projection``
+
+    Returns:
+        numpy.ndarray: Coordenadas (n_filas, n_componentes)
+    """
+    X_new = np.asarray(X_new, dtype=np.float64)
+    return (X_new - projection['mean']) @ np.asarray(projection['components']).T
+
+
+def project_pymes(df_pymes, projection, preprocessor):
+    """
+    Proyecta PYMEs sin preprocesar con el preprocesador guardado (sin sklearn).
+
+    Args:
+        df_pymes: PYMEs con las columnas de características
+        projection: Diccionario devuelto por ``load_pca_projection``
+        preprocessor: Parámetros de ``preprocessing.load_preprocessor``
+
+    Returns:
+        numpy.ndarray: Coordenadas (n_filas, n_componentes)
+    """
+    return project(transform(df_pymes, preprocessor), projection)
+
+
+def save_pca_projection(projection, fit_version, version, store_dir=None):
+    """
+    Guarda el modelo PCA y las coordenadas en el almacén de artefactos.
+
+    Args:
+        projection: Diccionario con el modelo y las coordenadas
+        fit_version: Versión de los datos con los que se ajustó el PCA
+        version: Versión de los datos cuyas coordenadas se guardan
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+    """
+    write_arrays(
+        PCA_MODEL_ARTIFACT,
+        {
+            'components': projection['components'],
+            'mean': projection['mean'],
+            'explained_variance_ratio': projection['explained_variance_ratio'],
+            'fit_ids': projection['fit_ids'],
+        },
+        store_dir=store_dir,
+        metadata={'fit_version': fit_version, 'feature_names': projection['feature_names']},
+    )
+    write_table(projection['coords'], PCA_COORDS_ARTIFACT, store_dir=store_dir,
+                metadata={'data_version': version})
+
+
+def load_pca_projection(store_dir=None):
+    """
+    Carga la proyección guardada.
+
+    Returns:
+        dict or None: Modelo y coordenadas, o None si aún no se ha generado
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    if not (has_artifact(PCA_MODEL_ARTIFACT, store_dir) and has_artifact(PCA_COORDS_ARTIFACT, store_dir)):
+        return None
+
+    arrays, model_meta = read_arrays(PCA_MODEL_ARTIFACT, store_dir)
+    coords = read_table(PCA_COORDS_ARTIFACT, store_dir)
+    coords_meta = read_manifest(PCA_COORDS_ARTIFACT, store_dir)['metadata']
+
+    projection = dict(arrays)
+    projection.update({
+        'feature_names': model_meta['feature_names'],
+        'fit_version': model_meta['fit_version'],
+        'data_version': coords_meta.get('data_version'),
+        'coords': coords,
+    })
+    return projection
+
+
+def ensure_pca_projection(df_X, ids, store_dir=None, refit=False):
+    """
+    Devuelve la proyección de la versión actual de los datos.
+
+    Si la versión guardada coincide se carga tal cual. Si solo se añadieron
+    filas (PYMEs nuevas) y las del ajuste siguen igual, se proyectan con los
+    componentes guardados. Se ajusta un PCA nuevo si no existe modelo, si
+    cambiaron las columnas o los datos de alguna PYME del ajuste, o si
+    ``refit`` es True.
+
+    Args:
+        df_X: DataFrame con los datos preprocesados (X_procesado)
+        ids: Identificadores ``numerodoi`` alineados con las filas de df_X
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+        refit: Forzar un nuevo ajuste del PCA
+
+    Returns:
+        dict: Modelo y coordenadas de la proyección
+    """
+    indexed = _with_ids(df_X, ids)
+    version = data_version(indexed)
+    projection = None if refit else load_pca_projection(store_dir)
+
+    if projection is not None and projection['data_version'] == version:
+        return projection
+
+    reusable = projection is not None and \
+        projection['feature_names'] == [str(col) for col in df_X.columns] and \
+        _training_rows_unchanged(indexed, projection)
+
+    if reusable:
+        fit_version = projection['fit_version']
+        projection = dict(projection)
+        projection['coords'] = _coords_frame(project(df_X, projection), ids)
+    else:
+        fit_version = version
+        projection = fit_pca_projection(df_X, ids)
+
+    projection['fit_version'] = fit_version
+    projection['data_version'] = version
+    try:
+        save_pca_projection(projection, fit_version, version, store_dir=store_dir)
+    except OSError as e:
+        print(f"No se pudo guardar la proyección PCA: {e}")
+    return projection
+
+
+if __name__ == '__main__':
+    from artifact_store import load_artifact
+
+    df_clusters = load_artifact('clusters')
+    df_X = load_artifact('pca_data')
+    proyeccion = ensure_pca_projection(df_X, df_clusters['numerodoi'].to_numpy(), refit=True)
+    varianza = np.asarray(proyeccion['explained_variance_ratio'])
+    print(f"Proyección PCA guardada en '{FILE_PATHS['store']}' "
+          f"(varianza explicada: {varianza.sum():.1%})")
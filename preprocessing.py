@@ -0,0 +1,259 @@
+"""
+Preprocesador persistido
+========================
+
+El ``ColumnTransformer`` del notebook (media + escalado para las numéricas,
+moda + one-hot para las categóricas) se ajusta una vez y sus parámetros se
+guardan en el almacén de artefactos como arrays con un hash del esquema
+(columnas de entrada, categorías y columnas de salida).
+
+``transform`` aplica esos parámetros solo con NumPy/pandas, sin importar
+sklearn, de modo que la asignación de clústeres, la proyección PCA y el
+dashboard pueden transformar PYMEs nuevas sin reajustar nada.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from config import FILE_PATHS
+from artifact_store import has_artifact, read_arrays, write_arrays
+from data_cache import data_version
+
+PREPROCESSOR_ARTIFACT = 'preprocesador'
+PREPROCESSOR_FORMAT_VERSION = 1
+
+NUMERIC_FEATURES = [
+    'ingresos_totales',
+    'ticket_promedio',
+    'cantidad_total',
+    'cantidad_promedio_venta',
+    'numero_transacciones',
+    'numero_productos_unicos',
+    'valor_unitario_promedio',
+    'precio_unitario_promedio',
+    'periodo_actividad_dias',
+]
+
+CATEGORICAL_FEATURES = [
+    'metodo_pago_preferido',
+    'moneda_preferida',
+    'unidad_comun',
+    'vendedor_principal',
+    'estado_comun',
+]
+
+
+def build_preprocessor():
+    """
+    Crea (sin ajustar) el preprocesador del notebook.
+
+    Returns:
+        sklearn.compose.ColumnTransformer: Media + escalado para las
+            numéricas y moda + one-hot para las categóricas
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    transformador_numerico = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='mean')),
+        ('scaler', StandardScaler()),
+    ])
+    transformador_categorico = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('onehot', OneHotEncoder(handle_unknown='ignore')),
+    ])
+    return ColumnTransformer(
+        transformers=[
+            ('num', transformador_numerico, NUMERIC_FEATURES),
+            ('cat', transformador_categorico, CATEGORICAL_FEATURES),
+        ],
+        remainder='drop',
+    )
+
+
+def schema_hash(params):
+    """
+    Hash del esquema: columnas de entrada, categorías y columnas de salida.
+    """
+    schema = {
+        'numeric': list(params['numeric_features']),
+        'categorical': {column: [str(value) for value in categories]
+                        for column, categories in zip(params['categorical_features'],
+                                                      params['categories'])},
+        'output': list(params['feature_names']),
+    }
+    return hashlib.sha1(json.dumps(schema, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def fit_preprocessor(df_pymes):
+    """
+    Ajusta el preprocesador con sklearn y extrae sus parámetros.
+
+    Args:
+        df_pymes: Tabla de PYMEs con NUMERIC_FEATURES y CATEGORICAL_FEATURES
+
+    Returns:
+        dict: Parámetros del preprocesador (medias de imputación, media y
+            escala, modas, categorías), nombres de salida, hash del esquema
+            y versión de los datos de ajuste
+    """
+    transformer = build_preprocessor()
+    transformer.fit(df_pymes[NUMERIC_FEATURES + CATEGORICAL_FEATURES])
+
+    numeric = transformer.named_transformers_['num']
+    categorical = transformer.named_transformers_['cat']
+    encoder = categorical.named_steps['onehot']
+
+    params = {
+        'numeric_features': list(NUMERIC_FEATURES),
+        'categorical_features': list(CATEGORICAL_FEATURES),
+        'impute_mean': numeric.named_steps['imputer'].statistics_.astype(np.float64),
+        'center': numeric.named_steps['scaler'].mean_.astype(np.float64),
+        'scale': numeric.named_steps['scaler'].scale_.astype(np.float64),
+        'impute_mode': [value for value in categorical.named_steps['imputer'].statistics_],
+        'categories': [list(categories) for categories in encoder.categories_],
+        'feature_names': [str(name) for name in transformer.get_feature_names_out()],
+        'fit_version': data_version(df_pymes[NUMERIC_FEATURES + CATEGORICAL_FEATURES]),
+    }
+    params['schema_hash'] = schema_hash(params)
+    return params
+
+
+def transform(df, params):
+    """
+    Transforma PYMEs con los parámetros guardados (solo NumPy/pandas).
+
+    Equivale a ``ColumnTransformer.transform``; las categorías no vistas en
+    el ajuste producen ceros en todas sus columnas one-hot
+    (``handle_unknown='ignore'``).
+
+    Args:
+        df: DataFrame con las columnas de entrada del preprocesador
+        params: Parámetros de ``fit_preprocessor``/``load_preprocessor``
+
+    Returns:
+        numpy.ndarray: Matriz (n, n_columnas_salida) en float64
+    """
+    missing = [column for column in params['numeric_features'] + params['categorical_features']
+               if column not in df.columns]
+    if missing:
+        raise KeyError(f"Faltan columnas para el preprocesador: {missing}")
+
+    n_numeric = len(params['numeric_features'])
+    n_output = n_numeric + sum(len(categories) for categories in params['categories'])
+    out = np.zeros((len(df), n_output), dtype=np.float64)
+
+    numeric = df[params['numeric_features']].to_numpy(dtype=np.float64, na_value=np.nan)
+    numeric = np.where(np.isnan(numeric), params['impute_mean'], numeric)
+    out[:, :n_numeric] = (numeric - params['center']) / params['scale']
+
+    offset = n_numeric
+    rows = np.arange(len(df))
+    for column, mode, categories in zip(params['categorical_features'], params['impute_mode'],
+                                        params['categories']):
+        # object: las columnas Categorical no admiten la moda como valor nuevo
+        values = df[column].astype(object)
+        values = values.where(values.notna(), mode).astype(str)
+        codes = pd.Index([str(category) for category in categories]).get_indexer(values)
+        known = codes >= 0
+        out[rows[known], offset + codes[known]] = 1.0
+        offset += len(categories)
+    return out
+
+
+def save_preprocessor(params, store_dir=None):
+    """
+    Guarda los parámetros del preprocesador en el almacén de artefactos.
+    """
+    categorical_values = {
+        f'categorias_{position}': np.asarray([str(value) for value in categories])
+        for position, categories in enumerate(params['categories'])
+    }
+    write_arrays(
+        PREPROCESSOR_ARTIFACT,
+        {
+            'impute_mean': params['impute_mean'],
+            'center': params['center'],
+            'scale': params['scale'],
+            **categorical_values,
+        },
+        store_dir=store_dir,
+        metadata={
+            'format_version': PREPROCESSOR_FORMAT_VERSION,
+            'schema_hash': params['schema_hash'],
+            'fit_version': params['fit_version'],
+            'numeric_features': params['numeric_features'],
+            'categorical_features': params['categorical_features'],
+            'impute_mode': [str(value) for value in params['impute_mode']],
+            'feature_names': params['feature_names'],
+        },
+    )
+
+
+def load_preprocessor(store_dir=None):
+    """
+    Carga los parámetros guardados.
+
+    Returns:
+        dict or None: Parámetros, o None si aún no se ha generado
+
+    Raises:
+        ValueError: Si el artefacto es de otra versión de formato o su
+            esquema no coincide con su hash
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    if not has_artifact(PREPROCESSOR_ARTIFACT, store_dir):
+        return None
+
+    arrays, metadata = read_arrays(PREPROCESSOR_ARTIFACT, store_dir, mmap=False)
+    if metadata.get('format_version') != PREPROCESSOR_FORMAT_VERSION:
+        raise ValueError(f"Versión de preprocesador no soportada: {metadata.get('format_version')}")
+
+    params = {
+        'numeric_features': metadata['numeric_features'],
+        'categorical_features': metadata['categorical_features'],
+        'impute_mean': arrays['impute_mean'],
+        'center': arrays['center'],
+        'scale': arrays['scale'],
+        'impute_mode': metadata['impute_mode'],
+        'categories': [arrays[f'categorias_{position}'].tolist()
+                       for position in range(len(metadata['categorical_features']))],
+        'feature_names': metadata['feature_names'],
+        'fit_version': metadata['fit_version'],
+        'schema_hash': metadata['schema_hash'],
+    }
+    if schema_hash(params) != params['schema_hash']:
+        raise ValueError("El esquema del preprocesador guardado no coincide con su hash")
+    return params
+
+
+def ensure_preprocessor(df_pymes, store_dir=None, refit=False):
+    """
+    Devuelve el preprocesador guardado o lo ajusta si no existe.
+
+    Args:
+        df_pymes: Tabla de PYMEs usada si hay que ajustar
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+        refit: Forzar un nuevo ajuste
+
+    Returns:
+        dict: Parámetros del preprocesador
+    """
+    params = None if refit else load_preprocessor(store_dir)
+    if params is None:
+        params = fit_preprocessor(df_pymes)
+        save_preprocessor(params, store_dir)
+    return params
+
+
+if __name__ == '__main__':
+    from artifact_store import load_artifact
+
+    parametros = ensure_preprocessor(load_artifact('clusters'), refit=True)
+    print(f"Preprocesador guardado en '{FILE_PATHS['store']}' "
+          f"({len(parametros['feature_names'])} columnas, esquema {parametros['schema_hash'][:12]})")
@@ -0,0 +1,157 @@
+"""
+Reconciliación jerárquica de pronósticos
+========================================
+
+Los pronósticos se ajustan por separado en cada nivel (PYME, clúster y
+total), así que la suma de los niveles inferiores no coincide con el
+superior. Este módulo los vuelve coherentes con la matriz de agregación
+``S`` (dispersa), cuyas filas son el total, cada clúster y cada PYME:
+
+- ``bottom_up``: ỹ = S · ŷ_pymes,
+- ``top_down``: reparte el total según las proporciones históricas de cada
+  PYME,
+- ``mint``: mínima traza con W diagonal (``ols``, ``structural`` o
+  ``variance``), en su forma de proyección sobre las restricciones:
+  ỹ = ŷ − W Cᵀ (C W Cᵀ)⁻¹ C ŷ, con C = [I, −A]. Solo hay que resolver un
+  sistema de (1 + k) × (1 + k), de modo que decenas de miles de PYMEs no
+  requieren matrices densas de n × n.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from config import FORECAST_CONFIG
+
+METHODS = ('bottom_up', 'top_down', 'mint')
+WEIGHTS = ('ols', 'structural', 'variance')
+
+
+def summing_matrix(bottom_clusters):
+    """
+    Construye la matriz de agregación total → clúster → PYME.
+
+    Args:
+        bottom_clusters: Clúster de cada serie inferior (PYME), en el orden
+            de las filas inferiores
+
+    Returns:
+        tuple: (S dispersa CSR de forma (1 + k + n, n), identificadores de
+            clúster en el orden de sus filas)
+    """
+    cluster_ids, codes = np.unique(np.asarray(bottom_clusters), return_inverse=True)
+    n, k = len(codes), len(cluster_ids)
+    columns = np.arange(n)
+    total = sparse.csr_matrix((np.ones(n), (np.zeros(n, dtype=np.int64), columns)), shape=(1, n))
+    clusters = sparse.csr_matrix((np.ones(n), (codes, columns)), shape=(k, n))
+    return sparse.vstack([total, clusters, sparse.identity(n, format='csr')], format='csr'), cluster_ids
+
+
+def _weights(S, kind, variances=None):
+    """Diagonal de W para MinT."""
+    if kind == 'ols':
+        return np.ones(S.shape[0])
+    if kind == 'structural':
+        return np.asarray(S.sum(axis=1)).ravel()
+    if kind == 'variance':
+        if variances is None:
+            raise ValueError("Las ponderaciones 'variance' necesitan las varianzas de los residuos")
+        return np.maximum(np.asarray(variances, dtype=np.float64), np.finfo(np.float64).tiny)
+    raise ValueError(f"Ponderación no soportada: {kind}. Opciones: {WEIGHTS}")
+
+
+def reconcile(base, S, method=None, weights=None, variances=None, history=None):
+    """
+    Reconcilia los pronósticos base de todos los nodos.
+
+    Args:
+        base: Pronósticos base (n_nodos, horizonte), en el orden de filas de S
+        S: Matriz de agregación de ``summing_matrix``
+        method: 'bottom_up', 'top_down' o 'mint' (por defecto FORECAST_CONFIG)
+        weights: Diagonal de W en MinT: 'ols', 'structural' o 'variance'
+        variances: Varianza de los residuos de cada nodo ('variance')
+        history: Historia de las series inferiores (n, meses), para las
+            proporciones de 'top_down'
+
+    Returns:
+        numpy.ndarray: Pronósticos coherentes (n_nodos, horizonte)
+    """
+    method = method or FORECAST_CONFIG['reconciliation']
+    weights = weights or FORECAST_CONFIG['reconciliation_weights']
+    if method not in METHODS:
+        raise ValueError(f"Método de reconciliación no soportado: {method}. Opciones: {METHODS}")
+
+    base = np.asarray(base, dtype=np.float64)
+    one_dim = base.ndim == 1
+    base = base.reshape(len(base), -1)
+    n_bottom = S.shape[1]
+    n_aggregate = S.shape[0] - n_bottom
+    A = S[:n_aggregate]
+
+    if method == 'bottom_up':
+        bottom = base[n_aggregate:]
+    elif method == 'top_down':
+        if history is None:
+            raise ValueError("'top_down' necesita la historia de las series inferiores")
+        history = np.nan_to_num(np.asarray(history, dtype=np.float64))
+        # Proporciones de las medias históricas
+        proportions = history.mean(axis=1) / history.mean(axis=1).sum()
+        bottom = proportions[:, None] * base[:1]
+    else:
+        w = _weights(S, weights, variances)
+        w_aggregate, w_bottom = w[:n_aggregate], w[n_aggregate:]
+        # C ŷ: incoherencia de cada nodo agregado
+        gap = base[:n_aggregate] - A @ base[n_aggregate:]
+        M = (A.multiply(w_bottom) @ A.T).toarray() + np.diag(w_aggregate)
+        lam = np.linalg.solve(M, gap)
+        bottom = base[n_aggregate:] + w_bottom[:, None] * (A.T @ lam)
+
+    # Los nodos agregados se recalculan desde las PYMEs: coherencia exacta
+    reconciled = np.vstack([A @ bottom, bottom])
+    return reconciled[:, 0] if one_dim else reconciled
+
+
+def reconcile_frames(pyme_forecasts, cluster_forecasts, total_forecast, pyme_clusters,
+                     method=None, weights=None, variances=None, history=None):
+    """
+    Reconcilia pronósticos con índice de fechas (formato de los CSV de Prophet).
+
+    Args:
+        pyme_forecasts: DataFrame índice ds, una columna por numerodoi
+        cluster_forecasts: DataFrame índice ds, una columna por clúster
+        total_forecast: Serie índice ds con el pronóstico del total
+        pyme_clusters: Serie numerodoi -> clúster
+        method, weights, variances: Ver ``reconcile``; ``variances`` como
+            Serie indexada por 'total', clúster y numerodoi
+        history: DataFrame índice fecha, una columna por numerodoi
+            (p. ej. ``statistical_forecast.monthly_revenue``)
+
+    Returns:
+        tuple: (PYMEs, clústeres, total) reconciliados, con los mismos
+            índices y columnas que la entrada
+    """
+    pymes = pyme_forecasts.columns
+    S, cluster_ids = summing_matrix(pyme_clusters.reindex(pymes).to_numpy())
+    clusters = pd.Index(cluster_ids)
+    base = np.vstack([
+        total_forecast.to_numpy(dtype=np.float64)[None, :],
+        cluster_forecasts.rename(columns=str)[clusters.astype(str)].to_numpy(dtype=np.float64).T,
+        pyme_forecasts.to_numpy(dtype=np.float64).T,
+    ])
+    if variances is not None:
+        labels = ['total', *clusters.astype(str), *pymes.astype(str)]
+        variances = variances.rename(index=str).reindex(labels).to_numpy()
+    if history is not None:
+        history = history.reindex(columns=pymes, fill_value=0.0).to_numpy(dtype=np.float64).T
+
+    reconciled = reconcile(base, S, method, weights, variances, history)
+    index = pyme_forecasts.index
+    k = len(clusters)
+    cluster_frame = pd.DataFrame(reconciled[1:1 + k].T, index=index, columns=clusters)
+    cluster_frame.columns = cluster_forecasts.columns[
+        pd.Index(cluster_forecasts.columns.astype(str)).get_indexer(clusters.astype(str))]
+    return (
+        pd.DataFrame(reconciled[1 + k:].T, index=index, columns=pymes),
+        cluster_frame,
+        pd.Series(reconciled[0], index=index, name=total_forecast.name),
+    )
@@ -0,0 +1,253 @@
+"""
+Asignación de clústeres a PYMEs nuevas
+======================================
+
+Este módulo guarda las coordenadas de los medoides de K-Medoids junto al
+preprocesador persistido (ver preprocessing.py) y con ellos asigna lotes de
+PYMEs nuevas o actualizadas a su medoide más cercano sin volver a ajustar
+nada ni importar sklearn. El cálculo se hace por bloques y devuelve también
+el margen de distancia al segundo medoide más cercano (un margen pequeño
+indica una asignación dudosa).
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import CLUSTERING_CONFIG, FILE_PATHS, SCORING_CONFIG
+from artifact_store import has_artifact, read_arrays, write_arrays
+from distances import metric_ranges
+from kmedoids import kmedoids_for, nearest_medoids
+from preprocessing import (ensure_preprocessor, fit_preprocessor, load_preprocessor,
+                           save_preprocessor, transform)
+
+SCORING_MODEL_ARTIFACT = 'modelo_asignacion'
+
+
+def cluster_medoids(X, labels, metric=None, memory_budget_mb=None, ranges=None):
+    """
+    Medoide de cada clúster: el punto con menor suma de distancias a los
+    demás puntos de su clúster.
+
+    Cada clúster se resuelve con ``kmedoids.kmedoids_for`` (k=1): la suma
+    exacta por bloques si su matriz de distancias cabe en el presupuesto y
+    CLARA por muestreo si no, de modo que un clúster grande no materializa
+    una matriz n_c × n_c. Solo hace falta cuando el ajuste de K-Medoids no
+    dejó sus medoides (ver ``fit_scoring_model``).
+
+    Args:
+        X: Datos preprocesados (n, d)
+        labels: Clúster de cada punto (0..k-1)
+        metric: Métrica (por defecto CLUSTERING_CONFIG['metric'])
+        memory_budget_mb: Memoria máxima para distancias y temporales
+        ranges: Rangos de Gower (por defecto los de todo X, no los de cada clúster)
+
+    Returns:
+        numpy.ndarray: Índice del medoide de cada clúster, en orden de clúster
+    """
+    metric = metric or CLUSTERING_CONFIG.get('metric', 'euclidean')
+    if ranges is None:
+        ranges = metric_ranges(X, metric)
+    overrides = {'n_clusters': 1, 'metric': metric}
+    if memory_budget_mb is not None:
+        overrides['memory_budget_mb'] = memory_budget_mb
+    labels = np.asarray(labels)
+    medoids = []
+    for cluster in np.unique(labels):
+        members = np.flatnonzero(labels == cluster)
+        model = kmedoids_for(len(members), **overrides).fit(X[members], ranges=ranges)
+        medoids.append(members[model.medoid_indices_[0]])
+    return np.asarray(medoids)
+
+
+def save_scoring_model(model, store_dir=None, name=None):
+    """
+    Guarda el preprocesador y los medoides en el almacén.
+
+    Args:
+        model: Diccionario con preprocessor (parámetros de
+            ``preprocessing.fit_preprocessor``), centers, cluster_ids,
+            medoid_ids y feature_ranges (rangos de Gower o None)
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+        name: Nombre del artefacto de medoides (por defecto SCORING_MODEL_ARTIFACT)
+    """
+    save_preprocessor(model['preprocessor'], store_dir)
+    arrays = {
+        'centers': np.asarray(model['centers'], dtype=np.float64),
+        'cluster_ids': np.asarray(model['cluster_ids']),
+        'medoid_ids': np.asarray(model['medoid_ids']),
+    }
+    if model.get('feature_ranges') is not None:
+        arrays['feature_ranges'] = np.asarray(model['feature_ranges'], dtype=np.float64)
+    write_arrays(
+        name or SCORING_MODEL_ARTIFACT,
+        arrays,
+        store_dir=store_dir,
+        metadata={'metric': model['metric'],
+                  'schema_hash': model['preprocessor']['schema_hash']},
+    )
+
+
+def load_scoring_model(store_dir=None, name=None):
+    """
+    Carga el modelo de asignación guardado.
+
+    Returns:
+        dict or None: Modelo, o None si aún no se ha generado
+
+    Raises:
+        ValueError: Si los medoides se calcularon con otro esquema de
+            preprocesador que el guardado
+    """
+    store_dir = store_dir or FILE_PATHS['store']
+    name = name or SCORING_MODEL_ARTIFACT
+    preprocessor = load_preprocessor(store_dir)
+    if preprocessor is None or not has_artifact(name, store_dir):
+        return None
+
+    arrays, metadata = read_arrays(name, store_dir, mmap=False)
+    if metadata['schema_hash'] != preprocessor['schema_hash']:
+        raise ValueError(f"Los medoides de '{name}' no corresponden al preprocesador guardado")
+
+    return {
+        'preprocessor': preprocessor,
+        'centers': arrays['centers'],
+        'cluster_ids': arrays['cluster_ids'],
+        'medoid_ids': arrays['medoid_ids'],
+        'feature_ranges': arrays.get('feature_ranges'),
+        'metric': metadata['metric'],
+    }
+
+
+def _saved_medoids(df_pymes, labels, preprocessor, metric, store_dir):
+    """
+    Posiciones en df_pymes de los medoides del modelo guardado, si siguen
+    siendo válidos (mismo preprocesador y métrica, PYMEs presentes y en el
+    mismo clúster); None en otro caso.
+    """
+    try:
+        saved = load_scoring_model(store_dir)
+    except ValueError:
+        return None
+    if saved is None or saved['metric'] != metric or \
+            saved['preprocessor']['schema_hash'] != preprocessor['schema_hash']:
+        return None
+    positions = pd.Index(df_pymes['numerodoi']).get_indexer(saved['medoid_ids'])
+    if (positions < 0).any() or \
+            not np.array_equal(labels[positions], np.asarray(saved['cluster_ids'])):
+        return None
+    return positions
+
+
+def fit_scoring_model(df_pymes, label_column=None, store_dir=None, metric=None,
+                      medoid_indices=None, refit=False):
+    """
+    Prepara el modelo de asignación de los clústeres actuales.
+
+    Con ``store_dir`` el preprocesador se carga del almacén
+    (``preprocessing.ensure_preprocessor``) y, si no se pasan medoides, se
+    reutilizan los del modelo guardado mientras sigan siendo válidos. Solo
+    se calculan medoides nuevos (``cluster_medoids``) cuando faltan.
+
+    Args:
+        df_pymes: Tabla de PYMEs con etiquetas (p. ej. pymes_con_clusters.csv)
+        label_column: Columna de etiquetas (por defecto SCORING_CONFIG)
+        store_dir: Directorio del almacén; si no es None se carga de él el
+            preprocesador y se guarda el modelo
+        metric: Métrica (por defecto CLUSTERING_CONFIG['metric'])
+        medoid_indices: Posiciones en df_pymes de los medoides del ajuste de
+            K-Medoids (p. ej. ``KMedoids.medoid_indices_``)
+        refit: Reajustar el preprocesador y recalcular los medoides
+
+    Returns:
+        dict: preprocessor, centers, cluster_ids, medoid_ids, feature_ranges
+            y metric
+    """
+    label_column = label_column or SCORING_CONFIG['label_column']
+    metric = metric or CLUSTERING_CONFIG.get('metric', 'euclidean')
+
+    if store_dir is None:
+        preprocessor = fit_preprocessor(df_pymes)
+    else:
+        preprocessor = ensure_preprocessor(df_pymes, store_dir, refit=refit)
+    X = transform(df_pymes, preprocessor)
+    labels = df_pymes[label_column].to_numpy()
+    # Rangos de Gower del entrenamiento: la asignación usa los mismos
+    ranges = metric_ranges(X, metric)
+
+    if medoid_indices is None and store_dir is not None and not refit:
+        medoid_indices = _saved_medoids(df_pymes, labels, preprocessor, metric, store_dir)
+    if medoid_indices is None:
+        medoid_indices = cluster_medoids(X, labels, metric=metric, ranges=ranges)
+
+    # Un medoide por clúster, en orden de clúster
+    medoids = np.asarray(medoid_indices)
+    medoids = medoids[np.argsort(labels[medoids], kind='stable')]
+    cluster_ids = np.unique(labels)
+    if not np.array_equal(labels[medoids], cluster_ids):
+        raise ValueError("Los medoides deben incluir exactamente uno por clúster")
+
+    model = {
+        'preprocessor': preprocessor,
+        'centers': X[medoids],
+        'cluster_ids': cluster_ids,
+        'medoid_ids': df_pymes['numerodoi'].to_numpy()[medoids],
+        'feature_ranges': ranges,
+        'metric': metric,
+    }
+    if store_dir is not None:
+        save_scoring_model(model, store_dir)
+    return model
+
+
+def assign_clusters(df_pymes, model=None, store_dir=None, chunk_size=None):
+    """
+    Asigna cada PYME al medoide más cercano, por bloques.
+
+    Args:
+        df_pymes: PYMEs con las columnas de características (ver
+            feature_aggregation.PYME_COLUMNS)
+        model: Modelo de ``fit_scoring_model``/``load_scoring_model``; si es
+            None se carga del almacén
+        store_dir: Directorio del almacén (por defecto FILE_PATHS['store'])
+        chunk_size: PYMEs por bloque (por defecto SCORING_CONFIG)
+
+    Returns:
+        pandas.DataFrame: numerodoi, clúster asignado, distancia a su medoide
+            y margen hasta el segundo medoide más cercano
+    """
+    if model is None:
+        model = load_scoring_model(store_dir)
+        if model is None:
+            raise FileNotFoundError("No hay modelo de asignación guardado; ejecute fit_scoring_model")
+    chunk_size = chunk_size or SCORING_CONFIG['chunk_size']
+    label_column = SCORING_CONFIG['label_column']
+
+    n = len(df_pymes)
+    labels = np.empty(n, dtype=np.int64)
+    d_nearest = np.empty(n)
+    d_second = np.empty(n)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        X = transform(df_pymes.iloc[start:stop], model['preprocessor'])
+        labels[start:stop], d_nearest[start:stop], d_second[start:stop] = \
+            nearest_medoids(X, model['centers'], metric=model['metric'],
+                            ranges=model.get('feature_ranges'))
+
+    return pd.DataFrame({
+        'numerodoi': df_pymes['numerodoi'].to_numpy(),
+        label_column: np.asarray(model['cluster_ids'])[labels],
+        'distancia_medoide': d_nearest,
+        'margen_segundo_medoide': d_second - d_nearest,
+    })
+
+
+if __name__ == '__main__':
+    from artifact_store import load_artifact
+
+    df_pymes = load_artifact('clusters')
+    modelo = fit_scoring_model(df_pymes, store_dir=FILE_PATHS['store'])
+    asignacion = assign_clusters(df_pymes, model=modelo)
+    coincidencia = (asignacion[SCORING_CONFIG['label_column']].to_numpy()
+                    == df_pymes[SCORING_CONFIG['label_column']].to_numpy()).mean()
+    print(f"Modelo de asignación guardado en '{FILE_PATHS['store']}' "
+          f"(coincidencia con las etiquetas actuales: {coincidencia:.1%})")
@@ -0,0 +1,221 @@
+"""
+Estacionalidad y descomposición por lotes
+=========================================
+
+``utils.analyze_seasonality`` analizaba una columna por llamada y solo
+devolvía medias por mes y trimestre. Este módulo descompone todas las series
+(clústeres hoy, series por PYME después) como una matriz (n_series, n_meses)
+en una sola pasada:
+
+- tendencia: media móvil centrada 2×12 (ventanas deslizantes · pesos),
+- índices estacionales aditivos por mes del año (centrados en 0),
+- residuo y fuerzas de tendencia y estacionalidad
+  (máx(0, 1 - Var(R) / Var(T + R)) y máx(0, 1 - Var(R) / Var(S + R))),
+- medias por mes y trimestre, meses pico y valle y la fuerza estacional
+  clásica (máx - mín) / media de ``analyze_seasonality``.
+
+``seasonality_profile`` memoriza el resultado por versión de datos y, con
+``store_dir``, lo guarda en el almacén de artefactos para que el dashboard y
+los pronósticos lo lean sin recalcular.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import has_artifact, read_arrays, write_arrays
+
+SEASONALITY_ARTIFACT = 'estacionalidad'
+
+_PROFILE_CACHE = OrderedDict()
+_PROFILE_CACHE_SIZE = 8
+
+
+def _grouped_nanmean(Y, groups, n_groups):
+    """Media por grupo de columnas (mes, trimestre) ignorando NaN: (n_series, n_groups)."""
+    valid = ~np.isnan(Y)
+    one_hot = np.eye(n_groups)[groups]
+    sums = np.where(valid, Y, 0.0) @ one_hot
+    counts = valid.astype(np.float64) @ one_hot
+    out = np.full(sums.shape, np.nan)
+    np.divide(sums, counts, out=out, where=counts > 0)
+    return out
+
+
+def centered_moving_average(Y, period=12):
+    """
+    Media móvil centrada (2×period si el periodo es par) de cada fila.
+
+    Returns:
+        numpy.ndarray: Tendencia (n_series, n_meses), NaN en los extremos
+    """
+    Y = np.asarray(Y, dtype=np.float64)
+    n, T = Y.shape
+    weights = np.ones(period + 1 if period % 2 == 0 else period)
+    if period % 2 == 0:
+        weights[[0, -1]] = 0.5
+    weights /= period
+    trend = np.full((n, T), np.nan)
+    width = len(weights)
+    if T >= width:
+        windows = np.lib.stride_tricks.sliding_window_view(Y, width, axis=1)
+        trend[:, width // 2:T - width // 2] = windows @ weights
+    return trend
+
+
+def _variance(values):
+    """Varianza por fila ignorando NaN (NaN con menos de dos valores)."""
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=1)
+    mean = np.where(counts > 0, np.nansum(values, axis=1) / np.maximum(counts, 1), np.nan)
+    squares = np.where(valid, (values - mean[:, None]) ** 2, 0.0).sum(axis=1)
+    out = np.full(len(values), np.nan)
+    np.divide(squares, counts - 1, out=out, where=counts > 1)
+    return out
+
+
+def _strength(residual, component):
+    variance = _variance(component + residual)
+    out = np.full(len(residual), np.nan)
+    np.divide(_variance(residual), variance, out=out, where=variance > 0)
+    return np.maximum(0.0, 1 - out)
+
+
+def decompose(Y, months, period=12):
+    """
+    Descomposición aditiva y estadísticos estacionales de todas las series.
+
+    Args:
+        Y: Matriz (n_series, n_meses); NaN = dato ausente
+        months: Mes del año (1..12) de cada columna
+        period: Periodo estacional (12 para datos mensuales)
+
+    Returns:
+        dict: Arrays trend, seasonal, residual (n_series, n_meses);
+            seasonal_indices y monthly (n_series, 12); quarterly
+            (n_series, 4); peak_month, low_month, seasonality_strength,
+            seasonal_strength, trend_strength y residual_strength (n_series)
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    months = np.asarray(months, dtype=np.int64)
+    month_codes = months - 1
+
+    trend = centered_moving_average(Y, period)
+    # Series demasiado cortas para la media móvil: tendencia constante
+    no_trend = np.isnan(trend).all(axis=1)
+    trend[no_trend] = np.nanmean(Y[no_trend], axis=1, keepdims=True) if no_trend.any() else 0
+
+    indices = _grouped_nanmean(Y - trend, month_codes, 12)
+    indices -= np.nanmean(indices, axis=1, keepdims=True)
+    seasonal = indices[:, month_codes]
+    residual = Y - trend - seasonal
+
+    monthly = _grouped_nanmean(Y, month_codes, 12)
+    quarterly = _grouped_nanmean(Y, month_codes // 3, 4)
+    has_months = ~np.isnan(monthly).all(axis=1)
+    filled_max = np.where(np.isnan(monthly), -np.inf, monthly)
+    filled_min = np.where(np.isnan(monthly), np.inf, monthly)
+    monthly_mean = np.nanmean(np.where(has_months[:, None], monthly, 0.0), axis=1)
+    classic = np.full(len(Y), np.nan)
+    np.divide(filled_max.max(axis=1) - filled_min.min(axis=1), monthly_mean, out=classic,
+              where=has_months & (monthly_mean != 0))
+
+    total_variance = _variance(Y)
+    residual_share = np.full(len(Y), np.nan)
+    np.divide(_variance(residual), total_variance, out=residual_share, where=total_variance > 0)
+
+    return {
+        'trend': trend,
+        'seasonal': seasonal,
+        'residual': residual,
+        'seasonal_indices': indices,
+        'monthly': monthly,
+        'quarterly': quarterly,
+        'peak_month': np.where(has_months, filled_max.argmax(axis=1) + 1, 0),
+        'low_month': np.where(has_months, filled_min.argmin(axis=1) + 1, 0),
+        'seasonality_strength': classic,
+        'seasonal_strength': _strength(residual, seasonal),
+        'trend_strength': _strength(residual, trend),
+        'residual_strength': residual_share,
+    }
+
+
+SUMMARY_FIELDS = ('peak_month', 'low_month', 'seasonality_strength', 'seasonal_strength',
+                  'trend_strength', 'residual_strength')
+
+
+def _profile_frames(result, series, dates):
+    """Convierte los arrays de ``decompose`` en tablas con etiquetas."""
+    series = pd.Index(series)
+    index = pd.DatetimeIndex(dates, name='fecha')
+    return {
+        'summary': pd.DataFrame({field: result[field] for field in SUMMARY_FIELDS}, index=series),
+        'monthly': pd.DataFrame(result['monthly'], index=series, columns=range(1, 13)),
+        'quarterly': pd.DataFrame(result['quarterly'], index=series, columns=range(1, 5)),
+        'seasonal_indices': pd.DataFrame(result['seasonal_indices'], index=series,
+                                         columns=range(1, 13)),
+        'trend': pd.DataFrame(result['trend'].T, index=index, columns=series),
+        'seasonal': pd.DataFrame(result['seasonal'].T, index=index, columns=series),
+        'residual': pd.DataFrame(result['residual'].T, index=index, columns=series),
+    }
+
+
+def seasonality_profile(df_ts, period=12, store_dir=None):
+    """
+    Perfil estacional de todas las series, memorizado por versión de datos.
+
+    Args:
+        df_ts: Series mensuales (índice fecha, una columna por serie, como
+            ``ts_mensual_historico.csv``)
+        period: Periodo estacional
+        store_dir: Directorio del almacén; si no es None el perfil se lee de
+            él cuando corresponde a la misma versión de datos, y si no se
+            calcula y se guarda
+
+    Returns:
+        dict: Tablas summary, monthly, quarterly, seasonal_indices (una fila
+            por serie) y trend, seasonal, residual (índice fecha); compartidas
+            entre llamadas, no deben modificarse
+    """
+    values = df_ts.to_numpy(dtype=np.float64)
+    series = list(df_ts.columns)
+    dates = pd.DatetimeIndex(df_ts.index)
+    # Versión de datos: hash de la matriz, las fechas y los nombres (con miles
+    # de columnas es mucho más barato que ``data_version`` fila a fila)
+    digest = hashlib.sha1(np.ascontiguousarray(values).tobytes())
+    digest.update(dates.asi8.tobytes())
+    digest.update(repr([str(column) for column in series]).encode('utf-8'))
+    version = digest.hexdigest()
+    key = (version, period)
+    if key in _PROFILE_CACHE:
+        _PROFILE_CACHE.move_to_end(key)
+        return _PROFILE_CACHE[key]
+
+    result = None
+    if store_dir is not None and has_artifact(SEASONALITY_ARTIFACT, store_dir):
+        arrays, metadata = read_arrays(SEASONALITY_ARTIFACT, store_dir, mmap=False)
+        if metadata.get('data_version') == version and metadata.get('period') == period:
+            result = dict(arrays)
+
+    if result is None:
+        result = decompose(values.T, dates.month, period)
+        if store_dir is not None:
+            write_arrays(SEASONALITY_ARTIFACT, result, store_dir=store_dir,
+                         metadata={'data_version': version, 'period': period,
+                                   'series': [str(column) for column in series]})
+
+    profile = _profile_frames(result, series, dates)
+    _PROFILE_CACHE[key] = profile
+    while len(_PROFILE_CACHE) > _PROFILE_CACHE_SIZE:
+        _PROFILE_CACHE.popitem(last=False)
+    return profile
+
+
+if __name__ == '__main__':
+    from artifact_store import load_artifact
+    from config import FILE_PATHS
+
+    perfil = seasonality_profile(load_artifact('historical'), store_dir=FILE_PATHS['store'])
+    print(perfil['summary'].round(3).to_string())
@@ -0,0 +1,236 @@
+"""
+Silueta exacta y aproximada
+===========================
+
+La silueta exacta necesita todas las distancias entre pares (O(n²)). Para
+poblaciones grandes este módulo ofrece dos aproximaciones:
+
+- ``sampled``: muestreo estratificado por clúster; la silueta de cada PYME
+  muestreada es exacta (sus distancias a todas las demás se calculan por
+  bloques) y la media se estima con su intervalo de confianza.
+- ``simplified``: silueta simplificada con los medoides (a = distancia al
+  medoide propio, b = distancia al medoide más cercano de otro clúster),
+  O(n·k).
+
+``estimate_silhouette`` elige entre exacta y aproximada según el tamaño.
+"""
+
+import numpy as np
+
+from config import CLUSTERING_CONFIG
+from distances import distance_matrix, iter_distance_blocks, metric_ranges
+
+MODES = ('auto', 'exact', 'sampled', 'simplified')
+
+
+def _silhouette_from_rows(rows, row_labels, labels, n_clusters):
+    """
+    Silueta de los puntos cuyas distancias a todos los demás son ``rows``.
+
+    Args:
+        rows: Distancias (m, n) de los puntos evaluados a todos los puntos
+        row_labels: Clúster de cada punto evaluado
+        labels: Clúster de todos los puntos (codificados 0..k-1)
+        n_clusters: Número de clústeres
+
+    Returns:
+        numpy.ndarray: Silueta de cada punto evaluado
+    """
+    counts = np.bincount(labels, minlength=n_clusters).astype(np.float64)
+    sums = rows @ np.eye(n_clusters)[labels]
+
+    own = np.arange(rows.shape[0]), row_labels
+    own_counts = counts[row_labels]
+    a = np.zeros(rows.shape[0])
+    np.divide(sums[own], own_counts - 1, out=a, where=own_counts > 1)
+
+    mean_to_cluster = sums / np.maximum(counts, 1)
+    mean_to_cluster[own] = np.inf
+    b = mean_to_cluster.min(axis=1)
+
+    denominator = np.maximum(a, b)
+    scores = np.zeros(rows.shape[0])
+    np.divide(b - a, denominator, out=scores, where=denominator > 0)
+    # Como en sklearn, la silueta de un clúster de un solo punto es 0
+    scores[own_counts <= 1] = 0
+    return scores
+
+
+def _encode(labels):
+    values, codes = np.unique(np.asarray(labels), return_inverse=True)
+    return codes, len(values)
+
+
+def stratified_sample(labels, sample_size, min_per_cluster=10, random_state=None):
+    """
+    Muestra estratificada por clúster con asignación proporcional.
+
+    Returns:
+        numpy.ndarray: Índices muestreados (ordenados)
+    """
+    codes, n_clusters = _encode(labels)
+    rng = np.random.RandomState(random_state)
+    counts = np.bincount(codes, minlength=n_clusters)
+    selected = []
+    for cluster in range(n_clusters):
+        members = np.flatnonzero(codes == cluster)
+        take = max(min_per_cluster, int(round(sample_size * counts[cluster] / len(codes))))
+        selected.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(selected))
+
+
+def sampled_silhouette(X, labels, sample_size=None, distances=None, metric=None,
+                       random_state=None, memory_budget_mb=None, z=1.96, ranges=None):
+    """
+    Estima la silueta media con un muestreo estratificado por clúster.
+
+    La media se estima como Σ W_h · media_h (W_h = peso del clúster) y su
+    varianza como Σ W_h² · (1 - n_h/N_h) · s_h² / n_h.
+
+    Args:
+        X: Datos (n, d); puede ser None si se pasa ``distances``
+        labels: Clúster de cada punto
+        sample_size: Puntos a evaluar (por defecto CLUSTERING_CONFIG)
+        distances: Matriz de distancias (n, n) opcional; solo se leen las
+            filas muestreadas
+        metric: Métrica (por defecto CLUSTERING_CONFIG['metric'])
+        random_state: Semilla (por defecto CLUSTERING_CONFIG['random_state'])
+        memory_budget_mb: Memoria máxima por bloque de distancias
+        z: Cuantil normal del intervalo (1.96 → 95%)
+        ranges: Rangos de Gower (por defecto los de todo X, no los de la muestra)
+
+    Returns:
+        dict: score, ci, method y n_evaluated
+    """
+    sample_size = sample_size or CLUSTERING_CONFIG.get('silhouette_sample_size', 1000)
+    random_state = random_state if random_state is not None else CLUSTERING_CONFIG['random_state']
+    metric = metric or CLUSTERING_CONFIG.get('metric', 'euclidean')
+
+    codes, n_clusters = _encode(labels)
+    sample = stratified_sample(codes, sample_size, random_state=random_state)
+
+    scores = np.empty(len(sample))
+    if distances is not None:
+        scores[:] = _silhouette_from_rows(np.asarray(distances[sample], dtype=np.float64),
+                                          codes[sample], codes, n_clusters)
+    else:
+        X = np.asarray(X)
+        if ranges is None:
+            ranges = metric_ranges(X, metric)
+        for start, stop, block in iter_distance_blocks(X[sample], X, metric=metric,
+                                                       memory_budget_mb=memory_budget_mb,
+                                                       ranges=ranges):
+            scores[start:stop] = _silhouette_from_rows(block, codes[sample[start:stop]],
+                                                       codes, n_clusters)
+
+    counts = np.bincount(codes, minlength=n_clusters)
+    weights = counts / len(codes)
+    estimate = 0.0
+    variance = 0.0
+    for cluster in range(n_clusters):
+        cluster_scores = scores[codes[sample] == cluster]
+        n_h = len(cluster_scores)
+        estimate += weights[cluster] * cluster_scores.mean()
+        if n_h > 1:
+            finite_population = 1 - n_h / counts[cluster]
+            variance += weights[cluster] ** 2 * finite_population * cluster_scores.var(ddof=1) / n_h
+
+    half_width = z * np.sqrt(variance)
+    return {
+        'score': float(estimate),
+        'ci': (float(estimate - half_width), float(estimate + half_width)),
+        'method': 'sampled',
+        'n_evaluated': int(len(sample)),
+    }
+
+
+def simplified_silhouette(X, labels, centers, metric=None, memory_budget_mb=None, ranges=None):
+    """
+    Silueta simplificada respecto a los medoides (o centroides).
+
+    Args:
+        X: Datos (n, d)
+        labels: Clúster de cada punto (índices de fila de ``centers``)
+        centers: Coordenadas de los medoides (k, d)
+        metric: Métrica (por defecto CLUSTERING_CONFIG['metric'])
+        memory_budget_mb: Memoria máxima por bloque de distancias
+        ranges: Rangos de Gower (por defecto los de X)
+
+    Returns:
+        dict: score, ci (sin error de muestreo: el intervalo es el propio
+            valor), method y n_evaluated
+    """
+    metric = metric or CLUSTERING_CONFIG.get('metric', 'euclidean')
+    labels = np.asarray(labels)
+    if ranges is None:
+        ranges = metric_ranges(X, metric)
+    scores = np.empty(len(labels))
+    for start, stop, block in iter_distance_blocks(X, np.asarray(centers), metric=metric,
+                                                   memory_budget_mb=memory_budget_mb,
+                                                   ranges=ranges):
+        rows = np.arange(stop - start)
+        own = labels[start:stop]
+        a = block[rows, own]
+        block[rows, own] = np.inf
+        b = block.min(axis=1)
+        denominator = np.maximum(a, b)
+        chunk = np.zeros(stop - start)
+        np.divide(b - a, denominator, out=chunk, where=denominator > 0)
+        scores[start:stop] = chunk
+
+    score = float(scores.mean())
+    return {'score': score, 'ci': (score, score), 'method': 'simplified',
+            'n_evaluated': int(len(labels))}
+
+
+def estimate_silhouette(X, labels, mode=None, distances=None, centers=None, metric=None,
+                        exact_max_n=None, sample_size=None, random_state=None,
+                        memory_budget_mb=None, ranges=None):
+    """
+    Calcula la silueta media, exacta o aproximada según el tamaño.
+
+    Args:
+        X: Datos (n, d); puede ser None si se pasa ``distances`` (salvo en
+            modo 'simplified')
+        labels: Clúster de cada punto
+        mode: 'auto', 'exact', 'sampled' o 'simplified' (por defecto
+            CLUSTERING_CONFIG['silhouette_mode']). 'auto' usa la exacta
+            hasta ``exact_max_n`` puntos y 'sampled' por encima
+        distances: Matriz de distancias precalculada (opcional)
+        centers: Medoides, necesarios en modo 'simplified'
+        metric: Métrica (por defecto CLUSTERING_CONFIG['metric'])
+        exact_max_n: Umbral de tamaño (por defecto CLUSTERING_CONFIG)
+        sample_size: Tamaño de muestra del modo 'sampled'
+        random_state: Semilla del muestreo
+        memory_budget_mb: Memoria máxima por bloque de distancias
+        ranges: Rangos de Gower ajustados en el entrenamiento (por defecto los de X)
+
+    Returns:
+        dict: score, ci, method y n_evaluated
+    """
+    mode = mode or CLUSTERING_CONFIG.get('silhouette_mode', 'auto')
+    if mode not in MODES:
+        raise ValueError(f"Modo de silueta no soportado: {mode}. Opciones: {MODES}")
+
+    n = len(labels)
+    if mode == 'auto':
+        exact_max_n = exact_max_n or CLUSTERING_CONFIG.get('silhouette_exact_max_n', 5000)
+        mode = 'exact' if n <= exact_max_n else 'sampled'
+
+    if mode == 'simplified':
+        if centers is None:
+            raise ValueError("El modo 'simplified' necesita los medoides (centers)")
+        return simplified_silhouette(X, labels, centers, metric=metric,
+                                     memory_budget_mb=memory_budget_mb, ranges=ranges)
+    if mode == 'sampled':
+        return sampled_silhouette(X, labels, sample_size=sample_size, distances=distances,
+                                  metric=metric, random_state=random_state,
+                                  memory_budget_mb=memory_budget_mb, ranges=ranges)
+
+    from sklearn.metrics import silhouette_score
+
+    if distances is None:
+        distances = distance_matrix(X, metric=metric, memory_budget_mb=memory_budget_mb,
+                                    ranges=ranges)
+    score = float(silhouette_score(distances, labels, metric='precomputed'))
+    return {'score': score, 'ci': (score, score), 'method': 'exact', 'n_evaluated': int(n)}
@@ -0,0 +1,289 @@
+"""
+Pronósticos estadísticos por lotes
+==================================
+
+Prophet solo es viable para las tres series de clúster. Este módulo ajusta a
+la vez miles de series mensuales cortas (p. ej. los ingresos de cada
+``numerodoi``) como una matriz (n_series, n_meses):
+
+- ``seasonal_naive``: repite el último año,
+- ``drift``: último valor más la pendiente media de la serie,
+- ``holt_winters``: suavizado exponencial aditivo (nivel, tendencia y
+  estacionalidad); la búsqueda de alpha, beta y gamma evalúa toda la rejilla
+  para todas las series en una sola pasada por el tiempo,
+- ``auto``: elige por serie el método con menor MAE en los últimos meses.
+
+Las series se procesan por bloques según ``memory_budget_mb``. El resultado
+tiene el formato de ``pronostico_prophet_cluster_*.csv`` (índice ds, yhat),
+así que se puede elegir Prophet o estos métodos para cada nivel (ver
+FORECAST_CONFIG en config.py).
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import AGGREGATION_CONFIG, STATISTICAL_FORECAST_CONFIG
+
+METHODS = ('seasonal_naive', 'drift', 'holt_winters')
+
+# Alias de frecuencia de fin de mes ('M' quedó obsoleto en pandas 2.2 en favor de 'ME')
+MONTH_END = 'ME' if tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2) else 'M'
+
+
+def _as_matrix(Y):
+    """Matriz float64 (n_series, n_meses); los meses sin ventas (NaN) valen 0."""
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    return np.nan_to_num(Y, nan=0.0)
+
+
+def seasonal_naive(Y, horizon, season_length=None):
+    """
+    Pronóstico ingenuo estacional: cada mes repite el mismo mes del último año.
+
+    Con menos de una temporada de historia repite el último valor.
+
+    Args:
+        Y: Matriz (n_series, n_meses)
+        horizon: Meses a pronosticar
+        season_length: Periodo estacional (por defecto 12)
+
+    Returns:
+        numpy.ndarray: Pronóstico (n_series, horizon)
+    """
+    m = season_length or STATISTICAL_FORECAST_CONFIG['season_length']
+    Y = _as_matrix(Y)
+    T = Y.shape[1]
+    if T < m:
+        return np.repeat(Y[:, -1:], horizon, axis=1)
+    return Y[:, T - m + np.arange(horizon) % m]
+
+
+def drift(Y, horizon):
+    """
+    Pronóstico con deriva: último valor + k · (último - primero) / (n - 1).
+
+    Returns:
+        numpy.ndarray: Pronóstico (n_series, horizon)
+    """
+    Y = _as_matrix(Y)
+    T = Y.shape[1]
+    slope = (Y[:, -1] - Y[:, 0]) / (T - 1) if T > 1 else np.zeros(len(Y))
+    return Y[:, -1:] + slope[:, None] * np.arange(1, horizon + 1)
+
+
+def _parameter_grid(seasonal, config):
+    """Rejilla (G, 3) de (alpha, beta, gamma)."""
+    gammas = config['gammas'] if seasonal else (0.0,)
+    grid = np.meshgrid(config['alphas'], config['betas'], gammas, indexing='ij')
+    return np.stack([axis.ravel() for axis in grid], axis=1)
+
+
+def _holt_winters_block(Y, horizon, m, grid, seasonal):
+    """
+    Holt-Winters aditivo con búsqueda en rejilla para un bloque de series.
+
+    Los estados tienen forma (n, G) (y (n, G, m) la estacionalidad): cada
+    paso temporal actualiza todas las series y todas las combinaciones de
+    parámetros a la vez y acumula el error cuadrático a un paso.
+    """
+    n, T = Y.shape
+    alpha, beta, gamma = grid[:, 0], grid[:, 1], grid[:, 2]
+
+    if seasonal:
+        # Estado tras la primera temporada: nivel y tendencia de las dos
+        # primeras temporadas; índices estacionales respecto a esa recta
+        first, second = Y[:, :m].mean(axis=1), Y[:, m:2 * m].mean(axis=1)
+        trend0 = (second - first) / m
+        offsets = np.arange(m) - (m - 1) / 2
+        season0 = Y[:, :m] - (first[:, None] + trend0[:, None] * offsets)
+        level0 = first + trend0 * (m - 1) / 2
+        start = m
+    else:
+        level0 = Y[:, 0]
+        trend0 = Y[:, 1] - Y[:, 0] if T > 1 else np.zeros(n)
+        season0 = np.zeros((n, m))
+        start = 1
+
+    G = len(grid)
+    level = np.repeat(level0[:, None], G, axis=1)
+    trend = np.repeat(trend0[:, None], G, axis=1)
+    season = np.repeat(season0[:, None, :], G, axis=1)
+    sse = np.zeros((n, G))
+
+    for t in range(start, T):
+        y = Y[:, t:t + 1]
+        s = season[:, :, t % m]
+        sse += (y - (level + trend + s)) ** 2
+        new_level = alpha * (y - s) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[:, :, t % m] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+
+    best = sse.argmin(axis=1)
+    rows = np.arange(n)
+    steps = np.arange(1, horizon + 1)
+    slots = (T + steps - 1) % m
+    return (level[rows, best][:, None] + trend[rows, best][:, None] * steps
+            + season[rows, best][:, slots])
+
+
+def holt_winters(Y, horizon, season_length=None, config=None):
+    """
+    Holt-Winters aditivo con los parámetros elegidos por serie.
+
+    Con menos de dos temporadas de historia se ajusta Holt (sin
+    estacionalidad).
+
+    Args:
+        Y: Matriz (n_series, n_meses)
+        horizon: Meses a pronosticar
+        season_length: Periodo estacional (por defecto 12)
+        config: Rejillas y presupuesto de memoria (por defecto
+            STATISTICAL_FORECAST_CONFIG)
+
+    Returns:
+        numpy.ndarray: Pronóstico (n_series, horizon)
+    """
+    config = config or STATISTICAL_FORECAST_CONFIG
+    m = season_length or config['season_length']
+    Y = _as_matrix(Y)
+    seasonal = Y.shape[1] >= 2 * m
+    grid = _parameter_grid(seasonal, config)
+
+    # Estados por serie: (4 + m) · G valores float64
+    bytes_per_series = (4 + m) * len(grid) * 8
+    block = max(1, int(config['memory_budget_mb'] * 1024 * 1024 // bytes_per_series))
+    out = np.empty((len(Y), horizon))
+    for start in range(0, len(Y), block):
+        out[start:start + block] = _holt_winters_block(Y[start:start + block], horizon, m, grid,
+                                                       seasonal)
+    return out
+
+
+def _forecast_method(method, Y, horizon, m, config):
+    if method == 'seasonal_naive':
+        return seasonal_naive(Y, horizon, m)
+    if method == 'drift':
+        return drift(Y, horizon)
+    return holt_winters(Y, horizon, m, config)
+
+
+def forecast_batch(Y, horizon, method=None, season_length=None, config=None):
+    """
+    Pronostica todas las series con un método o con el mejor de cada serie.
+
+    Args:
+        Y: Matriz (n_series, n_meses); NaN = mes sin ventas
+        horizon: Meses a pronosticar
+        method: 'auto' o uno de METHODS (por defecto STATISTICAL_FORECAST_CONFIG)
+        season_length: Periodo estacional (por defecto 12)
+        config: Parámetros (por defecto STATISTICAL_FORECAST_CONFIG)
+
+    Returns:
+        tuple: (pronóstico (n_series, horizon) sin valores negativos,
+            método usado en cada serie)
+    """
+    config = config or STATISTICAL_FORECAST_CONFIG
+    method = method or config['method']
+    m = season_length or config['season_length']
+    if method != 'auto' and method not in METHODS:
+        raise ValueError(f"Método no soportado: {method}. Opciones: {('auto',) + METHODS}")
+
+    Y = _as_matrix(Y)
+    if method != 'auto':
+        yhat = _forecast_method(method, Y, horizon, m, config)
+        return np.maximum(yhat, 0), np.full(len(Y), method)
+
+    # Selección por serie con los últimos meses como validación
+    holdout = min(config['holdout'], Y.shape[1] - 2)
+    if holdout < 1:
+        return forecast_batch(Y, horizon, 'drift', m, config)
+    train, test = Y[:, :-holdout], Y[:, -holdout:]
+    errors = np.stack([np.abs(_forecast_method(name, train, holdout, m, config) - test).mean(axis=1)
+                       for name in METHODS], axis=1)
+    choice = errors.argmin(axis=1)
+
+    yhat = np.empty((len(Y), horizon))
+    for position, name in enumerate(METHODS):
+        rows = np.flatnonzero(choice == position)
+        if len(rows):
+            yhat[rows] = _forecast_method(name, Y[rows], horizon, m, config)
+    return np.maximum(yhat, 0), np.asarray(METHODS)[choice]
+
+
+def forecast_frame(df_ts, horizon, method=None, config=None):
+    """
+    Pronostica una tabla de series mensuales (índice fecha, una columna por
+    serie, como ``ts_mensual_historico.csv``).
+
+    Returns:
+        tuple: (DataFrame con índice ds y una columna de yhat por serie,
+            Series con el método usado en cada serie)
+    """
+    dates = pd.date_range(pd.Timestamp(df_ts.index[-1]), periods=horizon + 1, freq=MONTH_END)[1:]
+    yhat, methods = forecast_batch(df_ts.to_numpy(dtype=np.float64).T, horizon, method,
+                                   config=config)
+    forecasts = pd.DataFrame(yhat.T, index=pd.DatetimeIndex(dates, name='ds'),
+                             columns=df_ts.columns)
+    return forecasts, pd.Series(methods, index=df_ts.columns, name='metodo')
+
+
+def statistical_fit_predict(train, periods, config=None):
+    """
+    Equivalente de ``forecasting.prophet_fit_predict`` con los métodos por lotes.
+
+    Args:
+        train: Serie con índice de fechas (fin de mes)
+        periods: Meses a pronosticar
+        config: Diccionario con 'method' (por defecto STATISTICAL_FORECAST_CONFIG)
+
+    Returns:
+        pandas.DataFrame: Columnas ds y yhat
+    """
+    method = (config or {}).get('method')
+    forecasts, _ = forecast_frame(train.to_frame(), periods, method)
+    return pd.DataFrame({'ds': forecasts.index, 'yhat': forecasts.iloc[:, 0].to_numpy()})
+
+
+def monthly_revenue(source=None, chunksize=None):
+    """
+    Ingresos mensuales (``precioventa``) de cada PYME a partir de las
+    transacciones, leídas por bloques.
+
+    Args:
+        source: Ruta de transacciones o iterable de DataFrames (por defecto
+            AGGREGATION_CONFIG['transactions_path'])
+        chunksize: Filas por bloque al leer de archivo
+
+    Returns:
+        pandas.DataFrame: Índice fecha (fin de mes), una columna por
+            numerodoi; los meses sin ventas valen 0
+    """
+    from feature_aggregation import read_transaction_chunks
+
+    source = source or AGGREGATION_CONFIG['transactions_path']
+    if isinstance(source, str):
+        source = read_transaction_chunks(source, chunksize,
+                                         columns=['numerodoi', 'fecha', 'precioventa'])
+
+    partials = []
+    for chunk in source:
+        months = pd.to_datetime(chunk['fecha']).dt.to_period('M')
+        partials.append(chunk['precioventa'].groupby([months, chunk['numerodoi']]).sum())
+    totals = pd.concat(partials).groupby(level=[0, 1]).sum()
+
+    wide = totals.unstack(fill_value=0.0)
+    periods = pd.period_range(wide.index.min(), wide.index.max(), freq='M')
+    wide = wide.reindex(periods, fill_value=0.0)
+    wide.index = pd.DatetimeIndex(periods.to_timestamp(how='end').normalize(), name='fecha')
+    wide.columns.name = None
+    return wide
+
+
+if __name__ == '__main__':
+    from artifact_store import load_artifact
+
+    df_ts = load_artifact('historical')
+    pronosticos, metodos = forecast_frame(df_ts, 12)
+    print(metodos.to_string())
+    print(pronosticos.round(2).to_string())
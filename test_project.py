@@ -11,6 +11,8 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+import shutil
+import tempfile
 
 # Agregar el directorio del proyecto al path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -61,6 +63,57 @@ class TestClusteringUtils(unittest.TestCase):
             self.assertGreater(metrics[cluster_id]['revenue_mean'], 0)
             self.assertGreater(metrics[cluster_id]['count'], 0)
     
+    def test_grouped_metrics_match_pandas(self):
+        """El motor agrupado coincide con las estadísticas de pandas por clúster."""
+        from utils import grouped_metrics
+        
+        df = self.test_data.copy()
+        df.loc[:4, 'ingresos_totales'] = np.nan
+        spec = {'n': (None, 'count'), 'media': ('ingresos_totales', 'mean'),
+                'std': ('ingresos_totales', 'std'), 'p90': ('ticket_promedio', 0.9),
+                'max': ('ticket_promedio', 'max'), 'ausente': ('no_existe', 'mean')}
+        table = grouped_metrics(df, spec=spec, derived={'ratio': ('media', 'std')})
+        
+        grouped = df.groupby('cluster_kmedoids')
+        np.testing.assert_array_equal(table['n'], grouped.size())
+        np.testing.assert_allclose(table['media'], grouped['ingresos_totales'].mean())
+        np.testing.assert_allclose(table['std'], grouped['ingresos_totales'].std())
+        np.testing.assert_allclose(table['p90'], grouped['ticket_promedio'].quantile(0.9))
+        np.testing.assert_allclose(table['max'], grouped['ticket_promedio'].max())
+        np.testing.assert_allclose(table['ratio'], table['media'] / table['std'])
+        self.assertTrue(table['ausente'].isna().all())
+    
+    def test_batch_cluster_insights(self):
+        """Los insights de todos los clusters coinciden con el cálculo por cluster y se memorizan."""
+        from utils import generate_all_cluster_insights
+        
+        insights = generate_all_cluster_insights(self.test_data, top_n=3, version='v1')
+        self.assertIs(generate_all_cluster_insights(self.test_data, top_n=3, version='v1'), insights)
+        self.assertIsNot(generate_all_cluster_insights(self.test_data, top_n=3), insights)
+        self.assertEqual(sorted(insights), [0, 1, 2])
+        
+        cluster_data = self.test_data[self.test_data['cluster_kmedoids'] == 1]
+        pd.testing.assert_frame_equal(insights[1]['top_performers'],
+                                      cluster_data.nlargest(3, 'ingresos_totales'))
+        self.assertAlmostEqual(insights[1]['revenue_vs_average'],
+                               cluster_data['ingresos_totales'].mean()
+                               / self.test_data['ingresos_totales'].mean() * 100)
+        self.assertAlmostEqual(sum(item['size_percentage'] for item in insights.values()), 100)
+    
+    def test_insights_for_empty_cluster(self):
+        """Un cluster sin filas da insights vacíos (NaN) en lugar de un error."""
+        from utils import generate_cluster_insights
+        
+        empty = generate_cluster_insights(self.test_data, 7)
+        self.assertEqual(empty['size_percentage'], 0)
+        self.assertTrue(np.isnan(empty['revenue_vs_average']))
+        self.assertTrue(empty['top_performers'].empty)
+        self.assertEqual(list(empty['top_performers'].columns), list(self.test_data.columns))
+        self.assertEqual(empty['growth_potential'], 'Moderate')
+        self.assertEqual(empty['recommendations'], [])
+        self.assertEqual(generate_cluster_insights(self.test_data, 1)['size_percentage'],
+                         (self.test_data['cluster_kmedoids'] == 1).mean() * 100)
+    
     def test_detect_outliers_iqr(self):
         """Test para detección de outliers."""
         # Agregar un outlier obvio
@@ -93,6 +146,54 @@ class TestClusteringUtils(unittest.TestCase):
         self.assertGreater(metrics['MAPE'], 0)
         self.assertLess(metrics['MAPE'], 100)
     
+    def test_forecast_accuracy_matrix(self):
+        """Métricas de muchas series en una llamada, con MAPE seguro ante ceros."""
+        rng = np.random.RandomState(0)
+        actual = rng.gamma(2, 100, (50, 6))
+        actual[0, :2] = 0
+        predicted = actual + rng.normal(0, 10, actual.shape)
+        
+        table = calculate_forecast_accuracy(actual, predicted, insample=actual, season_length=1)
+        self.assertEqual(table.shape, (50, 8))
+        self.assertTrue(np.isfinite(table['MAPE']).all())
+        
+        row = calculate_forecast_accuracy(actual[3], predicted[3])
+        self.assertAlmostEqual(row['RMSE'], np.sqrt(np.mean((actual[3] - predicted[3]) ** 2)))
+        self.assertAlmostEqual(table['R²'].iloc[3], row['R²'])
+        self.assertAlmostEqual(table['MASE'].iloc[3],
+                               row['MAE'] / np.abs(np.diff(actual[3])).mean())
+        
+        weighted = calculate_forecast_accuracy(actual, predicted, weights=[1, 0, 0, 0, 0, 0])
+        np.testing.assert_allclose(weighted['MAE'], np.abs(actual[:, 0] - predicted[:, 0]))
+    
+    def test_validate_clustering_stability(self):
+        """Las réplicas re-agrupan submuestras y paran al estabilizarse."""
+        rng = np.random.RandomState(0)
+        X = np.vstack([rng.randn(40, 2) + center for center in ([0, 0], [10, 0], [0, 10])])
+        labels = np.repeat([0, 1, 2], 40)
+        
+        stability = validate_clustering_stability(X, labels, n_iterations=30, n_jobs=1)
+        
+        for metric in ['silhouette', 'davies_bouldin', 'calinski_harabasz', 'adjusted_rand', 'jaccard']:
+            self.assertIn('mean', stability[metric])
+            self.assertIn('std', stability[metric])
+            self.assertEqual(len(stability[metric]['scores']), stability['n_iterations'])
+        self.assertTrue(stability['converged'])
+        self.assertLess(stability['n_iterations'], 30)
+        self.assertGreater(stability['adjusted_rand']['mean'], 0.95)
+        self.assertGreater(stability['silhouette']['std'], 0)
+    
+    def test_small_stability_runs_without_pool(self):
+        """Sin n_jobs explícito, una población pequeña no arranca el pool de procesos."""
+        from unittest import mock
+        
+        rng = np.random.RandomState(0)
+        X = np.vstack([rng.randn(20, 2) + center for center in ([0, 0], [10, 0])])
+        labels = np.repeat([0, 1], 20)
+        with mock.patch('kselection.ProcessPoolExecutor', side_effect=AssertionError):
+            stability = validate_clustering_stability(X, labels, n_iterations=5)
+        self.assertEqual(stability['n_iterations'], 5)
+    
     def test_forecast_accuracy_with_nans(self):
         """Test para manejo de valores NaN en precisión."""
         actual = np.array([100, np.nan, 120, 130, 140])
@@ -104,6 +205,831 @@ class TestClusteringUtils(unittest.TestCase):
         self.assertIn('MAE', metrics)
         self.assertFalse(np.isnan(metrics['MAE']))
 
+class TestArtifactStore(unittest.TestCase):
+    """Tests para el almacén columnar de artefactos."""
+    
+    def setUp(self):
+        """Crear un almacén temporal."""
+        self.store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store_dir, ignore_errors=True)
+    
+    def test_table_round_trip(self):
+        """Una tabla escrita en el almacén se recupera igual y con memory mapping."""
+        from artifact_store import write_table, read_table
+        
+        df = pd.DataFrame({
+            'numerodoi': [10, 20, 30],
+            'ingresos_totales': [100.5, 200.0, 300.25],
+            'metodo_pago_preferido': ['CONTADO', 'CREDITO', 'CONTADO'],
+            'fecha': pd.to_datetime(['2023-01-31', '2023-02-28', '2023-03-31'])
+        }).set_index('fecha')
+        
+        write_table(df, 'prueba', store_dir=self.store_dir)
+        loaded = read_table('prueba', store_dir=self.store_dir)
+        
+        self.assertEqual(list(loaded.columns), list(df.columns))
+        self.assertTrue((loaded.index == df.index).all())
+        np.testing.assert_array_equal(loaded['ingresos_totales'].to_numpy(), df['ingresos_totales'].to_numpy())
+        self.assertEqual(list(loaded['metodo_pago_preferido']), list(df['metodo_pago_preferido']))
+        # El texto tiene el mismo tipo que al leer el CSV; Categorical bajo demanda
+        self.assertEqual(loaded['metodo_pago_preferido'].dtype, df['metodo_pago_preferido'].dtype)
+        categorical = read_table('prueba', store_dir=self.store_dir, categorical=True)
+        self.assertIsInstance(categorical['metodo_pago_preferido'].dtype, pd.CategoricalDtype)
+        
+        # Las columnas numéricas quedan en modo solo lectura (memory map)
+        self.assertFalse(loaded['ingresos_totales'].to_numpy().flags.writeable)
+    
+    def test_csv_fallback(self):
+        """Sin artefacto en el almacén se lee el CSV de respaldo."""
+        from artifact_store import load_table
+        
+        loaded = load_table('ts_mensual_historico.csv', store_dir=self.store_dir,
+                            index_col='fecha', parse_dates=True)
+        expected = pd.read_csv('ts_mensual_historico.csv', index_col='fecha', parse_dates=True)
+        
+        self.assertEqual(loaded.shape, expected.shape)
+
+class TestArtifactCache(unittest.TestCase):
+    """Tests para la caché de datos por artefacto."""
+    
+    def setUp(self):
+        """Crear copias temporales de los CSV de pronósticos y PYMEs."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.file_paths = {
+            'store': os.path.join(self.tmp_dir, 'artefactos'),
+            'clusters': os.path.join(self.tmp_dir, 'pymes_con_clusters.csv'),
+            'forecasts': {0: os.path.join(self.tmp_dir, 'pronostico_prophet_cluster_0.csv')}
+        }
+        shutil.copy('pymes_con_clusters.csv', self.file_paths['clusters'])
+        shutil.copy('pronostico_prophet_cluster_0.csv', self.file_paths['forecasts'][0])
+    
+    def test_only_changed_artifact_is_reloaded(self):
+        """Cambiar un pronóstico no vuelve a leer la tabla de PYMEs."""
+        from data_cache import ArtifactCache
+        
+        cache = ArtifactCache(file_paths=self.file_paths)
+        df_clusters = cache.get('clusters')
+        cache.get('forecasts', cluster_id=0)
+        
+        with open(self.file_paths['forecasts'][0], 'a') as f:
+            f.write('2027-01-31,1.0\n')
+        
+        df_forecast = cache.get('forecasts', cluster_id=0)
+        
+        self.assertIs(cache.get('clusters'), df_clusters)
+        self.assertEqual(cache.loads[('clusters', None)], 1)
+        self.assertEqual(cache.loads[('forecasts', 0)], 2)
+        self.assertEqual(df_forecast.index[-1], pd.Timestamp('2027-01-31'))
+    
+    def test_touch_without_changes_does_not_reload(self):
+        """Un cambio de mtime con el mismo contenido reutiliza la tabla."""
+        from data_cache import ArtifactCache
+        
+        cache = ArtifactCache(file_paths=self.file_paths)
+        df_clusters = cache.get('clusters')
+        os.utime(self.file_paths['clusters'], ns=(1, 1))
+        
+        self.assertIs(cache.get('clusters'), df_clusters)
+        self.assertEqual(cache.loads[('clusters', None)], 1)
+        self.assertFalse(df_clusters['ingresos_totales'].to_numpy().flags.writeable)
+
+class TestPCAProjection(unittest.TestCase):
+    """Tests para la proyección PCA persistida."""
+    
+    def setUp(self):
+        """Cargar X_procesado y los identificadores de las PYMEs."""
+        self.store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store_dir, ignore_errors=True)
+        self.df_X = pd.read_csv('X_procesado_para_pca.csv')
+        self.ids = pd.read_csv('pymes_con_clusters.csv')['numerodoi'].to_numpy()
+    
+    def test_projection_is_persisted_and_reused(self):
+        """La segunda llamada carga la proyección guardada sin reajustar."""
+        from sklearn.decomposition import PCA
+        from pca_projection import ensure_pca_projection
+        
+        first = ensure_pca_projection(self.df_X, self.ids, store_dir=self.store_dir)
+        second = ensure_pca_projection(self.df_X, self.ids, store_dir=self.store_dir)
+        
+        expected = PCA(n_components=2, random_state=42).fit_transform(self.df_X)
+        np.testing.assert_allclose(second['coords'].to_numpy(), expected, atol=1e-8)
+        self.assertEqual(first['fit_version'], second['fit_version'])
+        self.assertEqual(list(second['coords'].index), list(self.ids))
+    
+    def test_new_rows_use_saved_components(self):
+        """Las PYMEs nuevas se proyectan sin reajustar el PCA."""
+        from pca_projection import ensure_pca_projection, project
+        
+        base = ensure_pca_projection(self.df_X.iloc[:-5], self.ids[:-5], store_dir=self.store_dir)
+        updated = ensure_pca_projection(self.df_X, self.ids, store_dir=self.store_dir)
+        
+        self.assertEqual(updated['fit_version'], base['fit_version'])
+        self.assertEqual(len(updated['coords']), len(self.ids))
+        np.testing.assert_allclose(
+            updated['coords'].to_numpy()[-5:],
+            project(self.df_X.iloc[-5:], base),
+            atol=1e-10
+        )
+    
+    def test_changed_training_rows_trigger_refit(self):
+        """Si cambian los datos de las PYMEs del ajuste se reajusta el PCA."""
+        from sklearn.decomposition import PCA
+        from pca_projection import ensure_pca_projection
+        
+        base = ensure_pca_projection(self.df_X, self.ids, store_dir=self.store_dir)
+        changed = self.df_X.copy()
+        changed.iloc[:20] *= 3
+        updated = ensure_pca_projection(changed, self.ids, store_dir=self.store_dir)
+        
+        self.assertNotEqual(updated['fit_version'], base['fit_version'])
+        expected = PCA(n_components=2, random_state=42).fit(changed)
+        np.testing.assert_allclose(updated['explained_variance_ratio'],
+                                   expected.explained_variance_ratio_)
+        # Los mismos datos con otros identificadores son otra versión
+        renamed = ensure_pca_projection(changed, self.ids[::-1], store_dir=self.store_dir)
+        self.assertNotEqual(renamed['data_version'], updated['data_version'])
+
+class TestKMedoids(unittest.TestCase):
+    """Tests para el motor K-Medoids."""
+    
+    def setUp(self):
+        """Datos de prueba y matriz de distancias."""
+        from sklearn.metrics import pairwise_distances
+        rng = np.random.RandomState(0)
+        self.X = rng.randn(60, 3)
+        self.D = pairwise_distances(self.X)
+    
+    def test_swap_deltas_match_brute_force(self):
+        """El cambio de costo vectorizado coincide con recalcular el costo."""
+        from kmedoids import _nearest_two, swap_deltas
+        
+        medoids = np.array([1, 5, 9])
+        nearest, d_nearest, d_second = _nearest_two(self.D, medoids)
+        deltas = swap_deltas(self.D, nearest, d_nearest, d_second, 3)
+        base_cost = self.D[medoids].min(axis=0).sum()
+        
+        for candidate in [0, 2, 17, 40]:
+            for position in range(3):
+                swapped = medoids.copy()
+                swapped[position] = candidate
+                expected = self.D[swapped].min(axis=0).sum() - base_cost
+                self.assertAlmostEqual(deltas[candidate, position], expected, places=9)
+    
+    def test_fit_on_processed_data(self):
+        """El modelo expone etiquetas, medoides y costo coherentes."""
+        from kmedoids import KMedoids
+        
+        X = pd.read_csv('X_procesado_para_pca.csv').to_numpy()
+        model = KMedoids(n_clusters=3).fit(X)
+        
+        self.assertEqual(len(model.labels_), X.shape[0])
+        self.assertEqual(len(set(model.medoid_indices_)), 3)
+        distances = np.linalg.norm(X[:, None, :] - X[model.medoid_indices_][None, :, :], axis=2)
+        self.assertAlmostEqual(model.inertia_, distances.min(axis=1).sum(), places=6)
+        np.testing.assert_array_equal(model.labels_, distances.argmin(axis=1))
+        
+        # Costo del SimpleKMedoids del notebook para k=3 (semilla 42)
+        self.assertLessEqual(model.inertia_, 341.8661 + 1e-3)
+    
+    def test_clara_on_sampled_population(self):
+        """CLARA encuentra los grupos usando solo submuestras."""
+        from kmedoids import CLARA, KMedoids, kmedoids_for
+        
+        rng = np.random.RandomState(1)
+        X = np.vstack([rng.randn(400, 2) + center for center in ([0, 0], [8, 0], [0, 8])])
+        model = CLARA(n_clusters=3, sample_size=60, n_sampling=3, random_state=0).fit(X)
+        
+        self.assertEqual(len(model.sample_costs_), 3)
+        self.assertAlmostEqual(model.inertia_, min(model.sample_costs_))
+        for group in range(3):
+            labels = model.labels_[group * 400:(group + 1) * 400]
+            self.assertGreater(np.mean(labels == np.bincount(labels).argmax()), 0.95)
+        
+        # Si la matriz n×n no cabe en memoria se elige CLARA
+        self.assertIsInstance(kmedoids_for(200000), CLARA)
+        self.assertIsInstance(kmedoids_for(155), KMedoids)
+
+class TestDistances(unittest.TestCase):
+    """Tests para el motor de distancias por bloques."""
+    
+    def setUp(self):
+        """Datos de prueba."""
+        rng = np.random.RandomState(0)
+        self.X = rng.rand(50, 4)
+    
+    def test_blocked_matches_reference(self):
+        """Los bloques pequeños dan la misma matriz que el cálculo directo."""
+        from sklearn.metrics import pairwise_distances
+        from distances import pairwise_distances_blocked
+        
+        for metric in ['euclidean', 'manhattan']:
+            D = pairwise_distances_blocked(self.X, metric=metric, memory_budget_mb=0.01)
+            np.testing.assert_allclose(D, pairwise_distances(self.X, metric=metric), atol=1e-12)
+        
+        ranges = self.X.max(axis=0) - self.X.min(axis=0)
+        gower = (np.abs(self.X[:, None] - self.X[None]) / ranges).mean(axis=2)
+        np.testing.assert_allclose(pairwise_distances_blocked(self.X, metric='gower'), gower, atol=1e-12)
+        
+        # Con los rangos del entrenamiento la distancia no depende del lote
+        from distances import gower_ranges
+        from kmedoids import nearest_medoids
+        fitted = gower_ranges(self.X)
+        subset = pairwise_distances_blocked(self.X[:1], self.X[5:8], metric='gower', ranges=fitted)
+        np.testing.assert_allclose(subset, gower[:1, 5:8], atol=1e-12)
+        _, d_nearest, _ = nearest_medoids(self.X[:1], self.X[5:8], metric='gower', ranges=fitted)
+        self.assertAlmostEqual(d_nearest[0], gower[0, 5:8].min())
+        with self.assertRaises(ValueError):
+            pairwise_distances_blocked(self.X[:1], self.X[5:8], metric='gower')
+        
+        D32 = pairwise_distances_blocked(self.X, dtype=np.float32)
+        self.assertEqual(D32.dtype, np.float32)
+        np.testing.assert_allclose(D32, pairwise_distances(self.X), atol=1e-5)
+    
+    def test_distance_matrix_cache_is_reused(self):
+        """La matriz se guarda una vez y se reabre como memmap."""
+        from distances import distance_matrix
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = distance_matrix(self.X, metric='euclidean', cache_dir=cache_dir)
+            second = distance_matrix(self.X, metric='euclidean', cache_dir=cache_dir)
+            
+            self.assertIsInstance(second, np.memmap)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            np.testing.assert_array_equal(first, second)
+            del first, second
+
+class TestKSelection(unittest.TestCase):
+    """Tests para el barrido de k."""
+    
+    def test_parallel_sweep_matches_serial(self):
+        """El pool con memoria compartida da los mismos resultados."""
+        from kselection import k_sweep
+        
+        rng = np.random.RandomState(0)
+        X = np.vstack([rng.randn(30, 2) + center for center in ([0, 0], [6, 0], [0, 6])])
+        serial, k_serial = k_sweep(X, k_values=[2, 3, 4], n_jobs=1)
+        parallel, k_parallel = k_sweep(X, k_values=[2, 3, 4], n_jobs=2)
+        
+        self.assertEqual(len(serial), 6)
+        self.assertEqual(k_serial, 3)
+        self.assertEqual(k_parallel, 3)
+        columns = ['algorithm', 'k', 'silhouette', 'davies_bouldin', 'calinski_harabasz']
+        pd.testing.assert_frame_equal(serial[columns], parallel[columns])
+    
+    def test_sweep_without_exact_silhouette_skips_distance_matrix(self):
+        """Sin silueta exacta no se construye D y K-Medoids (BUILD) no repite semillas."""
+        from unittest import mock
+        import kselection
+        
+        rng = np.random.RandomState(0)
+        X = np.vstack([rng.randn(30, 2) + center for center in ([0, 0], [6, 0], [0, 6])])
+        with mock.patch.object(kselection, 'distance_matrix') as distance_matrix:
+            results, k_best = kselection.k_sweep(X, k_values=[2, 3, 4], seeds=[0, 1], n_jobs=1,
+                                                 metric='euclidean', silhouette_mode='simplified')
+        
+        distance_matrix.assert_not_called()
+        self.assertEqual(k_best, 3)
+        counts = results.groupby('algorithm').size()
+        self.assertEqual(counts['k-medoids'], 3)
+        self.assertEqual(counts['kmeans'], 6)
+
+class TestSilhouette(unittest.TestCase):
+    """Tests para la silueta exacta y aproximada."""
+    
+    def setUp(self):
+        """Grupos de distinto tamaño."""
+        rng = np.random.RandomState(0)
+        self.X = np.vstack([rng.randn(n, 3) + c for n, c in [(300, 0), (150, 3), (50, 6)]])
+        self.labels = np.repeat([0, 1, 2], [300, 150, 50])
+    
+    def test_modes(self):
+        """La muestra estratificada acota la silueta exacta."""
+        from sklearn.metrics import silhouette_score
+        from utils import calculate_silhouette
+        
+        exact = silhouette_score(self.X, self.labels)
+        self.assertAlmostEqual(calculate_silhouette(self.X, self.labels, mode='exact')['score'], exact)
+        
+        # Con todas las PYMEs en la muestra la estimación es exacta
+        full = calculate_silhouette(self.X, self.labels, mode='sampled', sample_size=500)
+        self.assertAlmostEqual(full['score'], exact)
+        
+        sampled = calculate_silhouette(self.X, self.labels, mode='sampled', sample_size=120)
+        self.assertLess(sampled['n_evaluated'], 500)
+        self.assertLessEqual(sampled['ci'][0], exact)
+        self.assertGreaterEqual(sampled['ci'][1], exact)
+        
+        centers = np.vstack([self.X[self.labels == c].mean(axis=0) for c in range(3)])
+        simplified = calculate_silhouette(self.X, self.labels, mode='simplified', centers=centers)
+        self.assertEqual(simplified['method'], 'simplified')
+        
+        auto = calculate_silhouette(self.X, self.labels, mode='auto', exact_max_n=100)
+        self.assertEqual(auto['method'], 'sampled')
+
+class TestFeatureAggregation(unittest.TestCase):
+    """Tests para la agregación de transacciones por bloques."""
+    
+    def setUp(self):
+        """Transacciones sintéticas."""
+        rng = np.random.RandomState(0)
+        n = 3000
+        self.transactions = pd.DataFrame({
+            'numerodoi': rng.randint(1000, 1030, n),
+            'fecha': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.randint(0, 800, n), unit='D'),
+            'descripcion': rng.choice([f'P{i}' for i in range(40)], n),
+            'precioventa': rng.gamma(2, 500, n).round(2),
+            'cantidad': rng.randint(1, 50, n),
+            'valorunit': rng.gamma(2, 30, n),
+            'preciounit': rng.gamma(2, 35, n),
+            'metodo_pago': rng.choice(['CONTADO', 'CREDITO'], n),
+            'tipo_moneda': rng.choice(['PEN', 'USD'], n, p=[0.8, 0.2]),
+            'vendedor': rng.choice(['VENTAS', 'JUAN', 'ANA'], n),
+            'estado': rng.choice(['Aceptado', 'Anulado'], n),
+            'unid': rng.choice(['NIU', 'ZZ', 'KGM'], n),
+        })
+    
+    def test_chunks_match_full_groupby(self):
+        """Los agregados por bloques coinciden con el groupby del notebook."""
+        from feature_aggregation import MODE_COLUMNS, PymeAggregator, aggregate_transactions
+        
+        df = self.transactions
+        grouped = df.groupby('numerodoi')
+        chunks = [df.iloc[i:i + 400] for i in range(0, len(df), 400)]
+        result = aggregate_transactions(chunks).set_index('numerodoi')
+        
+        np.testing.assert_allclose(result['ingresos_totales'], grouped['precioventa'].sum())
+        np.testing.assert_allclose(result['ticket_promedio'], grouped['precioventa'].mean())
+        np.testing.assert_array_equal(result['numero_transacciones'], grouped['fecha'].count())
+        np.testing.assert_array_equal(result['numero_productos_unicos'], grouped['descripcion'].nunique())
+        np.testing.assert_array_equal(result['fecha_primera_venta'], grouped['fecha'].min())
+        for column, name in MODE_COLUMNS.items():
+            expected = grouped[column].agg(lambda s: s.mode()[0])
+            self.assertEqual(result[name].tolist(), expected.tolist())
+        
+        # Dos agregadores parciales combinados dan el mismo resultado
+        first, second = PymeAggregator(), PymeAggregator()
+        first.update(df.iloc[:1000])
+        second.update(df.iloc[1000:])
+        first.merge(second)
+        pd.testing.assert_frame_equal(first.result().set_index('numerodoi'), result)
+    
+    def test_grouped_mode_matches_series_mode(self):
+        """La moda vectorizada coincide con obtener_moda, empates incluidos."""
+        from feature_aggregation import MODE_COLUMNS, grouped_mode
+        
+        df = self.transactions.copy()
+        df.loc[::7, 'unid'] = None
+        df.loc[df['numerodoi'] == 1000, 'vendedor'] = None
+        columns = list(MODE_COLUMNS)
+        
+        def obtener_moda(series):
+            moda = series.mode()
+            return moda[0] if not moda.empty else None
+        
+        expected = df.groupby('numerodoi')[columns].agg(obtener_moda)
+        result = grouped_mode(df, 'numerodoi', columns)
+        for column in columns:
+            self.assertEqual(result[column].fillna('-').tolist(), expected[column].fillna('-').tolist())
+        
+        # Empate: gana el menor valor; con pesos, el de mayor peso
+        ties = pd.DataFrame({'g': [1, 1, 1, 1], 'v': ['b', 'a', 'b', 'a'], 'w': [1, 1, 1, 5]})
+        self.assertEqual(grouped_mode(ties, 'g', ['v'])['v'].iloc[0], 'a')
+        ties['v'] = ['b', 'a', 'b', 'c']
+        self.assertEqual(grouped_mode(ties, 'g', ['v'], weights='w')['v'].iloc[0], 'c')
+    
+    def test_incremental_daily_updates(self):
+        """Aplicar los días uno a uno sobre el estado guardado da la tabla completa."""
+        from feature_aggregation import PymeAggregator, aggregate_transactions, update_features
+        
+        df = self.transactions.sort_values('fecha')
+        cutoff = pd.Timestamp('2025-02-20')
+        with tempfile.TemporaryDirectory() as store_dir:
+            update_features(df[df['fecha'] < cutoff], store_dir)
+            for fecha, day in df[df['fecha'] >= cutoff].groupby('fecha'):
+                features, touched = update_features(day, store_dir)
+                self.assertEqual(touched, sorted(day['numerodoi'].unique()))
+                expected = aggregate_transactions(df[df['fecha'] <= fecha])
+                expected = expected[expected['numerodoi'].isin(touched)].reset_index(drop=True)
+                pd.testing.assert_frame_equal(features, expected, check_dtype=False)
+            
+            partial = PymeAggregator.load(store_dir, ids=touched)
+            self.assertEqual(partial.n_pymes, len(touched))
+            stored = PymeAggregator.load(store_dir).result()
+        
+        pd.testing.assert_frame_equal(stored, aggregate_transactions(df), check_dtype=False)
+    
+    def test_reads_csv_in_chunks(self):
+        """La lectura por bloques de un CSV da la misma tabla."""
+        from feature_aggregation import aggregate_transactions
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'transacciones.csv')
+            self.transactions.to_csv(path, index=False)
+            from_file = aggregate_transactions(path, chunksize=500)
+        
+        expected = aggregate_transactions(self.transactions)
+        pd.testing.assert_frame_equal(from_file, expected, check_dtype=False)
+
+class TestPreprocessing(unittest.TestCase):
+    """Tests para el preprocesador persistido."""
+    
+    def test_numpy_transform_matches_sklearn(self):
+        """La transformación NumPy reproduce X_procesado y el ColumnTransformer."""
+        from preprocessing import (CATEGORICAL_FEATURES, NUMERIC_FEATURES, build_preprocessor,
+                                   fit_preprocessor, load_preprocessor, save_preprocessor, transform)
+        
+        df = pd.read_csv('pymes_con_clusters.csv')
+        X = pd.read_csv('X_procesado_para_pca.csv').to_numpy()
+        params = fit_preprocessor(df)
+        np.testing.assert_allclose(transform(df, params), X, atol=1e-12)
+        
+        with tempfile.TemporaryDirectory() as store_dir:
+            save_preprocessor(params, store_dir)
+            loaded = load_preprocessor(store_dir)
+        self.assertEqual(loaded['schema_hash'], params['schema_hash'])
+        
+        # Nulos y categorías no vistas se tratan igual que en sklearn
+        nuevas = df.head(5).copy()
+        nuevas.loc[0, 'ingresos_totales'] = np.nan
+        nuevas.loc[1, 'moneda_preferida'] = 'USD'
+        nuevas.loc[2, 'unidad_comun'] = None
+        columns = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+        expected = build_preprocessor().fit(df[columns]).transform(nuevas[columns])
+        np.testing.assert_allclose(transform(nuevas, loaded), np.asarray(expected), atol=1e-12)
+    
+    def test_transform_store_loaded_categoricals(self):
+        """PYMEs leídas del almacén con texto Categorical y nulos se transforman y asignan."""
+        from artifact_store import read_table, write_table
+        from preprocessing import (CATEGORICAL_FEATURES, NUMERIC_FEATURES, build_preprocessor,
+                                   transform)
+        from scoring import assign_clusters, fit_scoring_model
+        
+        df = pd.read_csv('pymes_con_clusters.csv')
+        nuevas = df.head(4).copy()
+        nuevas['vendedor_principal'] = ['X', 'Y', 'Z', None]
+        with tempfile.TemporaryDirectory() as store_dir:
+            model = fit_scoring_model(df, store_dir=store_dir)
+            write_table(nuevas, 'pymes_nuevas', store_dir=store_dir, index=False)
+            for categorical in (False, True):
+                loaded = read_table('pymes_nuevas', store_dir=store_dir, categorical=categorical)
+                assigned = assign_clusters(loaded, store_dir=store_dir)
+                self.assertEqual(len(assigned), 4)
+        
+        self.assertIsInstance(loaded['vendedor_principal'].dtype, pd.CategoricalDtype)
+        columns = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+        expected = build_preprocessor().fit(df[columns]).transform(nuevas[columns])
+        np.testing.assert_allclose(transform(loaded, model['preprocessor']), np.asarray(expected),
+                                   atol=1e-12)
+
+class TestScoring(unittest.TestCase):
+    """Tests para la asignación de clústeres a PYMEs nuevas."""
+    
+    def test_assign_reproduces_current_labels(self):
+        """Con los medoides guardados se recuperan las etiquetas actuales."""
+        from scoring import assign_clusters, fit_scoring_model
+        
+        df = pd.read_csv('pymes_con_clusters.csv')
+        with tempfile.TemporaryDirectory() as store_dir:
+            fit_scoring_model(df, store_dir=store_dir)
+            assigned = assign_clusters(df, store_dir=store_dir, chunk_size=40)
+        
+        np.testing.assert_array_equal(assigned['cluster_kmedoids'], df['cluster_kmedoids'])
+        self.assertTrue((assigned['margen_segundo_medoide'] >= 0).all())
+        self.assertTrue((assigned['distancia_medoide'] >= 0).all())
+    
+    def test_medoids_reused_and_computed_within_budget(self):
+        """Se reutilizan los medoides del ajuste o del modelo guardado; si faltan, por bloques o CLARA."""
+        from unittest import mock
+        from distances import pairwise_distances_blocked
+        from scoring import cluster_medoids, fit_scoring_model
+        
+        df = pd.read_csv('pymes_con_clusters.csv')
+        labels = df['cluster_kmedoids'].to_numpy()
+        X = pd.read_csv('X_procesado_para_pca.csv').to_numpy()
+        exact = cluster_medoids(X, labels)
+        for position, cluster in enumerate(np.unique(labels)):
+            members = np.flatnonzero(labels == cluster)
+            sums = pairwise_distances_blocked(X[members]).sum(axis=1)
+            self.assertEqual(exact[position], members[sums.argmin()])
+        # Presupuesto mínimo: CLARA, sin matriz n_c × n_c
+        sampled = cluster_medoids(X, labels, memory_budget_mb=0.05)
+        np.testing.assert_array_equal(labels[sampled], np.unique(labels))
+        
+        with tempfile.TemporaryDirectory() as store_dir:
+            first = fit_scoring_model(df, store_dir=store_dir, medoid_indices=exact[::-1])
+            with mock.patch('scoring.cluster_medoids', side_effect=AssertionError), \
+                    mock.patch('preprocessing.fit_preprocessor', side_effect=AssertionError):
+                second = fit_scoring_model(df, store_dir=store_dir)
+        np.testing.assert_array_equal(first['medoid_ids'], df['numerodoi'].to_numpy()[exact])
+        np.testing.assert_array_equal(second['medoid_ids'], first['medoid_ids'])
+        np.testing.assert_allclose(second['centers'], first['centers'])
+
+class TestForecasting(unittest.TestCase):
+    """Tests para el entrenamiento paralelo de pronósticos."""
+    
+    def setUp(self):
+        """Serie mensual histórica por clúster."""
+        self.df_ts = pd.read_csv('ts_mensual_historico.csv', index_col='fecha', parse_dates=True)
+    
+    def test_parallel_run_isolates_failures(self):
+        """Un clúster que falla no impide guardar los demás pronósticos."""
+        from forecasting import run_forecasts
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {i: os.path.join(tmp, f'pronostico_{i}.csv') for i in range(3)}
+            summary, forecasts = run_forecasts(self.df_ts, n_jobs=2, fit_fn=_mean_or_fail,
+                                               output_paths=paths, cache=False)
+            self.assertFalse(os.path.exists(paths[1]))
+            saved = pd.read_csv(paths[0], index_col='ds', parse_dates=True)
+        
+        self.assertEqual(len(summary), 6)
+        self.assertTrue((summary['seconds'] >= 0).all())
+        failed = summary[summary['status'] == 'error']
+        self.assertEqual(set(failed['cluster']), {'1'})
+        self.assertEqual(sorted(forecasts), ['0', '2'])
+        # 2025-06 .. 2026-12
+        self.assertEqual(len(saved), 19)
+        self.assertEqual(saved.index[-1], pd.Timestamp('2026-12-31'))
+        evaluation = summary[(summary['phase'] == 'evaluacion') & (summary['status'] == 'ok')]
+        self.assertTrue(evaluation['MAE'].notna().all())
+    
+    def test_zero_test_size_skips_evaluation(self):
+        """test_size=0 solo pronostica; un valor negativo es un error."""
+        from forecasting import run_forecasts
+        
+        summary, forecasts = run_forecasts(self.df_ts[['0', '2']], n_jobs=1, test_size=0,
+                                           fit_fn=_mean_or_fail, output_paths={}, cache=False)
+        self.assertEqual(summary['phase'].tolist(), ['pronostico', 'pronostico'])
+        self.assertTrue((summary['status'] == 'ok').all())
+        self.assertEqual(sorted(forecasts), ['0', '2'])
+        with self.assertRaises(ValueError):
+            run_forecasts(self.df_ts, n_jobs=1, test_size=-1, fit_fn=_mean_or_fail,
+                          output_paths={}, cache=False)
+    
+    def test_cache_refits_only_changed_series(self):
+        """Solo se reajusta el clúster cuya historia cambió; la caché respeta su límite."""
+        from forecasting import ForecastCache, run_forecasts
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ForecastCache(os.path.join(tmp, 'cache'), max_entries=20)
+            df_ts = self.df_ts[['0', '2']]
+            first, forecasts = run_forecasts(df_ts, n_jobs=1, fit_fn=_mean_or_fail,
+                                             output_paths={}, cache=cache)
+            self.assertFalse(first['cached'].any())
+            
+            changed = df_ts.copy()
+            changed.iloc[0, 1] += 1000
+            second, cached_forecasts = run_forecasts(changed, n_jobs=1, fit_fn=_mean_or_fail,
+                                                     output_paths={}, cache=cache)
+            self.assertEqual(second.loc[second['cached'], 'cluster'].tolist(), ['0', '0'])
+            pd.testing.assert_frame_equal(cached_forecasts['0'], forecasts['0'])
+            
+            cache.max_entries = 3
+            self.assertEqual(cache.evict(), 3)
+            self.assertEqual(len(cache.entries()), 3)
+
+    def test_rolling_origin_backtest(self):
+        """El backtesting evalúa cada origen y agrega los errores por horizonte."""
+        from backtesting import backtest, rolling_origins
+        from forecasting import ForecastCache
+        
+        self.assertEqual(rolling_origins(10, 2, initial=6, step=1, window='sliding'),
+                         [(0, 6), (1, 7), (2, 8)])
+        models = {'media': (_mean_or_fail, {})}
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ForecastCache(tmp)
+            metrics, detail, failures = backtest(self.df_ts, models, horizon=3, initial=20,
+                                                 n_jobs=2, cache=cache)
+            backtest(self.df_ts, models, horizon=3, initial=20, n_jobs=1, cache=cache)
+        
+        # 7 orígenes (meses 20..26) · 3 series, falla la serie '1'
+        self.assertEqual(set(failures['serie']), {'1'})
+        self.assertEqual(len(failures), 7)
+        self.assertEqual(cache.hits, 14)
+        self.assertEqual(list(metrics['n_origenes'].unique()), [7])
+        
+        row = detail[(detail['serie'] == '0') & (detail['horizonte'] == 2)].iloc[0]
+        expected = self.df_ts['0'].iloc[:20].mean()
+        self.assertAlmostEqual(row['yhat'], expected)
+        self.assertEqual(row['y'], self.df_ts['0'].iloc[21])
+        mae = metrics[(metrics['serie'] == '0') & (metrics['horizonte'] == 2)]['MAE'].iloc[0]
+        errors = [abs(self.df_ts['0'].iloc[end + 1] - self.df_ts['0'].iloc[:end].mean())
+                  for end in range(20, 27)]
+        self.assertAlmostEqual(mae, np.mean(errors))
+
+    def test_combined_view_materialized(self):
+        """La vista combinada une histórico y pronósticos y refresca el almacén."""
+        from artifact_store import load_artifact, write_table
+        from forecasting import materialize_combined_view
+
+        with tempfile.TemporaryDirectory() as tmp:
+            file_paths = {
+                'store': os.path.join(tmp, 'artefactos'),
+                'historical': 'ts_mensual_historico.csv',
+                'combined': os.path.join(tmp, 'combined_time_series_data.csv'),
+                'forecasts': {i: f'pronostico_prophet_cluster_{i}.csv' for i in range(3)},
+            }
+            forecasts = {i: load_artifact('forecasts', i) for i in range(3)}
+            forecasts[1] = None
+            write_table(pd.DataFrame({'obsoleto': [0]}), 'combined_time_series_data',
+                        store_dir=file_paths['store'])
+            view = materialize_combined_view(self.df_ts, forecasts, file_paths)
+            stored = load_artifact('combined', file_paths=file_paths)
+            saved = pd.read_csv(file_paths['combined'], index_col='Fecha', parse_dates=True)
+
+        pd.testing.assert_frame_equal(stored.astype({'Tipo_Dato': str}), view,
+                                      check_index_type=False)
+        pd.testing.assert_frame_equal(saved, view, check_index_type=False, check_freq=False)
+        history = view[view['Tipo_Dato'] == 'Histórico']
+        future = view[view['Tipo_Dato'] == 'Pronóstico']
+        np.testing.assert_allclose(history['Ingresos_Total'], self.df_ts.sum(axis=1))
+        self.assertGreater(future.index[0], self.df_ts.index[-1])
+        self.assertEqual(future.index[-1], pd.Timestamp('2026-12-31'))
+        self.assertTrue((future['Ingresos_Cluster_1'] == 0).all())
+        np.testing.assert_allclose(future['Ingresos_Total'],
+                                   future['Ingresos_Cluster_0'] + future['Ingresos_Cluster_2'])
+
+    def test_combined_view_tracks_republished_forecasts(self):
+        """run_forecasts publica la vista y republicar un pronóstico la marca como obsoleta."""
+        from unittest import mock
+        from config import FILE_PATHS
+        from data_cache import ArtifactCache
+        from forecasting import (build_combined_view, combined_view_is_current, publish_csv,
+                                 run_forecasts)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            file_paths = {
+                'store': os.path.join(tmp, 'artefactos'),
+                'historical': 'ts_mensual_historico.csv',
+                'combined': os.path.join(tmp, 'combined_time_series_data.csv'),
+                'forecasts': {i: os.path.join(tmp, f'pronostico_prophet_cluster_{i}.csv')
+                              for i in (0, 2)},
+            }
+            with mock.patch.dict(FILE_PATHS, file_paths):
+                _, forecasts = run_forecasts(self.df_ts[['0', '2']], n_jobs=1,
+                                             fit_fn=_mean_or_fail, cache=False)
+            cache = ArtifactCache(file_paths)
+            self.assertTrue(combined_view_is_current(cache))
+            pd.testing.assert_frame_equal(cache.get('combined').astype({'Tipo_Dato': str}),
+                                          build_combined_view(self.df_ts[['0', '2']], forecasts),
+                                          check_index_type=False, check_freq=False)
+
+            republished = forecasts['0'].assign(yhat=forecasts['0']['yhat'] + 1)
+            publish_csv(republished, file_paths['forecasts'][0], file_paths['store'])
+            self.assertFalse(combined_view_is_current(cache))
+
+def _mean_or_fail(train, periods, config):
+    """Pronóstico constante (media); falla en el clúster '1'."""
+    if train.name == '1':
+        raise RuntimeError('ajuste fallido')
+    from statistical_forecast import MONTH_END
+    ds = pd.date_range(train.index[-1], periods=periods + 1, freq=MONTH_END)[1:]
+    return pd.DataFrame({'ds': ds, 'yhat': train.mean()})
+
+class TestStatisticalForecast(unittest.TestCase):
+    """Tests para los pronósticos estadísticos por lotes."""
+    
+    def test_batch_methods_recover_known_series(self):
+        """Cada método reproduce series con su estructura y la selección es por serie."""
+        from statistical_forecast import drift, forecast_batch, holt_winters, seasonal_naive
+        
+        t = np.arange(36)
+        seasonal = 100 + 2 * t + 10 * np.sin(2 * np.pi * t / 12)
+        linear = 50 + 3.0 * t
+        Y = np.vstack([seasonal, linear])
+        
+        np.testing.assert_allclose(seasonal_naive(Y[:, :24], 12)[0], seasonal[12:24])
+        np.testing.assert_allclose(drift(Y[:, :30], 6)[1], linear[30:])
+        np.testing.assert_allclose(holt_winters(Y[:, :30], 6), Y[:, 30:], atol=1.0)
+        
+        yhat, methods = forecast_batch(Y, 6, method='auto')
+        self.assertEqual(yhat.shape, (2, 6))
+        self.assertIn(methods[1], ('drift', 'holt_winters'))
+        self.assertTrue((yhat >= 0).all())
+    
+    def test_monthly_revenue_and_forecast_format(self):
+        """Matriz mensual por PYME y salida con el formato de los pronósticos de Prophet."""
+        from statistical_forecast import forecast_frame, monthly_revenue
+        
+        transactions = pd.DataFrame({
+            'numerodoi': [1, 1, 2, 1, 2],
+            'fecha': ['2024-01-05', '2024-01-20', '2024-01-10', '2024-03-02', '2024-03-15'],
+            'precioventa': [10.0, 5.0, 7.0, 4.0, 1.0],
+        })
+        wide = monthly_revenue([transactions.iloc[:2], transactions.iloc[2:]])
+        expected = pd.DataFrame({1: [15.0, 0.0, 4.0], 2: [7.0, 0.0, 1.0]},
+                                index=pd.DatetimeIndex(['2024-01-31', '2024-02-29', '2024-03-31'],
+                                                       name='fecha'))
+        pd.testing.assert_frame_equal(wide, expected, check_index_type=False, check_freq=False)
+        
+        forecasts, methods = forecast_frame(wide, 3, method='seasonal_naive')
+        self.assertEqual(forecasts.index.name, 'ds')
+        self.assertEqual(forecasts.index[-1], pd.Timestamp('2024-06-30'))
+        self.assertEqual(list(methods), ['seasonal_naive', 'seasonal_naive'])
+
+class TestReconciliation(unittest.TestCase):
+    """Tests para la reconciliación jerárquica de pronósticos."""
+    
+    def test_mint_matches_dense_formula_and_is_coherent(self):
+        """La forma por restricciones de MinT coincide con S (SᵀW⁻¹S)⁻¹ SᵀW⁻¹ ŷ."""
+        from reconciliation import reconcile, summing_matrix
+        
+        rng = np.random.RandomState(0)
+        S, clusters = summing_matrix(rng.randint(0, 3, 12))
+        base = rng.normal(size=(S.shape[0], 5))
+        dense = S.toarray()
+        
+        for weights, diagonal in (('ols', np.ones(len(dense))), ('structural', dense.sum(axis=1))):
+            W_inv = np.diag(1 / diagonal)
+            expected = dense @ np.linalg.solve(dense.T @ W_inv @ dense, dense.T @ W_inv @ base)
+            reconciled = reconcile(base, S, method='mint', weights=weights)
+            np.testing.assert_allclose(reconciled, expected, atol=1e-10)
+        
+        for method in ('bottom_up', 'top_down'):
+            reconciled = reconcile(base, S, method=method, history=rng.rand(12, 6))
+            np.testing.assert_allclose(reconciled, dense @ reconciled[-12:], atol=1e-10)
+        np.testing.assert_allclose(reconcile(base, S, method='top_down', history=rng.rand(12, 6))[0],
+                                   base[0])
+
+class TestOutliers(unittest.TestCase):
+    """Tests para la detección de outliers por clúster y en streaming."""
+    
+    def setUp(self):
+        self.df = pd.read_csv('pymes_con_clusters.csv')
+    
+    def test_per_cluster_matches_iqr_reference(self):
+        """Todas las columnas por clúster en una llamada, igual que la regla IQR de pandas."""
+        from outliers import detect_outliers
+        
+        mask = detect_outliers(self.df, by='cluster_kmedoids')
+        grouped = self.df.groupby('cluster_kmedoids')
+        for column in ('ingresos_totales', 'numero_transacciones', 'periodo_actividad_dias'):
+            q1 = grouped[column].transform(lambda values: values.quantile(0.25))
+            q3 = grouped[column].transform(lambda values: values.quantile(0.75))
+            iqr = q3 - q1
+            expected = (self.df[column] < q1 - 1.5 * iqr) | (self.df[column] > q3 + 1.5 * iqr)
+            pd.testing.assert_series_equal(mask[column], expected, check_names=False)
+        
+        pd.testing.assert_series_equal(detect_outliers_iqr(self.df, 'ingresos_totales'),
+                                       detect_outliers(self.df)['ingresos_totales'])
+    
+    def test_streaming_sketches(self):
+        """Los sketches combinados aproximan los cuantiles y se guardan en el almacén."""
+        from outliers import KLLSketch, StreamingOutlierBounds
+        
+        values = np.random.RandomState(0).lognormal(size=200_000)
+        left = KLLSketch(200, seed=1).update(values[:120_000])
+        right = KLLSketch(200, seed=2).update(values[120_000:])
+        left.merge(right)
+        self.assertEqual(left.n, len(values))
+        self.assertLess(sum(len(level) for level in left.levels), 1000)
+        quantiles = np.array([0.1, 0.25, 0.5, 0.75, 0.9])
+        ranks = np.searchsorted(np.sort(values), left.quantile(quantiles)) / len(values)
+        self.assertLess(np.abs(ranks - quantiles).max(), 0.02)
+        
+        streaming = StreamingOutlierBounds(['ingresos_totales', 'ticket_promedio'],
+                                           by='cluster_kmedoids')
+        for start in range(0, len(self.df), 50):
+            streaming.update(self.df.iloc[start:start + 50])
+        with tempfile.TemporaryDirectory() as store_dir:
+            streaming.save(store_dir)
+            loaded = StreamingOutlierBounds.load(store_dir)
+        pd.testing.assert_frame_equal(loaded.bounds(), streaming.bounds())
+        self.assertEqual(list(streaming.bounds().index), [0, 1, 2])
+
+class TestSeasonality(unittest.TestCase):
+    """Tests para el motor de estacionalidad por lotes."""
+    
+    def test_batch_profile_matches_per_series_analysis(self):
+        """El perfil por lotes reproduce analyze_seasonality y recupera la estacionalidad."""
+        from utils import analyze_seasonality
+        from seasonality import seasonality_profile
+        
+        df_ts = pd.read_csv('ts_mensual_historico.csv', index_col='fecha', parse_dates=True)
+        for cluster_id in range(3):
+            data = df_ts[str(cluster_id)]
+            monthly = data.groupby(data.index.month).mean()
+            result = analyze_seasonality(df_ts, cluster_id)
+            np.testing.assert_allclose(result['monthly_patterns'], monthly)
+            self.assertEqual(result['peak_month'], monthly.idxmax())
+            self.assertAlmostEqual(result['seasonality_strength'],
+                                   (monthly.max() - monthly.min()) / monthly.mean())
+        
+        from statistical_forecast import MONTH_END
+        dates = pd.date_range('2021-01-31', periods=48, freq=MONTH_END)
+        pattern = 10 * np.sin(2 * np.pi * np.arange(12) / 12)
+        synthetic = pd.DataFrame({'estacional': 100 + pattern[dates.month - 1],
+                                  'plana': np.full(48, 50.0)}, index=dates)
+        with tempfile.TemporaryDirectory() as store_dir:
+            profile = seasonality_profile(synthetic, store_dir=store_dir)
+            self.assertIs(seasonality_profile(synthetic, store_dir=store_dir), profile)
+        
+        np.testing.assert_allclose(profile['seasonal_indices'].loc['estacional'], pattern, atol=1e-9)
+        self.assertAlmostEqual(profile['summary'].loc['estacional', 'seasonal_strength'], 1.0)
+        self.assertEqual(profile['summary'].loc['estacional', 'peak_month'], 4)
+        np.testing.assert_allclose(profile['seasonal_indices'].loc['plana'], 0, atol=1e-12)
+
 class TestDataIntegrity(unittest.TestCase):
     """Tests para verificar la integridad de los datos."""
     
@@ -165,6 +1091,21 @@ def run_all_tests():
     
     # Agregar todos los tests
     suite.addTests(loader.loadTestsFromTestCase(TestClusteringUtils))
+    suite.addTests(loader.loadTestsFromTestCase(TestArtifactStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestArtifactCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestPCAProjection))
+    suite.addTests(loader.loadTestsFromTestCase(TestKMedoids))
+    suite.addTests(loader.loadTestsFromTestCase(TestDistances))
+    suite.addTests(loader.loadTestsFromTestCase(TestKSelection))
+    suite.addTests(loader.loadTestsFromTestCase(TestSilhouette))
+    suite.addTests(loader.loadTestsFromTestCase(TestFeatureAggregation))
+    suite.addTests(loader.loadTestsFromTestCase(TestPreprocessing))
+    suite.addTests(loader.loadTestsFromTestCase(TestScoring))
+    suite.addTests(loader.loadTestsFromTestCase(TestForecasting))
+    suite.addTests(loader.loadTestsFromTestCase(TestStatisticalForecast))
+    suite.addTests(loader.loadTestsFromTestCase(TestReconciliation))
+    suite.addTests(loader.loadTestsFromTestCase(TestOutliers))
+    suite.addTests(loader.loadTestsFromTestCase(TestSeasonality))
     suite.addTests(loader.loadTestsFromTestCase(TestDataIntegrity))
     suite.addTests(loader.loadTestsFromTestCase(TestConfigIntegrity))
     
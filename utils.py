@@ -13,100 +13,314 @@ from sklearn.preprocessing import StandardScaler
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
+from collections import OrderedDict
 import warnings
 warnings.filterwarnings('ignore')
 
-def validate_clustering_stability(X, labels, n_iterations=10, random_states=None):
+def _confidence_interval(scores, z=1.96):
+    """Intervalo de confianza normal (z=1.96 → 95%) de la media."""
+    scores = np.asarray(scores, dtype=float)
+    scores = scores[~np.isnan(scores)]
+    if len(scores) == 0:
+        return (np.nan, np.nan)
+    half_width = z * scores.std(ddof=1) / np.sqrt(len(scores)) if len(scores) > 1 else np.inf
+    return (scores.mean() - half_width, scores.mean() + half_width)
+
+
+def _stability_replicate(job, X, D, labels):
+    """
+    Re-agrupa una submuestra y la compara con las etiquetas de referencia.
+
+    Args:
+        job: Tupla (semilla, algoritmo, k, fracción de muestra, max_iter, modo de silueta)
+        X, D: Datos y matriz de distancias completas
+        labels: Etiquetas de referencia
+
+    Returns:
+        dict: Acuerdo (ARI, Jaccard) y métricas internas de la réplica
+    """
+    from sklearn.metrics import adjusted_rand_score
+    from sklearn.metrics.cluster import pair_confusion_matrix
+    from kselection import fit_labels
+    from silhouette import estimate_silhouette
+
+    seed, algorithm, k, sample_fraction, max_iter, silhouette_mode = job
+    rng = np.random.RandomState(seed)
+    n = len(labels)
+    size = max(k + 1, int(round(sample_fraction * n)))
+    idx = np.sort(rng.choice(n, size=min(size, n), replace=False))
+
+    X_sub = X[idx]
+    D_sub = D[np.ix_(idx, idx)]
+    replicate_labels, _, centers = fit_labels(algorithm, k, seed, X_sub, D_sub, max_iter)
+    reference = labels[idx]
+
+    pairs = pair_confusion_matrix(reference, replicate_labels)
+    together = pairs[1, 1] + pairs[0, 1] + pairs[1, 0]
+    result = {
+        'adjusted_rand': adjusted_rand_score(reference, replicate_labels),
+        'jaccard': pairs[1, 1] / together if together else 1.0,
+        'silhouette': np.nan,
+        'davies_bouldin': np.nan,
+        'calinski_harabasz': np.nan,
+    }
+    if len(np.unique(replicate_labels)) > 1:
+        result['silhouette'] = estimate_silhouette(X_sub, replicate_labels, mode=silhouette_mode,
+                                                   distances=D_sub, centers=centers,
+                                                   random_state=seed)['score']
+        result['davies_bouldin'] = davies_bouldin_score(X_sub, replicate_labels)
+        result['calinski_harabasz'] = calinski_harabasz_score(X_sub, replicate_labels)
+    return result
+
+
+def validate_clustering_stability(X, labels, n_iterations=10, random_states=None, distances=None,
+                                  sample_fraction=0.8, algorithm=None, n_jobs=None,
+                                  min_iterations=5, ci_tol=0.02, silhouette_mode=None):
     """
-    Valida la estabilidad del clustering con diferentes semillas aleatorias.
+    Valida la estabilidad del clustering re-agrupando submuestras de los datos.
+    
+    Cada réplica toma una submuestra sin reemplazo, vuelve a agrupar con el
+    mismo número de clústeres y mide el acuerdo con las etiquetas actuales
+    (Adjusted Rand y Jaccard por pares) y las métricas internas de la réplica.
+    Las réplicas se ejecutan en paralelo por tandas; el análisis se detiene
+    antes de ``n_iterations`` cuando el intervalo de confianza del 95% del
+    ARI y de la silueta tiene una semiamplitud menor que ``ci_tol``.
     
     Args:
         X: Datos para clustering
         labels: Etiquetas actuales
-        n_iterations: Número de iteraciones para validar
-        random_states: Lista de semillas aleatorias
+        n_iterations: Número máximo de réplicas
+        random_states: Lista de semillas aleatorias (una por réplica)
+        distances: Matriz de distancias precalculada (p. ej. la de
+            ``distances.distance_matrix``); si es None se calcula una vez
+        sample_fraction: Fracción de PYMEs en cada submuestra
+        algorithm: 'k-medoids' o 'kmeans' (por defecto CLUSTERING_CONFIG)
+        n_jobs: Procesos para las réplicas (por defecto CLUSTERING_CONFIG['n_jobs'];
+            si es None, todos los núcleos a partir de ``parallel_min_samples``
+            PYMEs y en serie por debajo, donde arrancar el pool cuesta más
+            que las réplicas)
+        min_iterations: Réplicas mínimas antes de evaluar la parada
+        ci_tol: Semiamplitud del intervalo de confianza para detenerse
+        silhouette_mode: Modo de ``calculate_silhouette`` en cada réplica
     
     Returns:
-        dict: Métricas de estabilidad
+        dict: Métricas de estabilidad (mean, std, ci y scores por métrica),
+            réplicas realizadas y si se alcanzó la convergencia
     """
+    import os
+    from config import CLUSTERING_CONFIG
+    from distances import distance_matrix
+    from kselection import SharedArrayPool
+
+    X = np.asarray(X, dtype=np.float64)
+    labels = np.asarray(labels)
     if random_states is None:
         random_states = range(42, 42 + n_iterations)
-    
-    silhouette_scores = []
-    davies_bouldin_scores = []
-    calinski_harabasz_scores = []
-    
-    for rs in random_states:
-        try:
-            # Calcular métricas con los labels actuales
-            sil_score = silhouette_score(X, labels)
-            db_score = davies_bouldin_score(X, labels)
-            ch_score = calinski_harabasz_score(X, labels)
+    random_states = list(random_states)
+    algorithm = algorithm or CLUSTERING_CONFIG.get('algorithm', 'k-medoids')
+    n_clusters = len(np.unique(labels))
+    if n_jobs is None:
+        n_jobs = CLUSTERING_CONFIG.get('n_jobs')
+    if n_jobs is None:
+        large = len(X) >= CLUSTERING_CONFIG.get('parallel_min_samples', 5000)
+        n_jobs = (os.cpu_count() or 1) if large else 1
+    n_jobs = max(1, min(n_jobs, len(random_states)))
+    
+    if distances is None:
+        distances = distance_matrix(X)
+    
+    names = ['silhouette', 'davies_bouldin', 'calinski_harabasz', 'adjusted_rand', 'jaccard']
+    scores = {name: [] for name in names}
+    converged = False
+    batch = max(min_iterations, n_jobs)
+    
+    with SharedArrayPool({'X': X, 'D': distances, 'labels': labels}, n_jobs) as pool:
+        done = 0
+        while done < len(random_states) and not converged:
+            jobs = [(rs, algorithm, n_clusters, sample_fraction, CLUSTERING_CONFIG['max_iter'],
+                     silhouette_mode)
+                    for rs in random_states[done:done + batch]]
+            try:
+                replicates = pool.map(_stability_replicate, jobs)
+            except Exception as e:
+                print(f"Error en las réplicas {done}-{done + len(jobs)}: {e}")
+                break
+            for replicate in replicates:
+                for name in names:
+                    scores[name].append(replicate[name])
+            done += len(jobs)
+            batch = n_jobs
             
-            silhouette_scores.append(sil_score)
-            davies_bouldin_scores.append(db_score)
-            calinski_harabasz_scores.append(ch_score)
-            
-        except Exception as e:
-            print(f"Error en iteración {rs}: {e}")
-            continue
-    
-    return {
-        'silhouette': {
-            'mean': np.mean(silhouette_scores),
-            'std': np.std(silhouette_scores),
-            'scores': silhouette_scores
-        },
-        'davies_bouldin': {
-            'mean': np.mean(davies_bouldin_scores),
-            'std': np.std(davies_bouldin_scores),
-            'scores': davies_bouldin_scores
-        },
-        'calinski_harabasz': {
-            'mean': np.mean(calinski_harabasz_scores),
-            'std': np.std(calinski_harabasz_scores),
-            'scores': calinski_harabasz_scores
+            if done >= min_iterations:
+                half_widths = [np.diff(_confidence_interval(scores[name]))[0] / 2
+                               for name in ('adjusted_rand', 'silhouette')]
+                converged = all(width < ci_tol for width in half_widths)
+    
+    result = {
+        name: {
+            'mean': np.nanmean(values) if values else np.nan,
+            'std': np.nanstd(values) if values else np.nan,
+            'ci': _confidence_interval(values),
+            'scores': values
         }
+        for name, values in scores.items()
     }
+    result['n_iterations'] = len(scores['silhouette'])
+    result['converged'] = converged
+    return result
+
+def calculate_silhouette(X, labels, mode=None, distances=None, centers=None, **kwargs):
+    """
+    Calcula la silueta media, exacta o aproximada.
+    
+    Args:
+        X: Datos para clustering
+        labels: Etiquetas de cada PYME
+        mode: 'exact', 'sampled' (muestreo estratificado por clúster),
+            'simplified' (respecto a los medoides) o 'auto' (exacta hasta
+            CLUSTERING_CONFIG['silhouette_exact_max_n'] PYMEs)
+        distances: Matriz de distancias precalculada (opcional)
+        centers: Medoides, necesarios en modo 'simplified'
+        **kwargs: Otros parámetros de ``silhouette.estimate_silhouette``
+    
+    Returns:
+        dict: score, ci (intervalo del 95%), method y n_evaluated
+    """
+    from silhouette import estimate_silhouette
+    
+    return estimate_silhouette(X, labels, mode=mode, distances=distances, centers=centers, **kwargs)
+
+# Métricas de negocio por clúster: nombre -> (columna, estadístico). El
+# estadístico es 'count' (filas si la columna es None, no nulos si no),
+# 'sum', 'mean', 'std', 'median', 'min', 'max' o un cuantil entre 0 y 1
+BUSINESS_METRICS = {
+    'count': (None, 'count'),
+    'revenue_mean': ('ingresos_totales', 'mean'),
+    'revenue_std': ('ingresos_totales', 'std'),
+    'revenue_median': ('ingresos_totales', 'median'),
+    'transactions_mean': ('numero_transacciones', 'mean'),
+    'ticket_mean': ('ticket_promedio', 'mean'),
+    'products_mean': ('numero_productos_unicos', 'mean'),
+    'activity_days_mean': ('periodo_actividad_dias', 'mean'),
+    'revenue_p25': ('ingresos_totales', 0.25),
+    'revenue_p75': ('ingresos_totales', 0.75),
+}
 
-def calculate_business_metrics(df_clusters):
+# Cocientes entre métricas ya calculadas: nombre -> (numerador, denominador)
+DERIVED_METRICS = {
+    'revenue_per_day': ('revenue_mean', 'activity_days_mean'),
+    'efficiency_ratio': ('revenue_mean', 'transactions_mean'),
+    'product_diversity': ('products_mean', 'transactions_mean'),
+}
+
+_ORDER_STATISTICS = {'median': 0.5, 'min': 0.0, 'max': 1.0}
+
+
+def _ratio(numerator, denominator):
+    out = np.full(len(numerator), np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def grouped_metrics(df, by='cluster_kmedoids', spec=None, derived=None):
+    """
+    Calcula todas las métricas de ``spec`` por grupo en una pasada por columna.
+
+    Los grupos se codifican una vez; sumas, conteos y desviaciones salen de
+    ``np.bincount`` y los cuantiles (mediana, percentiles, mín., máx.) de una
+    única ordenación (grupo, valor) por columna, con la interpolación lineal
+    de pandas. Añadir una métrica sobre una columna ya usada no añade pasadas.
+
+    Args:
+        df: DataFrame con la columna de grupo
+        by: Columna de grupo (por defecto 'cluster_kmedoids')
+        spec: Diccionario nombre -> (columna, estadístico) (por defecto
+            BUSINESS_METRICS)
+        derived: Diccionario nombre -> (numerador, denominador) (por defecto
+            DERIVED_METRICS)
+
+    Returns:
+        pandas.DataFrame: Una fila por grupo (ordenados) y una columna por
+            métrica; las métricas de columnas ausentes valen NaN
+    """
+    spec = BUSINESS_METRICS if spec is None else spec
+    derived = DERIVED_METRICS if derived is None else derived
+
+    groups, codes = np.unique(df[by].to_numpy(), return_inverse=True)
+    k = len(groups)
+    sizes = np.bincount(codes, minlength=k)
+
+    by_column = {}
+    for name, (column, stat) in spec.items():
+        by_column.setdefault(column, []).append((name, stat))
+
+    out = {}
+    for column, items in by_column.items():
+        if column is None:
+            out.update({name: sizes.astype(np.int64) for name, _ in items})
+            continue
+        if column not in df.columns:
+            out.update({name: np.full(k, np.nan) for name, _ in items})
+            continue
+
+        x = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(x)
+        n = np.bincount(codes, weights=valid, minlength=k)
+        total = np.bincount(codes, weights=np.where(valid, x, 0.0), minlength=k)
+        mean = _ratio(total, n)
+
+        stats = {stat for _, stat in items}
+        if 'std' in stats:
+            deviation = np.where(valid, x - mean[codes], 0.0)
+            std = np.sqrt(_ratio(np.bincount(codes, weights=deviation ** 2, minlength=k), n - 1))
+            std[n < 2] = np.nan
+        quantiles = {_ORDER_STATISTICS.get(stat, stat) for stat in stats
+                     if stat in _ORDER_STATISTICS or not isinstance(stat, str)}
+        if quantiles:
+            # NaN queda al final de cada grupo
+            ordered = x[np.lexsort((x, codes))]
+            starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        for name, stat in items:
+            if stat == 'count':
+                out[name] = n.astype(np.int64)
+            elif stat == 'sum':
+                out[name] = total
+            elif stat == 'mean':
+                out[name] = mean
+            elif stat == 'std':
+                out[name] = std
+            elif stat in _ORDER_STATISTICS or not isinstance(stat, str):
+                q = _ORDER_STATISTICS.get(stat, stat)
+                position = starts + q * np.maximum(n - 1, 0)
+                low = np.floor(position).astype(np.int64)
+                high = np.ceil(position).astype(np.int64)
+                lower = ordered[np.minimum(low, len(ordered) - 1)] if len(ordered) else np.zeros(k)
+                upper = ordered[np.minimum(high, len(ordered) - 1)] if len(ordered) else np.zeros(k)
+                out[name] = np.where(n > 0, lower + (upper - lower) * (position - low), np.nan)
+            else:
+                raise ValueError(f"Estadístico no soportado: {stat}")
+
+    for name, (numerator, denominator) in derived.items():
+        out[name] = _ratio(out[numerator], out[denominator])
+
+    return pd.DataFrame(out, index=pd.Index(groups, name=by))
+
+
+def calculate_business_metrics(df_clusters, spec=None, derived=None):
     """
     Calcula métricas de negocio adicionales por cluster.
     
     Args:
         df_clusters: DataFrame con información de clusters
+        spec, derived: Métricas a calcular (ver ``grouped_metrics``)
     
     Returns:
         dict: Métricas de negocio por cluster
     """
-    metrics = {}
-    
-    for cluster_id in df_clusters['cluster_kmedoids'].unique():
-        cluster_data = df_clusters[df_clusters['cluster_kmedoids'] == cluster_id]
-        
-        metrics[cluster_id] = {
-            'count': len(cluster_data),
-            'revenue_mean': cluster_data['ingresos_totales'].mean(),
-            'revenue_std': cluster_data['ingresos_totales'].std(),
-            'revenue_median': cluster_data['ingresos_totales'].median(),
-            'transactions_mean': cluster_data['numero_transacciones'].mean(),
-            'ticket_mean': cluster_data['ticket_promedio'].mean(),
-            'products_mean': cluster_data['numero_productos_unicos'].mean(),
-            'activity_days_mean': cluster_data['periodo_actividad_dias'].mean(),
-            
-            # Métricas adicionales
-            'revenue_per_day': cluster_data['ingresos_totales'].mean() / cluster_data['periodo_actividad_dias'].mean(),
-            'efficiency_ratio': cluster_data['ingresos_totales'].mean() / cluster_data['numero_transacciones'].mean(),
-            'product_diversity': cluster_data['numero_productos_unicos'].mean() / cluster_data['numero_transacciones'].mean(),
-            
-            # Percentiles
-            'revenue_p25': cluster_data['ingresos_totales'].quantile(0.25),
-            'revenue_p75': cluster_data['ingresos_totales'].quantile(0.75),
-        }
-    
-    return metrics
+    return grouped_metrics(df_clusters, 'cluster_kmedoids', spec, derived).to_dict('index')
 
-def detect_outliers_iqr(df, column, factor=1.5):
+def detect_outliers_iqr(df, column, factor=1.5, by=None):
     """
     Detecta outliers usando el método IQR.
     
@@ -114,18 +328,15 @@ def detect_outliers_iqr(df, column, factor=1.5):
         df: DataFrame
         column: Columna a analizar
         factor: Factor de multiplicación para IQR
+        by: Columna de grupo (p. ej. 'cluster_kmedoids') para usar los
+            cuartiles de cada grupo; None = globales
     
     Returns:
         pandas.Series: Máscara booleana de outliers
     """
-    Q1 = df[column].quantile(0.25)
-    Q3 = df[column].quantile(0.75)
-    IQR = Q3 - Q1
-    
-    lower_bound = Q1 - factor * IQR
-    upper_bound = Q3 + factor * IQR
-    
-    return (df[column] < lower_bound) | (df[column] > upper_bound)
+    from outliers import detect_outliers
+
+    return detect_outliers(df, [column], by=by, factor=factor)[column]
 
 def create_cluster_comparison_chart(df_summary, metric):
     """
@@ -160,77 +371,235 @@ def create_cluster_comparison_chart(df_summary, metric):
     
     return fig
 
-def calculate_forecast_accuracy(actual, predicted):
+FORECAST_METRICS = ('MAE', 'MSE', 'RMSE', 'MAPE', 'sMAPE', 'WAPE', 'MASE', 'R²')
+
+
+def _weighted_mean(values, weights, total):
+    """Media ponderada por fila; NaN en las filas sin peso."""
+    out = np.full(len(total), np.nan)
+    np.divide((values * weights).sum(axis=1), total, out=out, where=total > 0)
+    return out
+
+
+def forecast_accuracy_table(actual, predicted, weights=None, insample=None, season_length=1):
+    """
+    Calcula las métricas de precisión de muchas series a la vez.
+
+    Los meses con NaN (real o predicho) o peso 0 se ignoran. MAPE descarta
+    los meses con valor real 0 (que lo harían infinito); sMAPE vale 0 cuando
+    real y predicho son 0; WAPE = Σ|e| / Σ|real|. MASE escala el MAE con el
+    error del pronóstico ingenuo estacional en la historia (``insample``).
+
+    Args:
+        actual: Valores reales (series × horizonte); DataFrame o array
+        predicted: Valores predichos con la misma forma
+        weights: Pesos por punto, difundibles a esa forma (opcional)
+        insample: Historia de cada serie (series × meses), para MASE
+        season_length: Periodo del pronóstico ingenuo de MASE (1 = sin estacionalidad)
+
+    Returns:
+        pandas.DataFrame: Una fila por serie y una columna por métrica
+            (FORECAST_METRICS); MAPE, sMAPE y WAPE en %
+    """
+    index = actual.index if isinstance(actual, pd.DataFrame) else None
+    actual = np.atleast_2d(np.asarray(actual, dtype=np.float64))
+    predicted = np.atleast_2d(np.asarray(predicted, dtype=np.float64))
+    valid = ~(np.isnan(actual) | np.isnan(predicted))
+    w = np.ones_like(actual) if weights is None else np.broadcast_to(
+        np.asarray(weights, dtype=np.float64), actual.shape)
+    w = np.where(valid, w, 0.0)
+    a = np.where(valid, actual, 0.0)
+    p = np.where(valid, predicted, 0.0)
+
+    abs_a = np.abs(a)
+    abs_e = np.abs(a - p)
+    total = w.sum(axis=1)
+    mae = _weighted_mean(abs_e, w, total)
+    mse = _weighted_mean(abs_e ** 2, w, total)
+
+    nonzero = w * (a != 0)
+    ape = np.divide(abs_e, abs_a, out=np.zeros_like(abs_e), where=a != 0)
+    mape = _weighted_mean(ape, nonzero, nonzero.sum(axis=1)) * 100
+
+    denominator = abs_a + np.abs(p)
+    sape = np.divide(2 * abs_e, denominator, out=np.zeros_like(abs_e), where=denominator > 0)
+    smape = _weighted_mean(sape, w, total) * 100
+
+    wape = np.full(len(a), np.nan)
+    np.divide((w * abs_e).sum(axis=1), (w * abs_a).sum(axis=1), out=wape,
+              where=(w * abs_a).sum(axis=1) > 0)
+    wape *= 100
+
+    mean_actual = _weighted_mean(a, w, total)
+    ss_tot = (w * (a - mean_actual[:, None]) ** 2).sum(axis=1)
+    r2 = np.full(len(a), np.nan)
+    np.divide((w * abs_e ** 2).sum(axis=1), ss_tot, out=r2, where=ss_tot > 0)
+    r2 = 1 - r2
+
+    mase = np.full(len(a), np.nan)
+    if insample is not None:
+        insample = np.atleast_2d(np.asarray(insample, dtype=np.float64))
+        naive_errors = np.abs(insample[:, season_length:] - insample[:, :-season_length])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            scale = np.nanmean(naive_errors, axis=1)
+        np.divide(mae, scale, out=mase, where=scale > 0)
+
+    return pd.DataFrame({
+        'MAE': mae, 'MSE': mse, 'RMSE': np.sqrt(mse), 'MAPE': mape, 'sMAPE': smape,
+        'WAPE': wape, 'MASE': mase, 'R²': r2,
+    }, index=index)
+
+
+def calculate_forecast_accuracy(actual, predicted, weights=None, insample=None, season_length=1):
     """
     Calcula métricas de precisión para pronósticos.
     
     Args:
-        actual: Valores reales
+        actual: Valores reales; 1-D (una serie) o 2-D (series × horizonte)
         predicted: Valores predichos
+        weights, insample, season_length: Ver ``forecast_accuracy_table``
     
     Returns:
-        dict: Métricas de precisión
+        dict: Métricas de precisión (1-D), o DataFrame con una fila por
+            serie (2-D)
     """
-    actual = np.array(actual)
-    predicted = np.array(predicted)
-    
-    # Eliminar valores nulos
-    mask = ~(np.isnan(actual) | np.isnan(predicted))
-    actual = actual[mask]
-    predicted = predicted[mask]
-    
-    if len(actual) == 0:
+    if np.ndim(actual) > 1:
+        return forecast_accuracy_table(actual, predicted, weights, insample, season_length)
+    
+    table = forecast_accuracy_table(np.asarray(actual, dtype=np.float64)[None, :],
+                                    np.asarray(predicted, dtype=np.float64)[None, :],
+                                    None if weights is None else np.asarray(weights)[None, :],
+                                    None if insample is None else np.asarray(insample)[None, :],
+                                    season_length)
+    if np.isnan(table['MAE'].iloc[0]):
         return {'error': 'No hay datos válidos para calcular métricas'}
+    return {metric: float(value) for metric, value in table.iloc[0].items()}
+
+_INSIGHTS_CACHE = OrderedDict()
+_INSIGHTS_CACHE_SIZE = 8
+
+_INSIGHT_METRICS = {
+    'count': (None, 'count'),
+    'revenue_mean': ('ingresos_totales', 'mean'),
+    'revenue_std': ('ingresos_totales', 'std'),
+    'transactions_mean': ('numero_transacciones', 'mean'),
+    'ticket_mean': ('ticket_promedio', 'mean'),
+}
+
+
+def _top_by_group(codes, values, n_groups, top_n):
+    """
+    Posiciones de las ``top_n`` filas con mayor valor de cada grupo.
+
+    Una sola ordenación estable por (grupo, -valor): los empates conservan el
+    orden original, como ``nlargest``; los NaN quedan fuera.
+    """
+    order = np.lexsort((-values, codes))
+    sizes = np.bincount(codes[~np.isnan(values)], minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=n_groups))[:-1]])
+    return [order[start:start + min(top_n, size)] for start, size in zip(starts, sizes)]
+
+
+def generate_all_cluster_insights(df_clusters, top_n=3, version=None):
+    """
+    Genera los insights de todos los clusters a la vez.
     
-    mae = np.mean(np.abs(actual - predicted))
-    mse = np.mean((actual - predicted) ** 2)
-    rmse = np.sqrt(mse)
-    mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+    Las medias y desviaciones globales se calculan una vez, las de cada
+    cluster con ``grouped_metrics`` y los mejores de cada cluster con una
+    única ordenación. Con ``version`` el resultado se memoriza por versión de
+    datos; sin ella se calcula de nuevo (no se recorre el DataFrame para
+    obtener una huella).
     
-    return {
-        'MAE': mae,
-        'MSE': mse,
-        'RMSE': rmse,
-        'MAPE': mape,
-        'R²': 1 - (np.sum((actual - predicted) ** 2) / np.sum((actual - np.mean(actual)) ** 2))
-    }
+    Args:
+        df_clusters: DataFrame con datos de clusters
+        top_n: PYMEs con más ingresos por cluster
+        version: Versión de los datos ya calculada por quien llama (p. ej.
+            ``ArtifactCache.version('clusters')``)
+    
+    Returns:
+        dict: cluster -> insights (mismas claves que ``generate_cluster_insights``);
+            con ``version`` se comparten entre llamadas y no deben modificarse
+    """
+    key = (version, top_n)
+    if version is not None and key in _INSIGHTS_CACHE:
+        _INSIGHTS_CACHE.move_to_end(key)
+        return _INSIGHTS_CACHE[key]
+
+    stats = grouped_metrics(df_clusters, 'cluster_kmedoids', _INSIGHT_METRICS, derived={})
+    revenue = df_clusters['ingresos_totales'].to_numpy(dtype=np.float64, na_value=np.nan)
+    global_revenue_mean = np.nanmean(revenue)
+    global_revenue_std = df_clusters['ingresos_totales'].std()
+    global_transactions_mean = df_clusters['numero_transacciones'].mean()
+    global_ticket_mean = df_clusters['ticket_promedio'].mean()
+
+    codes = stats.index.get_indexer(df_clusters['cluster_kmedoids'])
+    top_positions = _top_by_group(codes, revenue, len(stats), top_n)
+
+    insights = {}
+    for position, (cluster_id, row) in enumerate(stats.iterrows()):
+        insights[cluster_id] = {
+            'size_percentage': (row['count'] / len(df_clusters)) * 100,
+            'revenue_vs_average': (row['revenue_mean'] / global_revenue_mean) * 100,
+            'transactions_vs_average': (row['transactions_mean'] / global_transactions_mean) * 100,
+            'ticket_vs_average': (row['ticket_mean'] / global_ticket_mean) * 100,
+            
+            'top_performers': df_clusters.iloc[top_positions[position]],
+            'growth_potential': 'High' if row['revenue_std'] > global_revenue_std else 'Moderate',
+            
+            'recommendations': _recommendations(cluster_id, row['revenue_mean'],
+                                                row['transactions_mean'], row['ticket_mean'])
+        }
+
+    if version is None:
+        return insights
+    _INSIGHTS_CACHE[key] = insights
+    while len(_INSIGHTS_CACHE) > _INSIGHTS_CACHE_SIZE:
+        _INSIGHTS_CACHE.popitem(last=False)
+    return insights
 
-def generate_cluster_insights(df_clusters, cluster_id):
+def generate_cluster_insights(df_clusters, cluster_id, version=None):
     """
     Genera insights automáticos para un cluster específico.
     
     Args:
         df_clusters: DataFrame con datos de clusters
         cluster_id: ID del cluster a analizar
+        version: Versión de los datos (ver ``generate_all_cluster_insights``)
     
     Returns:
-        dict: Insights del cluster
+        dict: Insights del cluster; si el cluster no tiene filas, los
+            porcentajes y comparaciones valen 0 o NaN y ``top_performers``
+            está vacío
     """
-    cluster_data = df_clusters[df_clusters['cluster_kmedoids'] == cluster_id]
-    total_data = df_clusters
-    
-    insights = {
-        'size_percentage': (len(cluster_data) / len(total_data)) * 100,
-        'revenue_vs_average': (cluster_data['ingresos_totales'].mean() / total_data['ingresos_totales'].mean()) * 100,
-        'transactions_vs_average': (cluster_data['numero_transacciones'].mean() / total_data['numero_transacciones'].mean()) * 100,
-        'ticket_vs_average': (cluster_data['ticket_promedio'].mean() / total_data['ticket_promedio'].mean()) * 100,
-        
-        'top_performers': cluster_data.nlargest(3, 'ingresos_totales'),
-        'growth_potential': 'High' if cluster_data['ingresos_totales'].std() > total_data['ingresos_totales'].std() else 'Moderate',
-        
-        'recommendations': _generate_recommendations(cluster_data, cluster_id)
+    insights = generate_all_cluster_insights(df_clusters, version=version)
+    if cluster_id in insights:
+        return insights[cluster_id]
+
+    # Cluster sin filas: mismo resultado que el cálculo sobre un grupo vacío
+    return {
+        'size_percentage': 0.0,
+        'revenue_vs_average': np.nan,
+        'transactions_vs_average': np.nan,
+        'ticket_vs_average': np.nan,
+        'top_performers': df_clusters.iloc[:0],
+        'growth_potential': 'Moderate',
+        'recommendations': _recommendations(cluster_id, np.nan, np.nan, np.nan),
     }
-    
-    return insights
 
 def _generate_recommendations(cluster_data, cluster_id):
     """
     Genera recomendaciones automáticas basadas en datos del cluster.
     """
-    avg_revenue = cluster_data['ingresos_totales'].mean()
-    avg_transactions = cluster_data['numero_transacciones'].mean()
-    avg_ticket = cluster_data['ticket_promedio'].mean()
-    
+    return _recommendations(cluster_id,
+                            cluster_data['ingresos_totales'].mean(),
+                            cluster_data['numero_transacciones'].mean(),
+                            cluster_data['ticket_promedio'].mean())
+
+def _recommendations(cluster_id, avg_revenue, avg_transactions, avg_ticket):
+    """
+    Recomendaciones a partir de las medias del cluster.
+    """
     recommendations = []
     
     if cluster_id == 0:  # Líderes
@@ -328,22 +697,23 @@ def export_cluster_report(df_clusters, df_summary, output_path='cluster_report.h
 def analyze_seasonality(df_historical, cluster_id):
     """
     Analiza patrones estacionales en los datos históricos.
+    
+    Lee el perfil de todas las series de ``seasonality.seasonality_profile``
+    (calculado una vez por versión de datos).
     """
+    from seasonality import seasonality_profile
+
     if str(cluster_id) not in df_historical.columns:
         return None
     
-    data = df_historical[str(cluster_id)].dropna()
-    
-    # Análisis por mes
-    monthly_avg = data.groupby(data.index.month).mean()
-    
-    # Análisis por trimestre
-    quarterly_avg = data.groupby(data.index.quarter).mean()
+    profile = seasonality_profile(df_historical.rename(columns=str))
+    column = str(cluster_id)
+    summary = profile['summary'].loc[column]
     
     return {
-        'monthly_patterns': monthly_avg,
-        'quarterly_patterns': quarterly_avg,
-        'peak_month': monthly_avg.idxmax(),
-        'low_month': monthly_avg.idxmin(),
-        'seasonality_strength': (monthly_avg.max() - monthly_avg.min()) / monthly_avg.mean()
+        'monthly_patterns': profile['monthly'].loc[column].dropna(),
+        'quarterly_patterns': profile['quarterly'].loc[column].dropna(),
+        'peak_month': int(summary['peak_month']),
+        'low_month': int(summary['low_month']),
+        'seasonality_strength': summary['seasonality_strength']
     }